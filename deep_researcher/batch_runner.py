@@ -0,0 +1,172 @@
+"""Run a batch of report requests through one shared worker pool.
+
+Every line of the input JSONL file is a job {"main_topic": ..., "outline": ...}.
+Jobs run concurrently in one process, so they share the search cache, the
+chat model clients and the per-provider rate limits. The generated plans
+are accepted without human feedback.
+
+Runs are checkpointed in a SQLite database, and with --resume a batch
+interrupted by a crash carries on where every job stopped : the sections
+already written are kept and only the unfinished ones are written again.
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional
+
+from langgraph.types import Command
+
+from deep_researcher.deep_research_agent import graph_builder
+from deep_researcher.utils.checkpointer import get_checkpointer
+from deep_researcher.utils.fusion import fusion_stats
+from deep_researcher.utils.hedging import hedging_stats
+from deep_researcher.utils.llm_cache import get_llm_cache
+from deep_researcher.utils.models import llm_calls_in_flight, model_registry
+from deep_researcher.utils.normalization import normalization_stats
+from deep_researcher.utils.profiling import RunProfiler
+from deep_researcher.utils.rate_limiter import rate_limiter_stats
+from deep_researcher.utils.search_cache import get_search_cache, searches_in_flight
+from deep_researcher.utils.vector_index import vector_index_stats
+
+# Threads for the blocking nodes per concurrently running job.
+THREADS_PER_JOB = 8
+
+
+def job_thread_id(job: dict, idx: int) -> str:
+    """Thread of a job which is the same in every run of the batch."""
+    digest = hashlib.sha256(json.dumps(job, sort_keys=True).encode()).hexdigest()
+    return f"batch:{digest[:16]}:{idx}"
+
+
+async def run_job(
+    graph, job: dict, semaphore: asyncio.Semaphore,
+    profile_path: Optional[str] = None, thread_id: Optional[str] = None
+) -> dict:
+    """Write the report of a job, accepting the generated plan.
+
+    A job whose thread was checkpointed before resumes from its last
+    checkpoint.
+    """
+    config = {"configurable": {"thread_id": thread_id or str(uuid.uuid4())}}
+    if profile_path is not None:
+        profiler = RunProfiler()
+        config["callbacks"] = [profiler]
+    async with semaphore:
+        start = time.perf_counter()
+        planned = start
+        try:
+            while True:
+                state = await graph.aget_state(config)
+                if not state.values:
+                    await graph.ainvoke(
+                        {"main_topic": job["main_topic"], "outline": job["outline"]},
+                        config
+                    )
+                elif not state.next:
+                    out = state.values
+                    break
+                elif any(task.interrupts for task in state.tasks):
+                    planned = time.perf_counter()
+                    await graph.ainvoke(Command(resume="Accept"), config)
+                else:
+                    print(f"Job {job['main_topic']} resumed before {', '.join(state.next)}")
+                    await graph.ainvoke(None, config)
+        except Exception as e:
+            print(f"Job {job['main_topic']} failed : {e!r}")
+            return {
+                **job,
+                "final_report": None,
+                "error": repr(e),
+                "timing": {"total_seconds": time.perf_counter() - start}
+            }
+        end = time.perf_counter()
+    print(f"Job {job['main_topic']} done in {end - start:.1f}s")
+    if profile_path is not None:
+        profiler.write(profile_path)
+    return {
+        **job,
+        "final_report": out["final_report"],
+        "error": None,
+        "timing": {
+            "plan_seconds": planned - start,
+            "report_seconds": end - planned,
+            "total_seconds": end - start
+        }
+    }
+
+
+async def run_batch(
+    jobs: List[dict], concurrency: int = 4, profile_dir: Optional[str] = None,
+    resume: bool = False
+) -> List[dict]:
+    """Run the jobs with at most concurrency of them in flight, writing
+    the run profile of every job to profile_dir if given. With resume, jobs
+    checkpointed by an earlier run of the batch carry on from there."""
+    # sync nodes run on the default executor, size it for the running jobs
+    asyncio.get_running_loop().set_default_executor(
+        ThreadPoolExecutor(max_workers=concurrency * THREADS_PER_JOB)
+    )
+    graph = graph_builder.compile(checkpointer=get_checkpointer())
+    semaphore = asyncio.Semaphore(concurrency)
+    if profile_dir is not None:
+        os.makedirs(profile_dir, exist_ok=True)
+    return await asyncio.gather(
+        *(
+            run_job(
+                graph, job, semaphore,
+                os.path.join(profile_dir, f"job_{idx}.json") if profile_dir else None,
+                job_thread_id(job, idx) if resume else None
+            )
+            for idx, job in enumerate(jobs)
+        )
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("input", help="JSONL file of report requests.")
+    parser.add_argument("output", help="JSONL file the reports are written to.")
+    parser.add_argument(
+        "--concurrency", type=int, default=4,
+        help="Number of reports written at the same time."
+    )
+    parser.add_argument(
+        "--profile-dir",
+        help="Directory the run profile of every job is written to."
+    )
+    parser.add_argument(
+        "--resume", action="store_true",
+        help="Resume the jobs of an interrupted run of the same batch."
+    )
+    args = parser.parse_args()
+
+    with open(args.input) as f:
+        jobs = [json.loads(line) for line in f if line.strip()]
+    start = time.perf_counter()
+    results = asyncio.run(run_batch(jobs, args.concurrency, args.profile_dir, args.resume))
+    elapsed = time.perf_counter() - start
+    with open(args.output, "w") as f:
+        for result in results:
+            f.write(json.dumps(result) + "\n")
+
+    print(
+        f"\n\n{len(jobs)} jobs in {elapsed:.1f}s, {len(jobs) / elapsed * 3600:.1f} jobs/hour")
+    print(f"Model clients : {model_registry.stats()}")
+    print(f"Search cache : {get_search_cache().stats()}")
+    print(f"Searches in flight : {searches_in_flight.stats()}")
+    print(f"LLM cache : {get_llm_cache().stats()}")
+    print(f"LLM calls in flight : {llm_calls_in_flight.stats()}")
+    print(f"Rate limiters : {rate_limiter_stats()}")
+    print(f"Local index : {vector_index_stats()}")
+    print(f"Search result fusion : {fusion_stats()}")
+    print(f"Search hedging : {hedging_stats()}")
+    print(f"Search result normalization : {normalization_stats()}")
+
+
+if __name__ == "__main__":
+    main()
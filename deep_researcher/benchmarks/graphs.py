@@ -0,0 +1,223 @@
+"""Benchmark the three graphs offline on replayed model and search calls.
+
+Chat model and search calls are replayed from the fixtures recorded with
+REPLAY_MODE=record, sleeping their recorded latency, and calls without a
+fixture get synthetic responses with a fixed latency. Runs are therefore
+deterministic and need no API keys, so two revisions of the graphs can be
+compared on the same plans.
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+
+# Threads for the blocking nodes per concurrently running graph.
+THREADS_PER_RUN = 8
+GRAPHS = ["search", "researcher", "deep_research"]
+
+
+def configure(args):
+    """Set the environment of the graph modules, before importing them."""
+    os.environ.setdefault(
+        "DEEP_RESEARCHER_CACHE_DIR", tempfile.mkdtemp(prefix="deep_researcher_")
+    )
+    os.environ["REPLAY_MODE"] = "replay"
+    os.environ["REPLAY_SYNTHETIC"] = "0" if args.strict else "1"
+    os.environ["REPLAY_LATENCY_SCALE"] = str(args.latency_scale)
+    os.environ["REPLAY_LLM_SECONDS"] = str(args.llm_seconds)
+    os.environ["REPLAY_SEARCH_SECONDS"] = str(args.search_seconds)
+    if args.fixtures:
+        os.environ["REPLAY_FIXTURES_PATH"] = os.path.abspath(args.fixtures)
+    if not args.warm:
+        # every run does all of its calls
+        for flag in (
+            "SEARCH_CACHE_ENABLED", "LLM_CACHE_ENABLED",
+            "SECTION_REUSE_ENABLED", "LOCAL_INDEX_ENABLED"
+        ):
+            os.environ[flag] = "0"
+    if not args.provider_limits:
+        from deep_researcher.utils.rate_limiter import PROVIDER_LIMITS
+        for provider in PROVIDER_LIMITS:
+            prefix = provider.upper()
+            os.environ[f"{prefix}_RPM"] = "1000000"
+            os.environ[f"{prefix}_TPM"] = ""
+            os.environ[f"{prefix}_MAX_CONCURRENCY"] = "1024"
+
+
+def payload_bytes(value) -> int:
+    """Bytes of the serialized values nested in a checkpointer storage."""
+    if isinstance(value, (bytes, bytearray)):
+        return len(value)
+    if isinstance(value, dict):
+        return sum(payload_bytes(item) for item in value.values())
+    if isinstance(value, (list, tuple)):
+        return sum(payload_bytes(item) for item in value)
+    return 0
+
+
+def checkpoint_bytes(saver) -> int:
+    return payload_bytes(saver.storage) + payload_bytes(saver.writes)
+
+
+def graph_input(graph_name: str, sections: int, idx: int) -> dict:
+    topic = f"Benchmark topic {idx}"
+    if graph_name == "search":
+        return {"topic": f"{topic} origins", "of_section": f"{topic} part 1"}
+    if graph_name == "researcher":
+        return {
+            "main_topic": topic,
+            "section": f"{topic} part 1",
+            "section_overview": f"The history and methods of {topic}."
+        }
+    return {
+        "main_topic": topic,
+        "outline": f"A report of {sections} sections on {topic}."
+    }
+
+
+async def run_graph(
+    graph, graph_name: str, sections: int, idx: int,
+    semaphore: asyncio.Semaphore
+) -> float:
+    """Seconds a run of the graph takes, accepting the plan of the deep
+    research graph."""
+    config = {"configurable": {"thread_id": str(uuid.uuid4())}}
+    async with semaphore:
+        start = time.perf_counter()
+        await graph.ainvoke(graph_input(graph_name, sections, idx), config)
+        if graph_name == "deep_research":
+            from langgraph.types import Command
+            await graph.ainvoke(Command(resume="Accept"), config)
+        return time.perf_counter() - start
+
+
+async def benchmark(
+    graph_name: str, sections: int, runs: int, concurrency: int
+) -> dict:
+    """Run a graph and report its latency, throughput, peak memory and
+    checkpoint size."""
+    from langgraph.checkpoint.memory import MemorySaver
+    from deep_researcher.utils import replay
+
+    if graph_name == "search":
+        from deep_researcher.search_graph import search_graph_builder as builder
+    elif graph_name == "researcher":
+        from deep_researcher.researcher_graph import (
+            researcher_graph_builder as builder
+        )
+    else:
+        from deep_researcher.deep_research_agent import graph_builder as builder
+    replay.REPLAY_PLAN_SECTIONS = sections
+
+    asyncio.get_running_loop().set_default_executor(
+        ThreadPoolExecutor(max_workers=concurrency * THREADS_PER_RUN)
+    )
+    saver = MemorySaver()
+    graph = builder.compile(checkpointer=saver)
+    semaphore = asyncio.Semaphore(concurrency)
+    tracemalloc.start()
+    start = time.perf_counter()
+    latencies = await asyncio.gather(
+        *(
+            run_graph(graph, graph_name, sections, idx, semaphore)
+            for idx in range(runs)
+        )
+    )
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    latencies = sorted(latencies)
+    return {
+        "graph": graph_name,
+        "sections": sections,
+        "runs": runs,
+        "concurrency": concurrency,
+        "seconds": elapsed,
+        "runs_per_minute": runs / elapsed * 60,
+        "latency_p50": statistics.median(latencies),
+        "latency_p95": latencies[min(len(latencies) - 1, int(0.95 * len(latencies)))],
+        "peak_memory_mb": peak / 2**20,
+        "checkpoint_kb_per_run": checkpoint_bytes(saver) / 1024 / runs,
+    }
+
+
+def compare(result: dict, baseline: Optional[dict]) -> str:
+    if baseline is None:
+        return ""
+    return (
+        f" ({(result['latency_p50'] / baseline['latency_p50'] - 1) * 100:+.0f}% p50, "
+        f"{(result['runs_per_minute'] / baseline['runs_per_minute'] - 1) * 100:+.0f}% throughput)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--graphs", nargs="+", choices=GRAPHS, default=GRAPHS)
+    parser.add_argument(
+        "--sections", type=int, nargs="+", default=[3, 6, 12],
+        help="Sections of the synthetic report plans."
+    )
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--concurrency", type=int, default=1)
+    parser.add_argument(
+        "--fixtures", help="Fixtures recorded with REPLAY_MODE=record."
+    )
+    parser.add_argument(
+        "--strict", action="store_true",
+        help="Fail on calls without a fixture instead of synthesizing them."
+    )
+    parser.add_argument("--latency-scale", type=float, default=1.0)
+    parser.add_argument("--llm-seconds", type=float, default=1.0)
+    parser.add_argument("--search-seconds", type=float, default=0.5)
+    parser.add_argument(
+        "--warm", action="store_true",
+        help="Keep the search, LLM and section caches between runs."
+    )
+    parser.add_argument(
+        "--provider-limits", action="store_true",
+        help="Keep the provider rate limits instead of lifting them."
+    )
+    parser.add_argument("--output", help="JSON file the results are written to.")
+    parser.add_argument(
+        "--baseline", help="JSON results of an earlier run to compare with."
+    )
+    args = parser.parse_args()
+    configure(args)
+
+    baselines = {}
+    if args.baseline:
+        with open(args.baseline) as f:
+            baselines = {
+                (result["graph"], result["sections"]): result
+                for result in json.load(f)
+            }
+    results = []
+    for graph_name in args.graphs:
+        # the plan size only matters to the deep research graph
+        for sections in args.sections if graph_name == "deep_research" else args.sections[:1]:
+            result = asyncio.run(
+                benchmark(graph_name, sections, args.runs, args.concurrency)
+            )
+            results.append(result)
+            print(
+                f"{graph_name} ({sections} sections): p50 {result['latency_p50']:.2f}s, "
+                f"p95 {result['latency_p95']:.2f}s, {result['runs_per_minute']:.1f} runs/min, "
+                f"peak {result['peak_memory_mb']:.1f} MB, "
+                f"checkpoints {result['checkpoint_kb_per_run']:.0f} KB/run"
+                + compare(result, baselines.get((graph_name, sections))),
+                file=sys.stderr
+            )
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+"""Measure the cold import time of the graph modules.
+
+Every module is imported in a fresh interpreter, like a LangGraph API
+worker loading langgraph.json or a CLI run, so nothing is cached between
+samples.
+"""
+import argparse
+import statistics
+import subprocess
+import sys
+
+GRAPH_MODULES = [
+    "deep_researcher.search_graph",
+    "deep_researcher.researcher_graph",
+    "deep_researcher.deep_research_agent",
+]
+
+
+def import_seconds(module: str) -> float:
+    """Seconds a fresh interpreter takes to import the module."""
+    code = (
+        "import time; start = time.perf_counter(); "
+        f"import {module}; print(time.perf_counter() - start)"
+    )
+    out = subprocess.run(
+        [sys.executable, "-c", code], capture_output=True, text=True, check=True
+    )
+    return float(out.stdout.strip().splitlines()[-1])
+
+
+def slowest_imports(module: str, top: int) -> list:
+    """The packages with the largest cumulative import time, in seconds."""
+    out = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True, text=True, check=True
+    )
+    packages = {}
+    for line in out.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        if not cumulative.strip().isdigit():
+            continue
+        name = name.strip()
+        if "." not in name:
+            packages[name] = int(cumulative) / 1e6
+    return sorted(packages.items(), key=lambda item: item[1], reverse=True)[:top]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--samples", type=int, default=5)
+    parser.add_argument("--top", type=int, default=10)
+    args = parser.parse_args()
+
+    for module in GRAPH_MODULES:
+        samples = [import_seconds(module) for _ in range(args.samples)]
+        print(
+            f"{module}: median {statistics.median(samples):.3f}s, min {min(samples):.3f}s over {args.samples} runs")
+    print(f"\nSlowest top-level imports of {GRAPH_MODULES[-1]}:")
+    for name, seconds in slowest_imports(GRAPH_MODULES[-1], args.top):
+        print(f"  {name:<30} {seconds:.3f}s")
+
+
+if __name__ == "__main__":
+    main()
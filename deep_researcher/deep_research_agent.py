@@ -1,7 +1,8 @@
 # general imports
+from langchain_core.runnables import RunnableLambda
 from langgraph.graph import StateGraph, START, END
 from deep_researcher.utils.nodes import (
-    create_search_query, call_search_tools,
+    create_search_query, call_search_tools, acall_search_tools,
     get_important_topics, assign_search_workers, section_writer,
     generate_plan, generate_plan_schema,
     web_search_required_routing,
@@ -22,7 +23,10 @@ search_graph_builder = StateGraph(
     SearchGraphState, output=SearchGraphOutputState
 )
 search_graph_builder.add_node("create_search_query", create_search_query)
-search_graph_builder.add_node("call_search_tools", call_search_tools)
+search_graph_builder.add_node(
+    "call_search_tools",
+    RunnableLambda(call_search_tools, afunc=acall_search_tools)
+)
 
 search_graph_builder.add_edge(START, "create_search_query")
 search_graph_builder.add_edge("create_search_query", "call_search_tools")
@@ -63,6 +67,10 @@ graph_builder.add_node("combine_written_sections", combine_written_sections)
 graph_builder.add_node(
     "write_sections_without_search", write_sections_without_search
 )
+# sections built from the plan alone, written alongside the web search ones
+graph_builder.add_node(
+    "write_independent_sections", write_sections_without_search
+)
 graph_builder.add_node("write_final_report", write_final_report)
 
 graph_builder.add_edge(START, "generate_plan")
@@ -85,11 +93,12 @@ graph_builder.add_edge(
 )
 graph_builder.add_conditional_edges(
     "combine_written_sections", assign_no_web_search_writing_workers,
-    ["write_sections_without_search"]
+    ["write_sections_without_search", "write_final_report"]
 )
 graph_builder.add_edge(
     "write_sections_without_search", "write_final_report"
 )
+graph_builder.add_edge("write_independent_sections", END)
 graph_builder.add_edge(
     "write_final_report", END
 )
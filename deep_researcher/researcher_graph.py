@@ -1,6 +1,7 @@
+from langchain_core.runnables import RunnableLambda
 from langgraph.graph import StateGraph, START, END
 from deep_researcher.utils.nodes import (
-    create_search_query, call_search_tools,
+    create_search_query, call_search_tools, acall_search_tools,
     get_important_topics, assign_search_workers, section_writer,
 )
 from deep_researcher.utils.state import (
@@ -13,7 +14,10 @@ search_graph_builder = StateGraph(
     SearchGraphState, output=SearchGraphOutputState
 )
 search_graph_builder.add_node("create_search_query", create_search_query)
-search_graph_builder.add_node("call_search_tools", call_search_tools)
+search_graph_builder.add_node(
+    "call_search_tools",
+    RunnableLambda(call_search_tools, afunc=acall_search_tools)
+)
 
 search_graph_builder.add_edge(START, "create_search_query")
 search_graph_builder.add_edge("create_search_query", "call_search_tools")
@@ -0,0 +1,367 @@
+import argparse
+import asyncio
+import os
+import random
+import threading
+import time
+import zlib
+from typing import Any, AsyncIterator, Dict, Iterator, Optional, Sequence
+
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.base import (
+    WRITES_IDX_MAP,
+    BaseCheckpointSaver,
+    ChannelVersions,
+    Checkpoint,
+    CheckpointMetadata,
+    CheckpointTuple,
+    get_checkpoint_id,
+    get_checkpoint_metadata,
+)
+from langgraph.checkpoint.serde.types import TASKS
+
+from deep_researcher.utils.storage import CACHE_DIR, connect_sqlite
+
+
+CHECKPOINT_DB_PATH = os.getenv(
+    "CHECKPOINT_DB_PATH", os.path.join(CACHE_DIR, "checkpoints.sqlite")
+)
+
+
+class SQLiteCheckpointer(BaseCheckpointSaver[str]):
+    """Append-only checkpointer of graph threads in a SQLite WAL database.
+
+    A checkpoint row only holds the channel versions, the value of a channel
+    is stored once per version, so every step writes the channels it changed
+    instead of the whole state. The writes of every finished task are
+    committed as soon as the task is done: when a run is resumed after a
+    crash, the sections already written are taken from them and only the
+    unfinished tasks run again.
+    """
+
+    def __init__(self, path: str = CHECKPOINT_DB_PATH, **kwargs):
+        super().__init__(**kwargs)
+        self._lock = threading.Lock()
+        self._connection = connect_sqlite(path)
+        self._connection.executescript(
+            """CREATE TABLE IF NOT EXISTS checkpoints (
+                thread_id TEXT NOT NULL,
+                checkpoint_ns TEXT NOT NULL,
+                checkpoint_id TEXT NOT NULL,
+                parent_checkpoint_id TEXT,
+                type TEXT NOT NULL,
+                checkpoint BLOB NOT NULL,
+                metadata_type TEXT NOT NULL,
+                metadata BLOB NOT NULL,
+                created_at REAL NOT NULL,
+                PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id)
+            );
+            CREATE TABLE IF NOT EXISTS channel_values (
+                thread_id TEXT NOT NULL,
+                checkpoint_ns TEXT NOT NULL,
+                channel TEXT NOT NULL,
+                version TEXT NOT NULL,
+                type TEXT NOT NULL,
+                value BLOB,
+                PRIMARY KEY (thread_id, checkpoint_ns, channel, version)
+            );
+            CREATE TABLE IF NOT EXISTS writes (
+                thread_id TEXT NOT NULL,
+                checkpoint_ns TEXT NOT NULL,
+                checkpoint_id TEXT NOT NULL,
+                task_id TEXT NOT NULL,
+                idx INTEGER NOT NULL,
+                channel TEXT NOT NULL,
+                type TEXT NOT NULL,
+                value BLOB,
+                task_path TEXT NOT NULL,
+                PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id, task_id, idx)
+            );"""
+        )
+        self._connection.commit()
+
+    def _dumps(self, value) -> tuple:
+        type_, data = self.serde.dumps_typed(value)
+        return type_, zlib.compress(data)
+
+    def _loads(self, type_: str, data: Optional[bytes]):
+        return self.serde.loads_typed(
+            (type_, zlib.decompress(data) if data is not None else b"")
+        )
+
+    def _tuple(self, thread_id: str, checkpoint_ns: str, row) -> CheckpointTuple:
+        checkpoint_id, parent_checkpoint_id, type_, data, metadata_type, metadata = row
+        checkpoint = self._loads(type_, data)
+        versions = checkpoint["channel_versions"]
+        with self._lock:
+            values = [
+                row for channel, version in versions.items()
+                for row in self._connection.execute(
+                    "SELECT channel, type, value FROM channel_values "
+                    "WHERE thread_id = ? AND checkpoint_ns = ? AND channel = ? AND version = ?",
+                    (thread_id, checkpoint_ns, channel, str(version))
+                ).fetchall()
+            ]
+            writes = self._connection.execute(
+                "SELECT checkpoint_id, task_id, channel, type, value, task_path, idx "
+                "FROM writes WHERE thread_id = ? AND checkpoint_ns = ? "
+                "AND checkpoint_id IN (?, ?) ORDER BY task_id, idx",
+                (thread_id, checkpoint_ns, checkpoint_id, parent_checkpoint_id or "")
+            ).fetchall()
+        checkpoint["channel_values"] = {
+            channel: self._loads(value_type, value)
+            for channel, value_type, value in values
+            if value_type != "empty"
+        }
+        # sends of the parent checkpoint are the pending sends of this one
+        checkpoint["pending_sends"] = [
+            self._loads(value_type, value)
+            for _, _, value_type, value, _ in sorted(
+                (
+                    (task_path, task_id, value_type, value, idx)
+                    for write_checkpoint_id, task_id, channel, value_type, value, task_path, idx in writes
+                    if write_checkpoint_id == parent_checkpoint_id and channel == TASKS
+                ),
+                key=lambda write: (write[0], write[1], write[4])
+            )
+        ]
+        return CheckpointTuple(
+            config={"configurable": {
+                "thread_id": thread_id,
+                "checkpoint_ns": checkpoint_ns,
+                "checkpoint_id": checkpoint_id,
+            }},
+            checkpoint=checkpoint,
+            metadata=self._loads(metadata_type, metadata),
+            parent_config=({"configurable": {
+                "thread_id": thread_id,
+                "checkpoint_ns": checkpoint_ns,
+                "checkpoint_id": parent_checkpoint_id,
+            }} if parent_checkpoint_id else None),
+            pending_writes=[
+                (task_id, channel, self._loads(value_type, value))
+                for write_checkpoint_id, task_id, channel, value_type, value, _, _ in writes
+                if write_checkpoint_id == checkpoint_id
+            ],
+        )
+
+    def get_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        query = (
+            "SELECT checkpoint_id, parent_checkpoint_id, type, checkpoint, metadata_type, metadata "
+            "FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ?"
+        )
+        params = [thread_id, checkpoint_ns]
+        if checkpoint_id := get_checkpoint_id(config):
+            query += " AND checkpoint_id = ?"
+            params.append(checkpoint_id)
+        else:
+            query += " ORDER BY checkpoint_id DESC LIMIT 1"
+        with self._lock:
+            row = self._connection.execute(query, params).fetchone()
+        if row is None:
+            return None
+        return self._tuple(thread_id, checkpoint_ns, row)
+
+    def list(
+        self,
+        config: Optional[RunnableConfig],
+        *,
+        filter: Optional[Dict[str, Any]] = None,
+        before: Optional[RunnableConfig] = None,
+        limit: Optional[int] = None,
+    ) -> Iterator[CheckpointTuple]:
+        query = (
+            "SELECT thread_id, checkpoint_ns, checkpoint_id, parent_checkpoint_id, "
+            "type, checkpoint, metadata_type, metadata FROM checkpoints WHERE 1 = 1"
+        )
+        params = []
+        if config is not None:
+            query += " AND thread_id = ?"
+            params.append(config["configurable"]["thread_id"])
+            if (checkpoint_ns := config["configurable"].get("checkpoint_ns")) is not None:
+                query += " AND checkpoint_ns = ?"
+                params.append(checkpoint_ns)
+            if checkpoint_id := get_checkpoint_id(config):
+                query += " AND checkpoint_id = ?"
+                params.append(checkpoint_id)
+        if before is not None and (before_id := get_checkpoint_id(before)):
+            query += " AND checkpoint_id < ?"
+            params.append(before_id)
+        query += " ORDER BY checkpoint_id DESC"
+        with self._lock:
+            rows = self._connection.execute(query, params).fetchall()
+        for thread_id, checkpoint_ns, *row in rows:
+            if limit is not None and limit <= 0:
+                break
+            if filter:
+                metadata = self._loads(row[4], row[5])
+                if not all(metadata.get(key) == value for key, value in filter.items()):
+                    continue
+            if limit is not None:
+                limit -= 1
+            yield self._tuple(thread_id, checkpoint_ns, row)
+
+    def put(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"]["checkpoint_ns"]
+        checkpoint = checkpoint.copy()
+        checkpoint.pop("pending_sends", None)
+        channel_values = checkpoint.pop("channel_values")
+        # only the channels updated by this step are written
+        values = [
+            (
+                thread_id, checkpoint_ns, channel, str(version),
+                *(self._dumps(channel_values[channel]) if channel in channel_values else ("empty", None))
+            )
+            for channel, version in new_versions.items()
+        ]
+        type_, data = self._dumps(checkpoint)
+        metadata_type, metadata_data = self._dumps(get_checkpoint_metadata(config, metadata))
+        with self._lock:
+            self._connection.executemany(
+                "INSERT OR IGNORE INTO channel_values VALUES (?, ?, ?, ?, ?, ?)",
+                values
+            )
+            self._connection.execute(
+                "INSERT OR REPLACE INTO checkpoints VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    thread_id, checkpoint_ns, checkpoint["id"],
+                    config["configurable"].get("checkpoint_id"),
+                    type_, data, metadata_type, metadata_data, time.time()
+                )
+            )
+            self._connection.commit()
+        return {"configurable": {
+            "thread_id": thread_id,
+            "checkpoint_ns": checkpoint_ns,
+            "checkpoint_id": checkpoint["id"],
+        }}
+
+    def put_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[tuple],
+        task_id: str,
+        task_path: str = "",
+    ) -> None:
+        configurable = config["configurable"]
+        rows = [
+            (
+                configurable["thread_id"], configurable.get("checkpoint_ns", ""),
+                configurable["checkpoint_id"], task_id,
+                WRITES_IDX_MAP.get(channel, idx), channel,
+                *self._dumps(value), task_path
+            )
+            for idx, (channel, value) in enumerate(writes)
+        ]
+        with self._lock:
+            # special writes replace earlier ones, the others are kept
+            self._connection.executemany(
+                "INSERT OR REPLACE INTO writes VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                [row for row in rows if row[4] < 0]
+            )
+            self._connection.executemany(
+                "INSERT OR IGNORE INTO writes VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                [row for row in rows if row[4] >= 0]
+            )
+            self._connection.commit()
+
+    async def aget_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        return await asyncio.to_thread(self.get_tuple, config)
+
+    async def alist(
+        self,
+        config: Optional[RunnableConfig],
+        *,
+        filter: Optional[Dict[str, Any]] = None,
+        before: Optional[RunnableConfig] = None,
+        limit: Optional[int] = None,
+    ) -> AsyncIterator[CheckpointTuple]:
+        tuples = await asyncio.to_thread(
+            lambda: list(self.list(config, filter=filter, before=before, limit=limit))
+        )
+        for checkpoint_tuple in tuples:
+            yield checkpoint_tuple
+
+    async def aput(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        return await asyncio.to_thread(
+            self.put, config, checkpoint, metadata, new_versions
+        )
+
+    async def aput_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[tuple],
+        task_id: str,
+        task_path: str = "",
+    ) -> None:
+        await asyncio.to_thread(
+            self.put_writes, config, writes, task_id, task_path
+        )
+
+    def get_next_version(self, current: Optional[str], channel) -> str:
+        if current is None:
+            current_version = 0
+        elif isinstance(current, int):
+            current_version = current
+        else:
+            current_version = int(current.split(".")[0])
+        return f"{current_version + 1:032}.{random.random():016}"
+
+    def gc(self, max_age: float) -> dict:
+        """Delete the threads not checkpointed for max_age seconds."""
+        cutoff = time.time() - max_age
+        with self._lock:
+            threads = [
+                thread_id for (thread_id,) in self._connection.execute(
+                    "SELECT thread_id FROM checkpoints GROUP BY thread_id "
+                    "HAVING MAX(created_at) < ?",
+                    (cutoff,)
+                ).fetchall()
+            ]
+            for table in ("checkpoints", "channel_values", "writes"):
+                self._connection.executemany(
+                    f"DELETE FROM {table} WHERE thread_id = ?",
+                    [(thread_id,) for thread_id in threads]
+                )
+            self._connection.commit()
+        return {"threads_deleted": len(threads)}
+
+
+_checkpointer = None
+_checkpointer_lock = threading.Lock()
+
+
+def get_checkpointer() -> SQLiteCheckpointer:
+    """Get the process-wide checkpointer, opening it on first use."""
+    global _checkpointer
+    with _checkpointer_lock:
+        if _checkpointer is None:
+            _checkpointer = SQLiteCheckpointer()
+        return _checkpointer
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Delete the checkpoints of old threads."
+    )
+    parser.add_argument(
+        "--max-age-days", type=float, default=7,
+        help="Threads not checkpointed for this many days are deleted."
+    )
+    args = parser.parse_args()
+    print(get_checkpointer().gc(args.max_age_days * 24 * 3600))
@@ -0,0 +1,97 @@
+import hashlib
+import math
+import os
+from collections import Counter
+from typing import List
+
+from deep_researcher.utils.normalization import iter_chunks
+from deep_researcher.utils.query_index import query_tokens
+from deep_researcher.utils.tokens import estimate_tokens
+
+
+# Max number of tokens of search results put into a section writer prompt.
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", 3000))
+
+
+def bm25_scores(
+    query_terms: List[str], documents: List[List[str]],
+    k1: float = 1.5, b: float = 0.75
+) -> List[float]:
+    """BM25 score of every document for the query."""
+    if not documents:
+        return []
+    average_length = sum(len(document) for document in documents) / len(documents)
+    document_frequency = Counter(
+        term for document in documents for term in set(document)
+    )
+    scores = []
+    for document in documents:
+        term_frequency = Counter(document)
+        score = 0.0
+        for term in set(query_terms):
+            if term not in term_frequency:
+                continue
+            idf = math.log(
+                1 + (len(documents) - document_frequency[term] + 0.5)
+                / (document_frequency[term] + 0.5)
+            )
+            frequency = term_frequency[term]
+            score += idf * frequency * (k1 + 1) / (
+                frequency + k1 * (1 - b + b * len(document) / (average_length or 1))
+            )
+        scores.append(score)
+    return scores
+
+
+def pack_context(
+    search_results: List[dict],
+    section: str,
+    section_overview: str,
+    token_budget: int = CONTEXT_TOKEN_BUDGET
+) -> str:
+    """Pack the search results most relevant to a section into a prompt.
+
+    Results are split into chunks of whole sentences, ranked with BM25 against the section title
+    and overview, de-duplicated and added best first until the token budget
+    is spent. The chunks are grouped by source in a compact text format.
+    """
+    chunks = []
+    seen_chunks = set()
+    for result in search_results:
+        for chunk in iter_chunks(result["content"]):
+            fingerprint = hashlib.sha1(
+                " ".join(query_tokens(chunk)).encode()
+            ).hexdigest()
+            if fingerprint in seen_chunks:
+                continue
+            seen_chunks.add(fingerprint)
+            chunks.append((result, chunk))
+
+    scores = bm25_scores(
+        query_tokens(f"{section} {section} {section_overview}"),
+        [query_tokens(chunk) for _, chunk in chunks]
+    )
+    # chunks sharing no term with the section only fill the prompt
+    min_score = 0.0 if any(score > 0 for score in scores) else -1.0
+    selected_by_source = {}
+    used_tokens = 0
+    for score, (result, chunk) in sorted(
+        zip(scores, chunks), key=lambda scored: scored[0], reverse=True
+    ):
+        if score <= min_score:
+            break
+        chunk_tokens = estimate_tokens(chunk)
+        if used_tokens + chunk_tokens > token_budget:
+            continue
+        used_tokens += chunk_tokens
+        selected_by_source.setdefault(result["source"], (result, []))[1].append(chunk)
+
+    context = "\n\n".join(
+        f"[{idx + 1}] {result['title'] + ' ' if result['title'] else ''}({result['source']})\n"
+        + "\n".join(selected_chunks)
+        for idx, (result, selected_chunks) in enumerate(selected_by_source.values())
+    )
+    raw_tokens = estimate_tokens(str(search_results))
+    print(
+        f"Packed context for section {section} : {estimate_tokens(context)} tokens instead of {raw_tokens}, saved {raw_tokens - estimate_tokens(context)} tokens")
+    return context
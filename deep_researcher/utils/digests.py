@@ -0,0 +1,104 @@
+import functools
+import math
+import os
+import re
+from collections import Counter
+from typing import Dict, List
+
+from deep_researcher.utils.query_index import query_tokens
+from deep_researcher.utils.state import WrittenSection
+from deep_researcher.utils.tokens import estimate_tokens
+
+
+# Max number of tokens of written sections put into the prompt of a section
+# written without web search.
+DIGEST_TOKEN_BUDGET = int(os.getenv("DIGEST_TOKEN_BUDGET", 2000))
+# Tokens of a single section digest at least and at most.
+MIN_DIGEST_TOKENS = 80
+MAX_DIGEST_TOKENS = 400
+# Sources listed per digest.
+DIGEST_MAX_SOURCES = 5
+
+
+@functools.lru_cache(maxsize=1024)
+def summarize(title: str, content: str, token_budget: int) -> str:
+    """Extractive summary of a text within a token budget.
+
+    Sentences are scored by how frequent their terms are in the whole text
+    and whether they share terms with the title, the best ones are kept
+    within the budget and returned in their original order.
+    """
+    sentences = [
+        sentence for sentence in re.split(r"(?<=[.!?])\s+", content.strip())
+        if sentence
+    ]
+    if estimate_tokens(content) <= token_budget:
+        return " ".join(sentences)
+    term_frequency = Counter(
+        token for sentence in sentences for token in query_tokens(sentence)
+    )
+    title_tokens = set(query_tokens(title))
+    scores = []
+    for position, sentence in enumerate(sentences):
+        tokens = set(query_tokens(sentence))
+        score = sum(term_frequency[token] for token in tokens) / math.sqrt(
+            len(tokens) or 1
+        )
+        score *= 1 + len(tokens & title_tokens)
+        # leading sentences usually state what the section is about
+        scores.append(score * (1.5 if position == 0 else 1.0))
+
+    selected = []
+    used_tokens = 0
+    for score, position in sorted(
+        zip(scores, range(len(sentences))), reverse=True
+    ):
+        sentence_tokens = estimate_tokens(sentences[position])
+        if used_tokens + sentence_tokens > token_budget:
+            continue
+        used_tokens += sentence_tokens
+        selected.append(position)
+    return " ".join(sentences[position] for position in sorted(selected))
+
+
+def section_digests(
+    compiled_sections: List[WrittenSection],
+    token_budget: int = DIGEST_TOKEN_BUDGET
+) -> Dict[str, str]:
+    """Bounded digest of every written section, by title.
+
+    The budget is shared by the sections so that the digests of any subset
+    of them fit in it together, their title and source lines included.
+    Every summary gets at least MIN_DIGEST_TOKENS unless the sections are
+    too many for the budget, then they get an equal share of it.
+    """
+    headers = {}
+    for section in compiled_sections:
+        sources = list(dict.fromkeys(section.sources))[:DIGEST_MAX_SOURCES]
+        headers[section.title] = (
+            f"Section: {section.title}\nDigest: ",
+            f"\nSources: {sources}\n\n"
+        )
+    summary_budget = max(0, token_budget - sum(
+        estimate_tokens(head) + estimate_tokens(tail)
+        for head, tail in headers.values()
+    ))
+    share = summary_budget // max(1, len(compiled_sections))
+    per_section = min(
+        MAX_DIGEST_TOKENS,
+        max(MIN_DIGEST_TOKENS, share)
+        if MIN_DIGEST_TOKENS * len(compiled_sections) <= summary_budget else share
+    )
+    digests = {}
+    for section in compiled_sections:
+        head, tail = headers[section.title]
+        digests[section.title] = (
+            head + summarize(section.title, section.content, per_section) + tail
+        )
+    raw_tokens = sum(
+        estimate_tokens(section.content) for section in compiled_sections
+    )
+    digest_tokens = sum(estimate_tokens(digest) for digest in digests.values())
+    print(
+        f"Digested {len(digests)} written sections : {digest_tokens} tokens instead of {raw_tokens}")
+    return digests
@@ -0,0 +1,163 @@
+import argparse
+import hashlib
+import json
+import os
+import threading
+import time
+import zlib
+from typing import Dict, List, Optional
+
+from deep_researcher.utils.storage import CACHE_DIR, connect_sqlite
+
+
+DOCUMENT_STORE_PATH = os.getenv(
+    "DOCUMENT_STORE_PATH", os.path.join(CACHE_DIR, "documents.sqlite")
+)
+# Fields of a search result which identify its content.
+CONTENT_FIELDS = ("search_engine", "source", "title", "content")
+
+
+def document_id(document: dict) -> str:
+    """Content address of a search result document."""
+    content = json.dumps(
+        [document.get(field) for field in CONTENT_FIELDS], ensure_ascii=False
+    )
+    return hashlib.sha256(content.encode()).hexdigest()[:16]
+
+
+class DocumentStore:
+    """Content-addressed SQLite blob store of search result documents.
+
+    Graph states only carry the ids of the documents, so checkpoints stay
+    small however many results a run collects. Documents are linked to the
+    runs which retrieved them so that old runs can be garbage collected.
+    """
+
+    def __init__(self, path: str = DOCUMENT_STORE_PATH):
+        self._lock = threading.Lock()
+        self._connection = connect_sqlite(path)
+        self._connection.executescript(
+            """CREATE TABLE IF NOT EXISTS documents (
+                id TEXT PRIMARY KEY,
+                blob BLOB NOT NULL,
+                created_at REAL NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS run_documents (
+                run_id TEXT NOT NULL,
+                document_id TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                PRIMARY KEY (run_id, document_id)
+            );
+            CREATE INDEX IF NOT EXISTS run_documents_created_at
+                ON run_documents (created_at);"""
+        )
+        self._connection.commit()
+
+    def put_many(
+        self, documents: List[dict], run_id: Optional[str] = None
+    ) -> List[str]:
+        """Store the documents, returns their ids in the same order."""
+        now = time.time()
+        ids = [document_id(document) for document in documents]
+        with self._lock:
+            self._connection.executemany(
+                "INSERT OR IGNORE INTO documents VALUES (?, ?, ?)",
+                [
+                    (id_, zlib.compress(json.dumps(document).encode()), now)
+                    for id_, document in zip(ids, documents)
+                ]
+            )
+            if run_id is not None:
+                self._connection.executemany(
+                    "INSERT OR IGNORE INTO run_documents VALUES (?, ?, ?)",
+                    [(run_id, id_, now) for id_ in ids]
+                )
+            self._connection.commit()
+        return ids
+
+    def get_many(self, ids: List[str]) -> List[dict]:
+        """Get the documents of the ids, in order, skipping unknown and
+        repeated ids."""
+        ids = list(dict.fromkeys(ids))
+        documents = {}
+        with self._lock:
+            # stay under the SQLite limit of host parameters
+            for start in range(0, len(ids), 500):
+                batch = ids[start:start + 500]
+                rows = self._connection.execute(
+                    "SELECT id, blob FROM documents WHERE id IN "
+                    f"({','.join('?' * len(batch))})",
+                    batch
+                ).fetchall()
+                documents.update(
+                    (id_, json.loads(zlib.decompress(blob)))
+                    for id_, blob in rows
+                )
+        return [documents[id_] for id_ in ids if id_ in documents]
+
+    def fresh_ids(
+        self, ids: List[str], ttl_by_engine: Dict[str, float], default_ttl: float
+    ) -> List[str]:
+        """The ids of stored documents younger than the TTL of their search
+        engine, in order."""
+        ids = list(dict.fromkeys(ids))
+        if not ids:
+            return []
+        now = time.time()
+        with self._lock:
+            rows = self._connection.execute(
+                "SELECT id, blob, created_at FROM documents WHERE id IN "
+                f"({','.join('?' * len(ids))})",
+                ids
+            ).fetchall()
+        fresh = {
+            id_ for id_, blob, created_at in rows
+            if now - created_at <= ttl_by_engine.get(
+                json.loads(zlib.decompress(blob)).get("search_engine"), default_ttl
+            )
+        }
+        return [id_ for id_ in ids if id_ in fresh]
+
+    def gc(self, max_age: float) -> dict:
+        """Forget runs older than max_age seconds and delete the documents
+        no remaining run refers to."""
+        cutoff = time.time() - max_age
+        with self._lock:
+            runs = self._connection.execute(
+                "DELETE FROM run_documents WHERE run_id IN ("
+                "SELECT run_id FROM run_documents GROUP BY run_id "
+                "HAVING MAX(created_at) < ?)",
+                (cutoff,)
+            ).rowcount
+            documents = self._connection.execute(
+                "DELETE FROM documents WHERE created_at < ? AND id NOT IN ("
+                "SELECT document_id FROM run_documents)",
+                (cutoff,)
+            ).rowcount
+            self._connection.commit()
+        return {"run_links_deleted": runs, "documents_deleted": documents}
+
+
+_document_store = None
+_document_store_lock = threading.Lock()
+
+
+def get_document_store() -> DocumentStore:
+    """Get the process-wide document store, opening it on first use."""
+    global _document_store
+    with _document_store_lock:
+        if _document_store is None:
+            _document_store = DocumentStore()
+        return _document_store
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Garbage collect the documents of old runs."
+    )
+    parser.add_argument(
+        "--max-age-days", type=float, default=7,
+        help="Runs older than this many days are forgotten."
+    )
+    args = parser.parse_args()
+    print(get_document_store().gc(args.max_age_days * 24 * 3600))
@@ -0,0 +1,164 @@
+import functools
+import hashlib
+import json
+import os
+import re
+import threading
+from typing import List, Optional
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+import numpy as np
+
+from deep_researcher.utils.query_index import query_tokens
+
+
+# Constant of reciprocal-rank fusion, dampens the weight of the top ranks.
+RRF_K = 60
+# Search results kept per topic after fusion.
+FUSION_TOP_K = int(os.getenv("FUSION_TOP_K", 5))
+# Max differing SimHash bits of two near-duplicate contents, unrelated
+# contents differ in about half of the bits.
+SIMHASH_MAX_DISTANCE = int(os.getenv("SIMHASH_MAX_DISTANCE", 10))
+SIMHASH_BITS = 64
+_TRIGRAM_MULTIPLIERS = (
+    np.uint64(0x9E3779B97F4A7C15), np.uint64(0xC2B2AE3D27D4EB4F)
+)
+# Query parameters which only track where a visitor came from.
+TRACKING_PARAMETER_PATTERN = re.compile(
+    r"^(utm_\w+|gclid|fbclid|mc_cid|mc_eid|ref|ref_src|source)$"
+)
+
+
+def canonical_url(url: str) -> str:
+    """URL without the parts which do not change the page it points to."""
+    parts = urlsplit(url.strip())
+    host = parts.netloc.lower()
+    host = re.sub(r"^(www\.|m\.)", "", host).replace(".m.wikipedia.org", ".wikipedia.org")
+    path = re.sub(r"/+$", "", parts.path) or "/"
+    if host in ("arxiv.org", "export.arxiv.org"):
+        # abstract and pdf of every version are the same paper
+        host = "arxiv.org"
+        path = re.sub(r"^/(abs|pdf)/(.+?)(v\d+)?(\.pdf)?$", r"/abs/\2", path)
+    query = urlencode(sorted(
+        (key, value) for key, value in parse_qsl(parts.query)
+        if not TRACKING_PARAMETER_PATTERN.match(key)
+    ))
+    return urlunsplit(("https", host, path, query, ""))
+
+
+@functools.lru_cache(maxsize=65536)
+def _token_hash(token: str) -> int:
+    return int.from_bytes(
+        hashlib.blake2b(token.encode(), digest_size=8).digest(), "big"
+    )
+
+
+def simhash(text: str) -> Optional[int]:
+    """64 bit SimHash of the token trigrams of a text, None without
+    tokens."""
+    tokens = query_tokens(text)
+    if not tokens:
+        return None
+    hashes = np.array([_token_hash(token) for token in tokens], dtype=np.uint64)
+    if len(hashes) >= 3:
+        # trigram hashes combined from the token hashes, wrapping around
+        hashes = (
+            hashes[:-2] * _TRIGRAM_MULTIPLIERS[0]
+            + hashes[1:-1] * _TRIGRAM_MULTIPLIERS[1] + hashes[2:]
+        )
+        hashes ^= hashes >> np.uint64(29)
+    bits = hashes[:, None] >> np.arange(SIMHASH_BITS, dtype=np.uint64) & np.uint64(1)
+    # a bit is set when most shingle hashes have it set
+    majority = 2 * bits.sum(axis=0) > len(hashes)
+    return int(np.packbits(majority[::-1]).view(">u8")[0])
+
+
+def hamming_distance(first: int, second: int) -> int:
+    return bin(first ^ second).count("1")
+
+
+def _document_bytes(document: dict) -> int:
+    return len(json.dumps(document, ensure_ascii=False).encode())
+
+
+_stats = {
+    "documents_in": 0, "documents_kept": 0,
+    "duplicates_removed": 0, "ranked_out": 0, "bytes_removed": 0,
+    "cross_topic_duplicates_removed": 0
+}
+_stats_lock = threading.Lock()
+
+
+def _cluster(ranked_lists: List[List[dict]]) -> list:
+    """Clusters [score, document, simhash, canonical urls] of the
+    documents, best first."""
+    clusters = []
+    for ranked_list in ranked_lists:
+        for rank, document in enumerate(ranked_list):
+            score = 1 / (RRF_K + rank + 1)
+            url = canonical_url(document["source"]) if document.get("source") else None
+            fingerprint = simhash(document.get("content") or "")
+            for cluster in clusters:
+                if (url is not None and url in cluster[3]) or (
+                    fingerprint is not None and cluster[2] is not None
+                    and hamming_distance(fingerprint, cluster[2]) <= SIMHASH_MAX_DISTANCE
+                ):
+                    cluster[0] += score
+                    cluster[3].add(url)
+                    if len(document.get("content") or "") > len(cluster[1].get("content") or ""):
+                        cluster[1], cluster[2] = document, fingerprint
+                    break
+            else:
+                clusters.append([score, document, fingerprint, {url}])
+    # stable sort, ties keep the order the documents were found in
+    clusters.sort(key=lambda cluster: cluster[0], reverse=True)
+    return clusters
+
+
+def fuse_results(
+    ranked_lists: List[List[dict]], top_k: Optional[int] = FUSION_TOP_K
+) -> List[dict]:
+    """Fuse the ranked results of several searches into one list.
+
+    Documents are scored with reciprocal-rank fusion over the searches.
+    Documents with the same canonical URL or near-duplicate content are
+    merged, keeping the longest content and the sum of their scores, so
+    that documents found by several engines rank higher. The top_k best
+    documents are returned, best first.
+    """
+    clusters = _cluster(ranked_lists)
+    fused = [cluster[1] for cluster in clusters[:top_k]]
+    documents_in = sum(len(ranked_list) for ranked_list in ranked_lists)
+    bytes_in = sum(
+        _document_bytes(document)
+        for ranked_list in ranked_lists for document in ranked_list
+    )
+    bytes_removed = bytes_in - sum(_document_bytes(document) for document in fused)
+    with _stats_lock:
+        _stats["documents_in"] += documents_in
+        _stats["documents_kept"] += len(fused)
+        _stats["duplicates_removed"] += documents_in - len(clusters)
+        _stats["ranked_out"] += len(clusters) - len(fused)
+        _stats["bytes_removed"] += bytes_removed
+    if documents_in > len(fused):
+        print(
+            f"Fused {documents_in} search results into {len(fused)} : {documents_in - len(clusters)} duplicates, {len(clusters) - len(fused)} ranked out, {bytes_removed} bytes removed")
+    return fused
+
+
+def deduplicate(documents: List[dict]) -> List[dict]:
+    """The documents without near-duplicates, ranked as by fuse_results.
+
+    The documents were counted when their searches were fused, only the
+    duplicates removed here are added to the stats, under their own key.
+    """
+    deduplicated = [cluster[1] for cluster in _cluster([documents])]
+    with _stats_lock:
+        _stats["cross_topic_duplicates_removed"] += len(documents) - len(deduplicated)
+    return deduplicated
+
+
+def fusion_stats() -> dict:
+    """Search result documents fused and removed so far."""
+    with _stats_lock:
+        return dict(_stats)
@@ -0,0 +1,216 @@
+import asyncio
+import bisect
+import functools
+import math
+import os
+import threading
+import time
+from typing import Awaitable, Callable, Dict, List, Optional
+
+from deep_researcher.utils.search_router import ENGINE_TOOLS
+
+
+SEARCH_HEDGING = os.getenv("SEARCH_HEDGING", "1") != "0"
+# Percentile of the latencies of an engine after which a hedge is sent.
+HEDGE_PERCENTILE = float(os.getenv("HEDGE_PERCENTILE", 0.95))
+# Calls of an engine measured before its histogram sets the hedge delay.
+HEDGE_MIN_SAMPLES = 20
+# Seconds before a hedge while an engine has too few samples.
+HEDGE_DEFAULT_DELAY = float(os.getenv("HEDGE_DEFAULT_DELAY", 3))
+MIN_HEDGE_DELAY = 0.2
+# Seconds an engine may take before it is given up, each can be overridden
+# with <ENGINE>_DEADLINE environment variables.
+ENGINE_DEADLINES = {"tavily": 8, "arxiv": 10, "wikipedia": 6}
+# Engines tried in turn when an engine is slow, fails or finds nothing, as
+# "engine>fallback>...;...". An engine may fall back to itself to send a
+# duplicate request.
+SEARCH_FALLBACK_CHAINS = os.getenv(
+    "SEARCH_FALLBACK_CHAINS", "arxiv>tavily>wikipedia;tavily>wikipedia;wikipedia>tavily"
+)
+
+_TOOL_ENGINES = {tool: engine for engine, tool in ENGINE_TOOLS.items()}
+
+
+def engine_deadline(engine: str) -> float:
+    return float(os.getenv(
+        f"{engine.upper()}_DEADLINE", ENGINE_DEADLINES.get(engine, 10)
+    ))
+
+
+def fallback_chains(chains: str = SEARCH_FALLBACK_CHAINS) -> Dict[str, List[str]]:
+    """Search tools tried after every search tool, in order."""
+    tool_chains = {}
+    for chain in chains.split(";"):
+        engines = [engine.strip().lower() for engine in chain.split(">")]
+        if engines[0] in ENGINE_TOOLS:
+            tool_chains[ENGINE_TOOLS[engines[0]]] = [
+                ENGINE_TOOLS[engine] for engine in engines[1:]
+                if engine in ENGINE_TOOLS
+            ]
+    return tool_chains
+
+
+class LatencyHistogram:
+    """Latency histogram of an engine with log-spaced buckets.
+
+    Bucket bounds grow by 10% from 10ms to 2 minutes, so percentiles are
+    within 10% of the measured latencies in constant memory.
+    """
+
+    BOUNDS = [0.01 * 1.1 ** idx for idx in range(int(math.log(12000, 1.1)) + 1)]
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counts = [0] * (len(self.BOUNDS) + 1)
+        self.count = 0
+
+    def record(self, seconds: float):
+        with self._lock:
+            self.counts[bisect.bisect_left(self.BOUNDS, seconds)] += 1
+            self.count += 1
+
+    def percentile(self, percentile: float) -> Optional[float]:
+        """Upper bound of the bucket of the percentile, None when empty."""
+        with self._lock:
+            if not self.count:
+                return None
+            rank = percentile * self.count
+            seen = 0
+            for idx, count in enumerate(self.counts):
+                seen += count
+                if seen >= rank and count:
+                    return self.BOUNDS[min(idx, len(self.BOUNDS) - 1)]
+        return self.BOUNDS[-1]
+
+
+_histograms: Dict[str, LatencyHistogram] = {}
+_stats: Dict[str, Dict[str, int]] = {}
+_lock = threading.Lock()
+
+
+def get_histogram(engine: str) -> LatencyHistogram:
+    with _lock:
+        if engine not in _histograms:
+            _histograms[engine] = LatencyHistogram()
+        return _histograms[engine]
+
+
+def _count(tool_name: str, event: str):
+    engine = _TOOL_ENGINES.get(tool_name, tool_name)
+    with _lock:
+        stats = _stats.setdefault(engine, {
+            "calls": 0, "hedges": 0, "hedge_wins": 0,
+            "deadline_misses": 0, "failures": 0
+        })
+        stats[event] += 1
+
+
+def hedge_delay(engine: str) -> float:
+    """Seconds to wait for an engine before hedging it."""
+    deadline = engine_deadline(engine)
+    histogram = get_histogram(engine)
+    if histogram.count < HEDGE_MIN_SAMPLES:
+        return min(HEDGE_DEFAULT_DELAY, deadline)
+    return min(max(histogram.percentile(HEDGE_PERCENTILE), MIN_HEDGE_DELAY), deadline)
+
+
+def latency_recorded(engine: str) -> Callable:
+    """Record the latency of a search function in the histogram of its
+    engine, also when the caller stopped waiting for it."""
+    def decorator(search_function):
+        @functools.wraps(search_function)
+        def wrapper(query: str) -> List[dict]:
+            start = time.monotonic()
+            results = search_function(query)
+            get_histogram(engine).record(time.monotonic() - start)
+            return results
+        return wrapper
+    return decorator
+
+
+async def hedged_search(
+    tool_name: str,
+    call: Callable[[str], Awaitable[List[dict]]],
+    timeout: float
+) -> List[dict]:
+    """Results of the first engine of the fallback chain of a search tool
+    to answer, within timeout seconds.
+
+    The next engine of the chain is called when the last one called takes
+    longer than its hedge delay, fails or finds nothing, and an engine still
+    running after its deadline is given up. call(tool_name) runs a search
+    with the tool, the hedge delay, the deadline and the timeout count the
+    time it spends waiting for a rate limiter, so an engine stuck in its
+    queue is hedged like a slow one.
+    """
+    chain = [tool_name] + (fallback_chains().get(tool_name, []) if SEARCH_HEDGING else [])
+    start = time.monotonic()
+    running = {}  # task -> [position in the chain, deadline]
+    next_tool, hedge_at = 0, 0.0
+    error: Optional[BaseException] = None
+    try:
+        while True:
+            now = time.monotonic()
+            if next_tool < len(chain) and (now >= hedge_at or not running):
+                tool = chain[next_tool]
+                engine = _TOOL_ENGINES.get(tool, tool)
+                if next_tool > 0:
+                    _count(chain[0], "hedges")
+                _count(tool, "calls")
+                running[asyncio.ensure_future(call(tool))] = [
+                    next_tool, now + engine_deadline(engine)
+                ]
+                next_tool += 1
+                hedge_at = now + hedge_delay(engine)
+            if not running:
+                break
+            wake_at = min(
+                [start + timeout] + [deadline for _, deadline in running.values()]
+                + ([hedge_at] if next_tool < len(chain) else [])
+            )
+            done, _ = await asyncio.wait(
+                running, timeout=max(0.0, wake_at - time.monotonic()),
+                return_when=asyncio.FIRST_COMPLETED
+            )
+            for task in done:
+                position, _ = running.pop(task)
+                if task.exception() is not None:
+                    _count(chain[position], "failures")
+                    error = task.exception()
+                elif task.result():
+                    if position > 0:
+                        _count(chain[0], "hedge_wins")
+                    return task.result()
+                # failed or found nothing, try the next engine right away
+                hedge_at = 0.0
+            now = time.monotonic()
+            for task, (position, deadline) in list(running.items()):
+                if now >= deadline:
+                    _count(chain[position], "deadline_misses")
+                    task.cancel()
+                    del running[task]
+                    hedge_at = 0.0
+            if now >= start + timeout:
+                raise asyncio.TimeoutError(f"No engine answered {tool_name} in {timeout}s")
+    finally:
+        for task in running:
+            task.cancel()
+    if error is not None:
+        raise error
+    return []
+
+
+def hedging_stats() -> dict:
+    """Calls, hedges and latency percentiles of every engine."""
+    with _lock:
+        stats = {engine: dict(counts) for engine, counts in _stats.items()}
+        engines = list(_histograms)
+    for engine in engines:
+        histogram = get_histogram(engine)
+        stats.setdefault(engine, {}).update({
+            "latency_p50": histogram.percentile(0.5),
+            "latency_p95": histogram.percentile(0.95),
+            "latency_p99": histogram.percentile(0.99),
+            "hedge_delay": hedge_delay(engine),
+        })
+    return stats
@@ -0,0 +1,165 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from typing import Optional
+
+import numpy as np
+
+from deep_researcher.utils.storage import CACHE_DIR, connect_sqlite
+from deep_researcher.utils.vector_index import lexical_vector
+
+
+LLM_CACHE_PATH = os.getenv(
+    "LLM_CACHE_PATH", os.path.join(CACHE_DIR, "llm_cache.sqlite")
+)
+LLM_CACHE_ENABLED = os.getenv("LLM_CACHE_ENABLED", "1") != "0"
+# Least recently used responses are evicted above this many entries.
+LLM_CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", 5000))
+# Cosine similarity of the prompts above which a semantic lookup hits.
+SEMANTIC_THRESHOLD = float(os.getenv("LLM_CACHE_SEMANTIC_THRESHOLD", 0.95))
+# Cached prompts of a model configuration compared by a semantic lookup.
+SEMANTIC_CANDIDATES = 500
+
+
+def prompt_text(messages) -> str:
+    """Whitespace normalized text of the messages of a chat model call."""
+    messages = messages if isinstance(messages, list) else [messages]
+    return "\n".join(
+        f"{getattr(message, 'type', '')}: "
+        + " ".join(str(getattr(message, "content", message)).split())
+        for message in messages
+    )
+
+
+class LLMCache:
+    """On-disk cache of chat model responses.
+
+    Entries are keyed by the model configuration and the hash of the prompt.
+    Lookups may also fall back to the cached prompt of the same model
+    configuration most similar to the prompt, when close enough.
+    """
+
+    def __init__(
+        self,
+        path: str = LLM_CACHE_PATH,
+        max_entries: int = LLM_CACHE_MAX_ENTRIES,
+        semantic_threshold: float = SEMANTIC_THRESHOLD
+    ):
+        self.max_entries = max_entries
+        self.semantic_threshold = semantic_threshold
+        self.exact_hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._connection = connect_sqlite(path)
+        self._connection.executescript(
+            """CREATE TABLE IF NOT EXISTS llm_responses (
+                key TEXT PRIMARY KEY,
+                model_key TEXT NOT NULL,
+                vector BLOB NOT NULL,
+                response TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                last_access REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS llm_responses_model_key
+                ON llm_responses (model_key, last_access);
+            CREATE INDEX IF NOT EXISTS llm_responses_last_access
+                ON llm_responses (last_access);"""
+        )
+        self._connection.commit()
+
+    @staticmethod
+    def _key(model_key: str, prompt: str) -> str:
+        return hashlib.sha256(f"{model_key}\n{prompt}".encode()).hexdigest()
+
+    def _touch(self, key: str):
+        self._connection.execute(
+            "UPDATE llm_responses SET last_access = ? WHERE key = ?",
+            (time.time(), key)
+        )
+        self._connection.commit()
+
+    def _most_similar(self, model_key: str, prompt: str) -> Optional[tuple]:
+        rows = self._connection.execute(
+            "SELECT key, vector, response FROM llm_responses "
+            "WHERE model_key = ? ORDER BY last_access DESC LIMIT ?",
+            (model_key, SEMANTIC_CANDIDATES)
+        ).fetchall()
+        if not rows:
+            return None
+        vectors = np.stack([np.frombuffer(row[1], dtype=np.float32) for row in rows])
+        scores = vectors @ lexical_vector(prompt)
+        best = int(np.argmax(scores))
+        if scores[best] < self.semantic_threshold:
+            return None
+        return rows[best][0], rows[best][2]
+
+    def get(
+        self, model_key: str, prompt: str, semantic: bool = False
+    ) -> Optional[dict]:
+        """Get the cached response of a prompt, None when missing."""
+        key = self._key(model_key, prompt)
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT response FROM llm_responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is not None:
+                self.exact_hits += 1
+            elif semantic and (similar := self._most_similar(model_key, prompt)):
+                key, row = similar[0], (similar[1],)
+                self.semantic_hits += 1
+            else:
+                self.misses += 1
+                return None
+            self._touch(key)
+        return json.loads(row[0])
+
+    def set(self, model_key: str, prompt: str, response: dict):
+        """Cache the response of a prompt, evicting the least recently used."""
+        now = time.time()
+        with self._lock:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO llm_responses VALUES (?, ?, ?, ?, ?, ?)",
+                (
+                    self._key(model_key, prompt), model_key,
+                    lexical_vector(prompt).tobytes(), json.dumps(response), now, now
+                )
+            )
+            (count,) = self._connection.execute(
+                "SELECT COUNT(*) FROM llm_responses"
+            ).fetchone()
+            if count > self.max_entries:
+                self._connection.execute(
+                    "DELETE FROM llm_responses WHERE key IN ("
+                    "SELECT key FROM llm_responses "
+                    "ORDER BY last_access LIMIT ?)",
+                    (count - self.max_entries,)
+                )
+            self._connection.commit()
+
+    def stats(self) -> dict:
+        with self._lock:
+            (entries,) = self._connection.execute(
+                "SELECT COUNT(*) FROM llm_responses"
+            ).fetchone()
+            return {
+                "entries": entries,
+                "exact_hits": self.exact_hits,
+                "semantic_hits": self.semantic_hits,
+                "misses": self.misses
+            }
+
+
+_llm_cache = None
+_llm_cache_lock = threading.Lock()
+
+
+def get_llm_cache() -> LLMCache:
+    """Get the process-wide LLM response cache, opening it on first use."""
+    global _llm_cache
+    with _llm_cache_lock:
+        if _llm_cache is None:
+            _llm_cache = LLMCache()
+        return _llm_cache
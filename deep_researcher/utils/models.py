@@ -0,0 +1,398 @@
+import asyncio
+import os
+import threading
+import time
+from typing import Literal, Optional, Sequence, Type
+
+import httpx
+from langchain.chat_models import init_chat_model
+from langchain_core.messages import (
+    AIMessage, BaseMessage, message_to_dict, messages_from_dict
+)
+from langchain_core.runnables import Runnable
+from langchain_core.runnables.config import merge_configs
+from pydantic import BaseModel
+
+from deep_researcher.utils.llm_cache import (
+    LLM_CACHE_ENABLED, get_llm_cache, prompt_text
+)
+from deep_researcher.utils import replay
+from deep_researcher.utils.rate_limiter import (
+    ProviderRateLimiter, get_rate_limiter, is_rate_limit_error
+)
+from deep_researcher.utils.single_flight import SingleFlight, wait_for_flight
+from deep_researcher.utils.tokens import estimate_tokens
+
+
+# Providers whose langchain clients accept externally created httpx clients.
+HTTP_CLIENT_PROVIDERS = {"openai", "groq"}
+HTTP_POOL_LIMITS = httpx.Limits(
+    max_connections=100,
+    max_keepalive_connections=20,
+    keepalive_expiry=60
+)
+# Completion tokens reserved for a call without max_tokens.
+DEFAULT_COMPLETION_TOKENS = 512
+# Providers whose clients retry failed calls, 429s included, unless
+# max_retries is 0. RateLimitedModel retries them instead, so that every 429
+# reaches the rate limiter and lowers the concurrency.
+CLIENT_RETRY_PROVIDERS = {"openai", "groq", "google_genai"}
+# Retries of a call which was rate limited or failed transiently, after 1,
+# 2, 4... seconds.
+MODEL_CALL_RETRIES = int(os.getenv("MODEL_CALL_RETRIES", 4))
+RETRY_BACKOFF = 1.0
+# Errors of provider clients worth retrying besides rate limits.
+TRANSIENT_ERROR_NAMES = {
+    "APIConnectionError", "APITimeoutError", "InternalServerError",
+    "ServiceUnavailable", "DeadlineExceeded"
+}
+
+
+def is_retryable_error(error: BaseException) -> bool:
+    """Whether a failed chat model call is worth retrying."""
+    if not isinstance(error, Exception):
+        return False
+    status_code = getattr(error, "status_code", None)
+    return (
+        is_rate_limit_error(error)
+        or (isinstance(status_code, int) and status_code >= 500)
+        or isinstance(error, (ConnectionError, TimeoutError, httpx.TransportError))
+        or type(error).__name__ in TRANSIENT_ERROR_NAMES
+    )
+
+
+class RateLimitedModel(Runnable):
+    """Chat model client whose calls go through its provider's rate limiter.
+
+    Calls which were rate limited or failed transiently are retried with
+    exponential backoff, each attempt taking a new slot.
+    """
+
+    def __init__(
+        self, model: Runnable, limiter: ProviderRateLimiter,
+        max_tokens: Optional[int] = None
+    ):
+        self.model = model
+        self.limiter = limiter
+        self.max_tokens = max_tokens or DEFAULT_COMPLETION_TOKENS
+
+    def _reserved_tokens(self, input) -> int:
+        messages = input if isinstance(input, list) else [input]
+        return self.max_tokens + sum(
+            estimate_tokens(str(getattr(message, "content", message)))
+            for message in messages
+        )
+
+    @staticmethod
+    def _used_tokens(output) -> Optional[int]:
+        usage = getattr(output, "usage_metadata", None)
+        return usage["total_tokens"] if usage else None
+
+    @staticmethod
+    def _with_queue_time(config, usage: dict):
+        # read by the run profiler
+        return merge_configs(
+            config, {"metadata": {"queue_seconds": usage["wait_seconds"]}}
+        )
+
+    def invoke(self, input, config=None, **kwargs):
+        for attempt in range(MODEL_CALL_RETRIES + 1):
+            try:
+                with self.limiter.slot(self._reserved_tokens(input)) as usage:
+                    output = self.model.invoke(
+                        input, self._with_queue_time(config, usage), **kwargs
+                    )
+                    usage["used_tokens"] = self._used_tokens(output)
+                return output
+            except Exception as error:
+                if attempt == MODEL_CALL_RETRIES or not is_retryable_error(error):
+                    raise
+            time.sleep(RETRY_BACKOFF * 2 ** attempt)
+
+    async def ainvoke(self, input, config=None, **kwargs):
+        for attempt in range(MODEL_CALL_RETRIES + 1):
+            try:
+                async with self.limiter.aslot(self._reserved_tokens(input)) as usage:
+                    output = await self.model.ainvoke(
+                        input, self._with_queue_time(config, usage), **kwargs
+                    )
+                    usage["used_tokens"] = self._used_tokens(output)
+                return output
+            except Exception as error:
+                if attempt == MODEL_CALL_RETRIES or not is_retryable_error(error):
+                    raise
+            await asyncio.sleep(RETRY_BACKOFF * 2 ** attempt)
+
+
+def dump_output(output) -> dict:
+    """JSON-serializable form of a chat model client output."""
+    if isinstance(output, BaseMessage):
+        return {"message": message_to_dict(output)}
+    return {"schema": output.model_dump(mode="json")}
+
+
+def load_output(response: dict, schema: Optional[Type[BaseModel]] = None):
+    """Chat model client output from its dump_output form."""
+    if "message" in response:
+        return messages_from_dict([response["message"]])[0]
+    return schema.model_validate(response["schema"])
+
+
+# Cached model calls in progress by model configuration and prompt.
+llm_calls_in_flight = SingleFlight()
+
+
+class CachedModel(Runnable):
+    """Chat model client answering repeated prompts from the LLM cache.
+
+    With semantic lookups a prompt close enough to a cached prompt of the
+    same configuration gets its response too. A prompt asked while the same
+    prompt is being answered, e.g. by a speculative prefetch, waits for that
+    response instead of calling the model again.
+    """
+
+    def __init__(
+        self, model: Runnable, model_key: str,
+        schema: Optional[Type[BaseModel]] = None, semantic: bool = False
+    ):
+        self.model = model
+        self.model_key = model_key
+        self.schema = schema
+        self.semantic = semantic
+
+    def _finish(self, key, future, prompt: str, output):
+        response = dump_output(output)
+        try:
+            # cached first so that no caller misses both the cache and the call
+            get_llm_cache().set(self.model_key, prompt, response)
+        finally:
+            llm_calls_in_flight.finish(key, future, response)
+
+    def invoke(self, input, config=None, **kwargs):
+        prompt = prompt_text(input)
+        response = get_llm_cache().get(self.model_key, prompt, self.semantic)
+        if response is not None:
+            return load_output(response, self.schema)
+        key = (self.model_key, prompt)
+        is_new, future = llm_calls_in_flight.claim(key)
+        if not is_new:
+            return load_output(future.result(), self.schema)
+        try:
+            output = self.model.invoke(input, config, **kwargs)
+        except BaseException as error:
+            llm_calls_in_flight.finish(key, future, error=error)
+            raise
+        self._finish(key, future, prompt, output)
+        return output
+
+    async def ainvoke(self, input, config=None, **kwargs):
+        prompt = prompt_text(input)
+        response = get_llm_cache().get(self.model_key, prompt, self.semantic)
+        if response is not None:
+            return load_output(response, self.schema)
+        key = (self.model_key, prompt)
+        is_new, future = llm_calls_in_flight.claim(key)
+        if not is_new:
+            return load_output(await wait_for_flight(future), self.schema)
+        try:
+            output = await self.model.ainvoke(input, config, **kwargs)
+        except BaseException as error:
+            llm_calls_in_flight.finish(key, future, error=error)
+            raise
+        self._finish(key, future, prompt, output)
+        return output
+
+
+class ReplayModel(Runnable):
+    """Chat model client recording the calls of its model to the replay
+    fixtures, or replaying them without a model."""
+
+    def __init__(
+        self, model: Optional[Runnable], model_key: str,
+        schema: Optional[Type[BaseModel]] = None,
+        tool_names: Sequence[str] = ()
+    ):
+        self.model = model
+        self.model_key = model_key
+        self.schema = schema
+        self.tool_names = list(tool_names)
+
+    def _replay(self, prompt: str):
+        """The replayed output of a prompt and the seconds it takes."""
+        fixture = replay.get_fixture_store().get(
+            replay.fixture_key("llm", self.model_key, prompt)
+        )
+        if fixture is not None:
+            output = load_output(fixture["response"], self.schema)
+        elif not replay.REPLAY_SYNTHETIC:
+            raise LookupError(f"No replay fixture for {self.model_key}")
+        else:
+            response = replay.synthetic_llm_response(
+                prompt, self.schema.__name__ if self.schema else None,
+                self.tool_names
+            )
+            if self.schema is not None:
+                output = self.schema.model_validate(response)
+            else:
+                prompt_tokens = estimate_tokens(prompt)
+                completion_tokens = estimate_tokens(str(response))
+                output = AIMessage(**response, usage_metadata={
+                    "input_tokens": prompt_tokens,
+                    "output_tokens": completion_tokens,
+                    "total_tokens": prompt_tokens + completion_tokens
+                })
+        return output, replay.replay_seconds(fixture, replay.REPLAY_LLM_SECONDS)
+
+    def _record(self, prompt: str, output, seconds: float):
+        replay.get_fixture_store().put(
+            replay.fixture_key("llm", self.model_key, prompt), "llm",
+            self.model_key, prompt, dump_output(output), seconds
+        )
+
+    def invoke(self, input, config=None, **kwargs):
+        prompt = prompt_text(input)
+        if self.model is None:
+            output, seconds = self._replay(prompt)
+            time.sleep(seconds)
+            return output
+        start = time.perf_counter()
+        output = self.model.invoke(input, config, **kwargs)
+        self._record(prompt, output, time.perf_counter() - start)
+        return output
+
+    async def ainvoke(self, input, config=None, **kwargs):
+        prompt = prompt_text(input)
+        if self.model is None:
+            output, seconds = self._replay(prompt)
+            await asyncio.sleep(seconds)
+            return output
+        start = time.perf_counter()
+        output = await self.model.ainvoke(input, config, **kwargs)
+        self._record(prompt, output, time.perf_counter() - start)
+        return output
+
+
+class ModelRegistry:
+    """Process-wide cache of chat model clients.
+
+    Base clients are keyed by (model, temperature, max_tokens, extra kwargs)
+    and the clients bound to tools or an output schema are keyed on top of
+    those, so every worker asking for the same configuration gets the same
+    client and the same keep-alive HTTP pool.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._base_models = {}
+        self._models = {}
+        self._http_client = None
+        self._http_async_client = None
+        self.hits = 0
+        self.misses = 0
+
+    def _http_clients(self):
+        if self._http_client is None:
+            self._http_client = httpx.Client(limits=HTTP_POOL_LIMITS)
+            self._http_async_client = httpx.AsyncClient(
+                limits=HTTP_POOL_LIMITS
+            )
+        return self._http_client, self._http_async_client
+
+    def _base_model(self, model: str, temperature, max_tokens, kwargs: dict):
+        key = (model, temperature, max_tokens, tuple(sorted(kwargs.items())))
+        if key not in self._base_models:
+            if model.split(":")[0] in HTTP_CLIENT_PROVIDERS:
+                http_client, http_async_client = self._http_clients()
+                kwargs = {
+                    "http_client": http_client,
+                    "http_async_client": http_async_client,
+                    **kwargs
+                }
+            if max_tokens is not None:
+                kwargs = {"max_tokens": max_tokens, **kwargs}
+            if model.split(":")[0] in CLIENT_RETRY_PROVIDERS:
+                # retried by RateLimitedModel, see CLIENT_RETRY_PROVIDERS
+                kwargs = {"max_retries": 0, **kwargs}
+            self._base_models[key] = init_chat_model(
+                model=model,
+                temperature=temperature,
+                **kwargs
+            )
+        return self._base_models[key]
+
+    def get(
+        self,
+        model: str,
+        temperature: float = 0,
+        max_tokens: Optional[int] = None,
+        schema: Optional[Type[BaseModel]] = None,
+        tools: Optional[Sequence] = None,
+        cache: Optional[Literal["exact", "semantic"]] = None,
+        **kwargs
+    ):
+        """Get the chat model client of a configuration, creating it once.
+
+        Calls of a client with cache set are answered from the LLM response
+        cache when the same prompt, or with "semantic" a similar one, was
+        answered before.
+        """
+        key = (
+            model, temperature, max_tokens, schema,
+            tuple(tool.name for tool in tools) if tools else None,
+            tuple(sorted(kwargs.items())), cache
+        )
+        with self._lock:
+            if key in self._models:
+                self.hits += 1
+                return self._models[key]
+            self.misses += 1
+            tool_names = key[4] or ()
+            model_key = repr((
+                model, temperature, max_tokens,
+                schema.__name__ if schema else None, key[4], key[5]
+            ))
+            if replay.replaying():
+                # no client is created, so no credentials are needed
+                chat_model = ReplayModel(None, model_key, schema, tool_names)
+            else:
+                chat_model = self._base_model(
+                    model, temperature, max_tokens, kwargs
+                )
+                if tools:
+                    chat_model = chat_model.bind_tools(tools)
+                if schema is not None:
+                    chat_model = chat_model.with_structured_output(schema)
+                if replay.recording():
+                    chat_model = ReplayModel(
+                        chat_model, model_key, schema, tool_names
+                    )
+            chat_model = RateLimitedModel(
+                chat_model, get_rate_limiter(model.split(":")[0]), max_tokens
+            )
+            if cache is not None and LLM_CACHE_ENABLED:
+                # cache hits do not wait for the rate limiter
+                chat_model = CachedModel(
+                    chat_model, model_key, schema, cache == "semantic"
+                )
+            self._models[key] = chat_model
+            return chat_model
+
+    def stats(self) -> dict:
+        """Number of clients held and how often they were reused."""
+        with self._lock:
+            requests = self.hits + self.misses
+            return {
+                "base_clients": len(self._base_models),
+                "bound_clients": len(self._models),
+                "hits": self.hits,
+                "misses": self.misses,
+                "reuse_rate": self.hits / requests if requests else 0.0
+            }
+
+
+model_registry = ModelRegistry()
+
+
+def get_chat_model(model: str, **kwargs):
+    """Get a shared chat model client from the process-wide registry."""
+    return model_registry.get(model, **kwargs)
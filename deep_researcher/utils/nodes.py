@@ -1,13 +1,16 @@
 # general imports
-# import os
-from typing import Literal
+import asyncio
+import os
+import re
+import uuid
+from typing import List, Literal
 
 # langchain imports
-from langchain.chat_models import init_chat_model
 from langchain_core.messages import (
     SystemMessage,
     HumanMessage,
 )
+from langchain_core.runnables import RunnableConfig
 from langgraph.constants import Send
 from langgraph.types import interrupt, Command
 
@@ -16,31 +19,66 @@ from deep_researcher.utils.state import (
     SearchGraphState,
     ResearcherState,
     OrchestratorState,
-    TopicList, WrittenSection, PlannedSections
+    SectionSearches, SectionTopicsList, TopicSearch,
+    WrittenSection, PlannedSections, SectionPlan
 )
 
 # tools imports
 from deep_researcher.utils.tools import (
     search_arxiv, search_tavily,
-    search_wikipedia
+    search_wikipedia, SEARCH_TOOLS
+)
+from deep_researcher.utils.search_runner import run_tool_calls_ranked
+from deep_researcher.utils.fusion import deduplicate, fuse_results
+from deep_researcher.utils.search_router import planned_tool_calls
+from deep_researcher.utils.search_cache import normalize_query
+from deep_researcher.utils.query_index import (
+    get_query_index, release_query_index
+)
+from deep_researcher.utils.models import get_chat_model
+from deep_researcher.utils.context_packing import pack_context
+from deep_researcher.utils.streaming import assemble_report
+from deep_researcher.utils.digests import section_digests
+from deep_researcher.utils.document_store import get_document_store
+from deep_researcher.utils.speculation import (
+    SPECULATIVE_PREFETCH, Speculation,
+    start_speculation, resolve_speculation
+)
+from deep_researcher.utils.section_store import (
+    reusable_section, store_section
+)
+from deep_researcher.utils.vector_index import (
+    index_documents, local_documents, has_local_recall
 )
 
 
 # Node for Search Graph
-def create_search_query(state: SearchGraphState):
-    """Create a search query for the topic."""
-    llm_search_with_tools = init_chat_model(
+def search_query_llm():
+    return get_chat_model(
         model="openai:gpt-4o-mini",
         temperature=0,
         # max_tokens=500
-    ).bind_tools(
-        [search_wikipedia, search_tavily, search_arxiv]
+        tools=[search_wikipedia, search_tavily, search_arxiv],
+        cache="exact"
     )
-    out = llm_search_with_tools.invoke(
-        [
-            SystemMessage(content="You are a research assistant. You will be given a topic. Create a query that is helpful in searching the internet and will fetch meaningful information that helpful in writing. You can use the following tools to search the internet: Wikipedia, Tavily, Arxiv. Use the best tool to do search."),
-            HumanMessage(content=f"{state['topic']} in {state['of_section']}"),
-        ]
+
+
+def search_query_messages(topic: str, of_section: str) -> list:
+    return [
+        SystemMessage(content="You are a research assistant. You will be given a topic. Create a query that is helpful in searching the internet and will fetch meaningful information that helpful in writing. You can use the following tools to search the internet: Wikipedia, Tavily, Arxiv. Use the best tool to do search."),
+        HumanMessage(content=f"{topic} in {of_section}"),
+    ]
+
+
+def create_search_query(state: SearchGraphState):
+    """Create a search query for the topic, unless it was planned with the
+    topic."""
+    if state.get("search_tools_to_call"):
+        return {
+            "search_tools_to_call": state["search_tools_to_call"]
+        }
+    out = search_query_llm().invoke(
+        search_query_messages(state["topic"], state["of_section"])
     )
     return {
         "search_tools_to_call": out.tool_calls
@@ -48,6 +86,12 @@ def create_search_query(state: SearchGraphState):
 
 
 def call_search_tools(state: SearchGraphState):
+    """Run the tool calls of the topic, blocking until they are done."""
+    return asyncio.run(acall_search_tools(state))
+
+
+async def acall_search_tools(state: SearchGraphState):
+    """Run all the tool calls of the topic concurrently."""
     tool_calls = state["search_tools_to_call"]
     print(
         f"\n\nFor Section : {state['of_section']} For topic : {state['topic']} the tool calls are :\n")
@@ -56,105 +100,153 @@ def call_search_tools(state: SearchGraphState):
             f"Tool Name : {tool_call['name']} | Tool Args : {tool_call['args']['__arg1']}")
     print("\n\n")
 
-    search_results = []
+    queries_already_used = {
+        normalize_query(query)
+        for query in state["search_queries_already_used"]
+    }
+    tool_calls_to_run = []
     new_search_queries = set()
     for tool_call in tool_calls:
-        if tool_call["name"] == "search_wikipedia":
-            if tool_call["args"] in state["search_queries_already_used"]:
-                continue
-            else:
-                new_search_queries.add(tool_call["args"]["__arg1"])
-                search_results_from_wikipedia = search_wikipedia.invoke(
-                    tool_call["args"])
-                if len(search_results_from_wikipedia) > 0:
-                    search_results.extend(search_results_from_wikipedia)
-
-        elif tool_call["name"] == "search_tavily":
-            if tool_call["args"] in state["search_queries_already_used"]:
-                continue
-            else:
-                new_search_queries.add(tool_call["args"]["__arg1"])
-                search_results_from_tavily = search_tavily.invoke(
-                    tool_call["args"])
-                if len(search_results_from_tavily) > 0:
-                    search_results.extend(search_results_from_tavily)
-        elif tool_call["name"] == "search_arxiv":
-            if tool_call["args"] in state["search_queries_already_used"]:
-                continue
-            else:
-                new_search_queries.add(tool_call["args"]["__arg1"])
-                search_results_from_arxiv = search_arxiv.invoke(
-                    tool_call["args"])
-                if len(search_results_from_arxiv) > 0:
-                    search_results.extend(search_results_from_arxiv)
-        # elif tool_call["name"] == "search_google":
-        #     if tool_call["args"] in state["search_queries_already_used"]:
-        #         continue
-        #     else:
-        #         new_search_queries.add(tool_call["args"]["__arg1"])
-        #         search_results_from_google = search_google.invoke(
-        #             tool_call["args"])
-        #         if len(search_results_from_google) > 0:
-        #             search_results.extend(search_results_from_google)
+        if tool_call["name"] not in SEARCH_TOOLS:
+            continue
+        if normalize_query(tool_call["args"]["__arg1"]) in queries_already_used:
+            continue
+        new_search_queries.add(tool_call["args"]["__arg1"])
+        tool_calls_to_run.append(tool_call)
+
+    # one ranked list per engine, fused into the best results of the topic
+    search_results = fuse_results(await run_tool_calls_ranked(
+        tool_calls_to_run,
+        query_index=get_query_index(state.get("run_id"))
+    ))
+    search_result_ids = get_document_store().put_many(
+        search_results, state.get("run_id")
+    )
+    index_documents(search_result_ids, search_results)
 
     print("tool calls done")
     return {
-        "search_results": search_results,
+        "search_results": search_result_ids,
         "search_queries_already_used": list(new_search_queries)
     }
 
 
 # Nodes for Researcher Graph
-def get_important_topics(state: ResearcherState):
-    """Get important topics from the research worker."""
-    topic_identifying_llm = init_chat_model(
+# Search the engine and query planned with every topic, instead of asking
+# the search query LLM for them topic by topic.
+FUSED_SEARCH_PLANNING = os.getenv("FUSED_SEARCH_PLANNING", "1") != "0"
+SEARCH_PLANNING_PROMPT = " For every topic also give the search engine best suited to it, wikipedia, arxiv or tavily, and a query to search it with."
+
+
+def important_topics_llm():
+    return get_chat_model(
         model="google_genai:gemini-1.5-flash",
         temperature=0,
-        max_tokens=500
-    ).with_structured_output(TopicList)
-    out = topic_identifying_llm.invoke(
-        [
-            SystemMessage(content="Given a section title and overview. Identify the topics which will be helpful to search the internet to better understanf the section. The topics must be less than 3 and must be relevant to the section."),
-            HumanMessage(
-                content=f"Section: {state['section']}\nSection Overview: {state['section_overview']}"),
-        ]
+        max_tokens=500,
+        schema=SectionSearches,
+        # the topics, engines and queries are specific to the section, a
+        # similar section must not get them
+        cache="exact"
     )
-    print(
-        f"\n\nThe topics identified for the Section {state['section']} are :\n {out.topics}\n\n")
+
+
+def important_topics_messages(section: str, section_overview: str) -> list:
+    return [
+        SystemMessage(content="Given a section title and overview. Identify the topics which will be helpful to search the internet to better understanf the section. The topics must be less than 3 and must be relevant to the section." + SEARCH_PLANNING_PROMPT),
+        HumanMessage(
+            content=f"Section: {section}\nSection Overview: {section_overview}"),
+    ]
+
+
+def researcher_topics(searches: List[TopicSearch], of_section: str) -> dict:
+    """Topics of a section and the search tool calls planned for them."""
+    planned_searches = planned_tool_calls(searches, of_section)
     return {
-        "topics_of_section": out.topics
+        "topics_of_section": list(planned_searches),
+        "planned_searches": planned_searches if FUSED_SEARCH_PLANNING else {}
     }
 
 
-def assign_search_workers(state: ResearcherState) -> Command[Literal["execute_search_graph"]]:
-    """Assign search workers to the topics."""
+def get_important_topics(state: ResearcherState):
+    """Get important topics and their searches from the research worker,
+    unless they were extracted with the topics of the other sections."""
+    if state.get("topics_of_section"):
+        return {
+            "topics_of_section": state["topics_of_section"]
+        }
+    out = important_topics_llm().invoke(
+        important_topics_messages(state["section"], state["section_overview"])
+    )
+    topics = researcher_topics(out.searches, state["section"])
+    print(
+        f"\n\nThe topics identified for the Section {state['section']} are :\n {topics['topics_of_section']}\n\n")
+    return topics
+
+
+def assign_search_workers(state: ResearcherState) -> Command[Literal["execute_search_graph", "section_writer"]]:
+    """Assign search workers to the topics the local index knows too little
+    about."""
     print("\n\nAssigning search workers to the topics.\n\n")
+    topics_to_search = []
+    for topic in state["topics_of_section"]:
+        if has_local_recall(f"{topic} {state['section']}"):
+            print(f"Topic {topic} is answered from the local index.")
+        else:
+            topics_to_search.append(topic)
+    if not topics_to_search:
+        return Command(goto="section_writer")
     return Command(
         goto=[Send("execute_search_graph", {
             "topic": topic,
-            "of_section": state["section"]
-        }) for topic in state["topics_of_section"]
+            "of_section": state["section"],
+            "search_tools_to_call": (
+                state.get("planned_searches") or {}
+            ).get(topic, []),
+            "run_id": state.get("run_id")
+        }) for topic in topics_to_search
         ]
     )
 
 
-def section_writer(state: ResearcherState):
+def section_writer(state: ResearcherState, config: RunnableConfig):
     """Synthesize the section."""
     print(f"\n\nWriting the section : {state['section']}.\n\n")
-    section_writer_llm = init_chat_model(
+    # documents of earlier runs on the section and its topics
+    local_document_ids = [
+        document_id
+        for query in [f"{state['section']} {state['section_overview']}"] + [
+            f"{topic} {state['section']}"
+            for topic in state.get("topics_of_section", [])
+        ]
+        for document_id in local_documents(query)
+    ]
+    # topics of a section often retrieve the same pages
+    search_results_context = pack_context(
+        deduplicate(get_document_store().get_many(
+            state["search_results"] + local_document_ids
+        )),
+        state["section"], state["section_overview"]
+    )
+    section_writer_llm = get_chat_model(
         model="google_genai:gemini-1.5-flash",
         temperature=0.2,
         max_tokens=2048,
-    ).with_structured_output(WrittenSection)
+        schema=WrittenSection
+    )
 
     out = section_writer_llm.invoke(
         [
             SystemMessage(content="You are a research assistant. You will be given a section title and overview. You will be given search results, filter them and select the useful ones to write the content of the section."),
             HumanMessage(
-                content=f"Section: {state['section']}\nSection Overview: {state['section_overview']}\n  Search Results: {state['search_results']}"),
-        ]
+                content=f"Section: {state['section']}\nSection Overview: {state['section_overview']}\n  Search Results:\n{search_results_context}"),
+        ],
+        config={"metadata": {"section": state["section"]}}
     )
     print(f"\n\nThe section {state['section']} is written.\n\n")
+    store_section(
+        config, state.get("main_topic", ""), state["section"],
+        state["section_overview"], out, state["search_results"]
+    )
     return {
         "compiled_sections": [out]
     }
@@ -164,11 +256,12 @@ def section_writer(state: ResearcherState):
 def generate_plan(state: OrchestratorState):
     """Generate an outline for the report."""
     # print("Generating plan using deepseek")
-    planner_llm = init_chat_model(
+    planner_llm = get_chat_model(
         model="groq:deepseek-r1-distill-qwen-32b",
         temperature=0.2,
         max_tokens=2048,
-        max_retries=3
+        max_retries=3,
+        cache="exact"
     )
     if "feedback_on_report_plan" in state:
         system_message = SystemMessage(content="You are a research assistant. You will be given a main topic, an outline, previously generated plan and human feedback. You will generate an updated plan considering the feedback. The plan must have sections and an overview for every section. Overview should cover the main points of the section.")
@@ -188,14 +281,29 @@ def generate_plan(state: OrchestratorState):
     }
 
 
-def human_feedback_on_plan(state: OrchestratorState):
+def human_feedback_on_plan(state: OrchestratorState, config: RunnableConfig):
     """Get human feedback on the plan."""
+    speculative = config.get("configurable", {}).get(
+        "speculative_prefetch", SPECULATIVE_PREFETCH
+    )
+    speculation_key = f"{config.get('configurable', {}).get('thread_id')}:{state['plan_in_text']}"
+    if speculative:
+        # prefetch while the human reviews the plan, the node is run again
+        # on resume so the speculation is only started once
+        start_speculation(
+            speculation_key, prefetch_plan,
+            state["plan_in_text"], state["main_topic"], config
+        )
     feedback = interrupt(
         f"Please provide feedback on the plan: \n\n{state['plan_in_text']}\n\n Input 'Accept' to approve the plan or provide feedback to regenerate the plan:",
     )
     print(f"\n\nFeedback on the plan: {feedback}")
     print(type(feedback))
     print("\n\n")
+    if speculative:
+        resolve_speculation(
+            speculation_key, accepted=feedback.strip().lower() == "accept"
+        )
     return {
         "feedback_on_report_plan": feedback
     }
@@ -210,30 +318,159 @@ def check_human_feedback_router(state: OrchestratorState):
         return "plan_rejected"
 
 
+def plan_schema_llm():
+    return get_chat_model(
+        model="openai:gpt-4o",
+        max_tokens=2048,
+        temperature=0,
+        schema=PlannedSections,
+        cache="exact"
+    )
+
+
+def plan_schema_messages(plan_in_text: str) -> list:
+    return [
+        SystemMessage(
+            content="You are a research assistant. You will be given a plan for a report. You will extract the schema out of the plan. The plan must have sections, an overview and whether web search is required or not for each section. Sections which are about conclusion or references do not require web search. For a section which does not require web search, list the titles of the sections it builds on, or none if it can be written from the plan alone. Also keep the section names as provided do not change them."),
+        HumanMessage(content=f"Plan: {plan_in_text}"),
+    ]
+
+
+# Sections whose topics are extracted in one structured call.
+TOPIC_BATCH_SIZE = int(os.getenv("TOPIC_BATCH_SIZE", 8))
+BATCHED_TOPIC_EXTRACTION = os.getenv("BATCHED_TOPIC_EXTRACTION", "1") != "0"
+
+
+def section_topics_llm():
+    return get_chat_model(
+        model="google_genai:gemini-1.5-flash",
+        temperature=0,
+        max_tokens=1500,
+        schema=SectionTopicsList,
+        cache="exact"
+    )
+
+
+def section_topics_messages(sections: List[SectionPlan]) -> list:
+    return [
+        SystemMessage(content="Given the titles and overviews of the sections of a report. For every section identify the topics which will be helpful to search the internet to better understand the section. The topics must be less than 3 per section and must be relevant to the section. Keep the section titles as provided." + SEARCH_PLANNING_PROMPT),
+        HumanMessage(content="\n\n".join(
+            f"Section: {section.title}\nSection Overview: {section.overview}"
+            for section in sections
+        )),
+    ]
+
+
+def batched_section_searches(sections: List[SectionPlan]) -> dict:
+    """Topics and searches of the sections by title, extracted with one
+    structured call per TOPIC_BATCH_SIZE sections.
+
+    Sections of a call which failed or which are missing from its answer
+    are left out, their researcher extracts their topics on its own.
+    """
+    if not BATCHED_TOPIC_EXTRACTION or not sections:
+        return {}
+    chunks = [
+        sections[start:start + TOPIC_BATCH_SIZE]
+        for start in range(0, len(sections), TOPIC_BATCH_SIZE)
+    ]
+    outs = section_topics_llm().batch(
+        [section_topics_messages(chunk) for chunk in chunks],
+        return_exceptions=True
+    )
+    searches = {}
+    for chunk, out in zip(chunks, outs):
+        if isinstance(out, Exception):
+            print(
+                f"Topic extraction of {len(chunk)} sections failed, extracting them one by one : {out!r}")
+            continue
+        answered = {
+            normalize_query(section.title): section.searches
+            for section in out.sections if section.searches
+        }
+        for section in chunk:
+            if normalize_query(section.title) in answered:
+                searches[section.title] = answered[normalize_query(section.title)]
+    print(
+        f"Extracted the topics of {len(searches)} of {len(sections)} sections in {len(chunks)} calls.")
+    return searches
+
+
 def generate_plan_schema(state: OrchestratorState):
     """Extract the schema out of a plan mentioned in text."""
     print("Fitting plan into a schema")
-    structured_planner = init_chat_model(
-        model="openai:gpt-4o",
-        max_tokens=2048,
-        temperature=0
-    ).with_structured_output(PlannedSections)
-    structured_plan = structured_planner.invoke(
-        [
-            SystemMessage(
-                content="You are a research assistant. You will be given a plan for a report. You will extract the schema out of the plan. The plan must have sections, an overview and whether web search is required or not for each section. Sections which are about conclusion or references do not require web search.Also keep the section names as provided do not change them."),
-            HumanMessage(content=f"Plan: {state['plan_in_text']}"),
-        ]
+    structured_plan = plan_schema_llm().invoke(
+        plan_schema_messages(state["plan_in_text"])
     )
     # print("The structured plan is :\n:")
     # for section in structured_plan.sections:
     #     print(
     #         f"Section: {section.title}\nOverview: {section.overview}\nWeb Search Required: {section.web_search_required}\n\n")
     return {
-        "structured_plan": structured_plan.sections
+        "structured_plan": structured_plan.sections,
+        "run_id": str(uuid.uuid4()),
+        "rewritten_web_search_sections": []
     }
 
 
+# Speculative prefetch of a plan under review. The tasks make the same
+# calls as the nodes, so once the plan is accepted the nodes are answered
+# from the LLM response cache and the search cache.
+def prefetch_plan(
+    speculation: Speculation, plan_in_text: str, main_topic: str,
+    config: RunnableConfig
+):
+    """Extract the draft schema of the plan."""
+    structured_plan = plan_schema_llm().invoke(
+        plan_schema_messages(plan_in_text)
+    )
+    sections = [
+        section for section in structured_plan.sections
+        if section.web_search_required is True and reusable_section(
+            config, main_topic, section.title, section.overview
+        ) is None
+    ]
+    searches = batched_section_searches(sections)
+    for section in sections:
+        if section.title not in searches:
+            speculation.submit(prefetch_section, section)
+            continue
+        prefetch_topics(speculation, searches[section.title], section.title)
+
+
+def prefetch_section(speculation: Speculation, section):
+    """Identify the topics of a draft section."""
+    out = important_topics_llm().invoke(
+        important_topics_messages(section.title, section.overview)
+    )
+    prefetch_topics(speculation, out.searches, section.title)
+
+
+def prefetch_topics(
+    speculation: Speculation, searches: List[TopicSearch], of_section: str
+):
+    topics = researcher_topics(searches, of_section)
+    for topic in topics["topics_of_section"]:
+        if topic not in topics["planned_searches"]:
+            speculation.submit(prefetch_topic, topic, of_section)
+            continue
+        for tool_call in topics["planned_searches"][topic]:
+            speculation.submit(prefetch_search, tool_call)
+
+
+def prefetch_topic(speculation: Speculation, topic: str, of_section: str):
+    """Warm the search cache with the searches of a topic."""
+    out = search_query_llm().invoke(search_query_messages(topic, of_section))
+    for tool_call in out.tool_calls:
+        if tool_call["name"] in SEARCH_TOOLS:
+            speculation.submit(prefetch_search, tool_call)
+
+
+def prefetch_search(speculation: Speculation, tool_call: dict):
+    # a worker searching the same query meanwhile waits for these results
+    SEARCH_TOOLS[tool_call["name"]].invoke(tool_call["args"]["__arg1"])
+
+
 def web_search_required_routing(state: OrchestratorState):
     """Assign initial section writing to the research worker."""
     print("\n\n Assigning writing workers to the sections which require web search.\n\n")
@@ -243,68 +480,229 @@ def web_search_required_routing(state: OrchestratorState):
     return "no_web_search_required"
 
 
-def assign_web_search_writing_workers(state: OrchestratorState) -> Command[Literal["write_sections_with_search"]]:
-    """Assign search workers to the topics."""
+# Titles of sections which can be written from the plan alone.
+INDEPENDENT_SECTION_PATTERN = re.compile(
+    r"\b(introduction|overview|background|scope|motivation|abstract|outline)\b",
+    re.IGNORECASE
+)
+
+
+def independent_sections(structured_plan: List[SectionPlan]) -> set:
+    """Titles of the sections without web search which do not build on any
+    other section."""
+    return {
+        section.title for section in structured_plan
+        if section.web_search_required is False and (
+            section.depends_on == [] or (
+                section.depends_on is None
+                and INDEPENDENT_SECTION_PATTERN.search(section.title)
+            )
+        )
+    }
+
+
+def normalized_title(title: str) -> str:
+    """Title of a section without case, punctuation or numbering, so titles
+    paraphrased by the LLM still match."""
+    title = re.sub(r"[^\w\s]", " ", title.lower())
+    title = re.sub(r"^\s*(section\s+)?\d+\b", " ", title)
+    return " ".join(title.split())
+
+
+def section_dependencies(
+    section: SectionPlan, structured_plan: List[SectionPlan]
+) -> List[str]:
+    """Titles of the sections a section without web search builds on, as
+    declared in the plan schema or else all web search sections."""
+    independent = independent_sections(structured_plan)
+    if section.title in independent:
+        return []
+    web_search_sections = [
+        planned.title for planned in structured_plan
+        if planned.web_search_required is True
+    ]
+    if not section.depends_on:
+        return web_search_sections
+    # only sections written before this one can be built on
+    available = {
+        normalized_title(planned.title): planned.title
+        for planned in structured_plan
+        if planned.title != section.title and (
+            planned.web_search_required is True or planned.title in independent
+        )
+    }
+    dependencies, dropped = [], []
+    for title in section.depends_on:
+        match = available.get(normalized_title(title))
+        if match is None:
+            dropped.append(title)
+        elif match not in dependencies:
+            dependencies.append(match)
+    if dropped:
+        print(f"Section {section.title} cannot build on : {', '.join(dropped)}.")
+    return dependencies or web_search_sections
+
+
+def format_plan(structured_plan: List[SectionPlan]) -> str:
+    return "".join(
+        f"Section: {section.title}\nPlanned Overview: {section.overview}\n\n"
+        for section in structured_plan
+    )
+
+
+def no_web_search_writing_worker(
+    state: OrchestratorState, node: str, section: SectionPlan,
+    dependencies: List[str], written_sections_changed: bool
+) -> Send:
+    """Send a section without web search to a writer, with the digests of
+    the written sections it builds on or else the plan."""
+    digests = state.get("section_digests") or {}
+    written_dependencies = [
+        digests[title] for title in dependencies if title in digests
+    ]
+    return Send(
+        node,
+        {
+            "main_topic": state["main_topic"],
+            "section": section.title,
+            "section_overview": section.overview,
+            "combined_written_sections": (
+                "".join(written_dependencies)
+                if written_dependencies else format_plan(state["structured_plan"])
+            ),
+            "search_results": state["search_results"],
+            "written_sections_changed": written_sections_changed,
+            "section_dependencies": dependencies
+        }
+    )
+
+
+def assign_web_search_writing_workers(state: OrchestratorState, config: RunnableConfig) -> Command[Literal["write_sections_with_search", "write_independent_sections", "combine_written_sections"]]:
+    """Assign writing workers to the sections which require web search,
+    reusing the sections of an earlier plan whose title and overview did not
+    change. The sections which only build on the plan are written alongside."""
     print("\n\n Assigning writing workers to the sections which require web search.\n\n")
-    return Command(goto=[
+    reused_sections, reused_search_results, sections = [], [], []
+    for section in state["structured_plan"]:
+        if section.web_search_required is not True:
+            continue
+        reusable = reusable_section(
+            config, state["main_topic"], section.title, section.overview
+        )
+        if reusable is not None:
+            reused_sections.append(reusable[0])
+            reused_search_results.extend(reusable[1])
+            continue
+        sections.append(section)
+    # one call for the topics of all the sections instead of one per section
+    searches = batched_section_searches(sections)
+    sends = [
         Send(
             "write_sections_with_search",
             {
+                "main_topic": state["main_topic"],
                 "section": section.title,
                 "section_overview": section.overview,
-                "search_results": state["search_results"]
+                **researcher_topics(searches.get(section.title, []), section.title),
+                "search_results": state["search_results"],
+                "run_id": state["run_id"]
             }
         )
-        for section in state["structured_plan"]
-        if section.web_search_required is True
-    ])
+        for section in sections
+    ]
+    print(
+        f"Reusing {len(reused_sections)} unchanged sections, writing {len(sends)} sections.")
+    update = {
+        "compiled_sections": reused_sections,
+        "search_results": reused_search_results,
+        "rewritten_web_search_sections": [send.arg["section"] for send in sends]
+    }
+    if not sends:
+        return Command(update=update, goto="combine_written_sections")
+    independent = independent_sections(state["structured_plan"])
+    independent_sends = []
+    for section in state["structured_plan"]:
+        if section.title not in independent:
+            continue
+        # an independent section only depends on its own title and overview
+        changed = reusable_section(
+            config, state["main_topic"], section.title, section.overview
+        ) is None
+        independent_sends.append(no_web_search_writing_worker(
+            state, "write_independent_sections", section, [], changed
+        ))
+        if changed:
+            update["rewritten_web_search_sections"].append(section.title)
+    return Command(update=update, goto=sends + independent_sends)
 
 
 def combine_written_sections(state: OrchestratorState):
-    """Combine the written sections."""
+    """Digest the written sections once for the sections built on them."""
     print("\n\n Combining the already written sections.\n\n")
-    web_searched_written_section_info = ""
-    for section in state["compiled_sections"]:
-        web_searched_written_section_info += f"Section: {section.title}\nContent: {section.content}\nSources: {section.sources}\n\n"
+    digests = section_digests(state["compiled_sections"])
     return {
-        "combined_written_sections": web_searched_written_section_info
+        "section_digests": digests,
+        "combined_written_sections": "".join(digests.values())
     }
 
 
 def assign_no_web_search_writing_workers(state: OrchestratorState):
-    """Assign search workers to the topics."""
+    """Assign writing workers to the sections which do not require web
+    search and were not written alongside the web search sections, each with
+    the sections it depends on."""
     print("\n\n Assigning writing workers to the sections which do not require web search.\n\n")
-    return [
-        Send(
-            "write_sections_without_search",
-            {
-                "section": section.title,
-                "section_overview": section.overview,
-                "combined_written_sections": state["combined_written_sections"],
-                "search_results": state["search_results"]
-            }
-        )
-        for section in state["structured_plan"]
-        if section.web_search_required is False
-    ]
-
-
-def write_sections_without_search(state: ResearcherState):
-    """Write the remaining sections which do not require web search."""
+    rewritten = state.get("rewritten_web_search_sections", [])
+    independent = independent_sections(state["structured_plan"])
+    sends = []
+    for section in state["structured_plan"]:
+        if section.web_search_required is not False:
+            continue
+        if rewritten and section.title in independent:
+            # already written by write_independent_sections
+            continue
+        dependencies = section_dependencies(section, state["structured_plan"])
+        sends.append(no_web_search_writing_worker(
+            state, "write_sections_without_search", section, dependencies,
+            any(title in rewritten for title in dependencies)
+        ))
+    return sends or "write_final_report"
+
+
+def write_sections_without_search(state: ResearcherState, config: RunnableConfig):
+    """Write a section which does not require web search from the sections
+    it builds on."""
     print("\n\n Writing the sections which do not require web search.\n\n")
+    # the section only needs rewriting if it or a section it uses changed
+    if not state.get("written_sections_changed", True):
+        reusable = reusable_section(
+            config, state.get("main_topic", ""), state["section"],
+            state["section_overview"], state.get("section_dependencies", [])
+        )
+        if reusable is not None:
+            print(f"Reusing the unchanged section : {state['section']}.")
+            return {
+                "compiled_sections": [reusable[0]]
+            }
     web_searched_written_section_info = state["combined_written_sections"]
-    section_writer_llm = init_chat_model(
+    section_writer_llm = get_chat_model(
         model="google_genai:gemini-1.5-flash",
         temperature=0.2,
         max_tokens=2048,
-    ).with_structured_output(WrittenSection)
+        schema=WrittenSection
+    )
     out = section_writer_llm.invoke(
         [
             SystemMessage(
                 content="You are a research assistant. You will be given a section title and overview and already written sections to write the content of this section."),
             HumanMessage(
                 content=f"Section: {state['section']}\nSection Overview: {state['section_overview']}\n  Written Sections : {web_searched_written_section_info}"),
-        ]
+        ],
+        config={"metadata": {"section": state["section"]}}
+    )
+    store_section(
+        config, state.get("main_topic", ""), state["section"],
+        state["section_overview"], out, [],
+        state.get("section_dependencies", [])
     )
     return {
         "compiled_sections": [out]
@@ -313,25 +711,10 @@ def write_sections_without_search(state: ResearcherState):
 
 def write_final_report(state: OrchestratorState):
     """Write the final report."""
-    compiled_sections = {
-        s.title: s.content
-        for s in state["compiled_sections"]
-    }
-    final_report = ""
-    for section in state["structured_plan"]:
-        final_report += f"Section: {section.title}\nContent: {compiled_sections[section.title]}\n\n"
-
-    all_sources = list(set(
-        [
-            source
-            for section in state["compiled_sections"]
-            for source in section.sources
-        ]
-    ))
-    sources_string = ""
-    for idx, source in enumerate(all_sources):
-        sources_string += f"{idx + 1}. {source}\n"
-    final_report += f"\n\nSources:\n {sources_string}"
+    final_report = assemble_report(
+        state["structured_plan"], state["compiled_sections"]
+    )
+    release_query_index(state.get("run_id"))
 
     return {
         "final_report": final_report
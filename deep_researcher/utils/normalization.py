@@ -0,0 +1,113 @@
+import os
+import re
+import threading
+from typing import Iterator, Tuple
+
+from deep_researcher.utils.tokens import estimate_bpe_tokens
+
+
+# Tokens of the content of a search result kept at most for every engine,
+# each can be overridden with <ENGINE>_TOKEN_CAP environment variables.
+ENGINE_TOKEN_CAPS = {"tavily": 400, "arxiv": 500, "wikipedia": 500}
+DEFAULT_TOKEN_CAP = 500
+# Tokens of a chunk of a document at most.
+CHUNK_TOKENS = int(os.getenv("CHUNK_TOKENS", 150))
+# A sentence, or the rest of a paragraph without an end of sentence.
+SENTENCE_PATTERN = re.compile(
+    r"\S.*?(?:[.!?][\"')\]]*(?=\s)|(?=\n[ \t]*\n)|$)", re.DOTALL
+)
+PARAGRAPH_BREAK_PATTERN = re.compile(r"[ \t]*\n[ \t]*\n")
+
+
+def engine_token_cap(engine: str) -> int:
+    return int(os.getenv(
+        f"{engine.upper()}_TOKEN_CAP", ENGINE_TOKEN_CAPS.get(engine, DEFAULT_TOKEN_CAP)
+    ))
+
+
+def iter_pieces(text: str, max_tokens: int) -> Iterator[Tuple[str, int, bool]]:
+    """Sentences of a text with their tokens and whether they end a
+    paragraph, as they are found.
+
+    Whitespace is collapsed, and sentences longer than max_tokens are split
+    between words.
+    """
+    for match in SENTENCE_PATTERN.finditer(text):
+        words = match.group().split()
+        ends_paragraph = PARAGRAPH_BREAK_PATTERN.match(text, match.end()) is not None
+        sentence = " ".join(words)
+        tokens = estimate_bpe_tokens(sentence)
+        if tokens <= max_tokens:
+            yield sentence, tokens, ends_paragraph
+            continue
+        piece, piece_tokens = [], 0
+        for word in words:
+            word_tokens = estimate_bpe_tokens(word)
+            if piece and piece_tokens + word_tokens > max_tokens:
+                yield " ".join(piece), piece_tokens, False
+                piece, piece_tokens = [], 0
+            piece.append(word)
+            piece_tokens += word_tokens
+        if piece:
+            yield " ".join(piece), piece_tokens, ends_paragraph
+
+
+def iter_chunks(text: str, chunk_tokens: int = CHUNK_TOKENS) -> Iterator[str]:
+    """Chunks of whole sentences of a text of at most chunk_tokens, as they
+    are found.
+
+    A chunk also ends with its paragraph once it is half full.
+    """
+    chunk, used_tokens = [], 0
+    for sentence, tokens, ends_paragraph in iter_pieces(text, chunk_tokens):
+        if chunk and used_tokens + tokens > chunk_tokens:
+            yield " ".join(chunk)
+            chunk, used_tokens = [], 0
+        chunk.append(sentence)
+        used_tokens += tokens
+        if ends_paragraph and used_tokens >= chunk_tokens // 2:
+            yield " ".join(chunk)
+            chunk, used_tokens = [], 0
+    if chunk:
+        yield " ".join(chunk)
+
+
+def truncate_tokens(text: str, max_tokens: int) -> Tuple[str, int, bool]:
+    """Leading whole sentences of a text within max_tokens, their tokens and
+    whether the text was cut.
+
+    The text after the last sentence kept is not read.
+    """
+    kept, used_tokens = [], 0
+    for sentence, tokens, _ in iter_pieces(text, max_tokens):
+        if used_tokens + tokens > max_tokens:
+            return " ".join(kept), used_tokens, True
+        kept.append(sentence)
+        used_tokens += tokens
+    return " ".join(kept), used_tokens, False
+
+
+_stats = {
+    "documents": 0, "truncated": 0,
+    "chars_in": 0, "chars_out": 0, "tokens_out": 0
+}
+_stats_lock = threading.Lock()
+
+
+def normalize_content(text: str, engine: str) -> str:
+    """Content of a search result of an engine with collapsed whitespace,
+    cut to whole sentences within the token cap of the engine."""
+    content, tokens, truncated = truncate_tokens(text, engine_token_cap(engine))
+    with _stats_lock:
+        _stats["documents"] += 1
+        _stats["truncated"] += truncated
+        _stats["chars_in"] += len(text)
+        _stats["chars_out"] += len(content)
+        _stats["tokens_out"] += tokens
+    return content
+
+
+def normalization_stats() -> dict:
+    """Search result contents normalized and truncated so far."""
+    with _stats_lock:
+        return dict(_stats)
@@ -0,0 +1,191 @@
+import asyncio
+import atexit
+import os
+import re
+import threading
+from typing import List, Optional
+
+import aiohttp
+from lxml import etree
+
+
+PAGE_FETCH_TIMEOUT = float(os.getenv("PAGE_FETCH_TIMEOUT", 10))
+# Bytes of a page read at most, the rest of the response is dropped.
+MAX_PAGE_BYTES = int(os.getenv("MAX_PAGE_BYTES", 1_000_000))
+PAGE_FETCH_CONNECTIONS = int(os.getenv("PAGE_FETCH_CONNECTIONS", 64))
+PAGE_FETCH_PER_HOST = int(os.getenv("PAGE_FETCH_PER_HOST", 4))
+READ_CHUNK_BYTES = 16384
+# Elements whose text is not part of the content of a page.
+SKIPPED_TAGS = {
+    "script", "style", "noscript", "template", "svg", "head", "nav",
+    "header", "footer", "aside", "form", "iframe", "button"
+}
+MAIN_TAGS = {"main", "article"}
+# Without a main element, stop once the page text is this many times the
+# characters needed, since the content may still follow the boilerplate.
+PAGE_TEXT_FACTOR = 3
+USER_AGENT = "Mozilla/5.0 (compatible; deep-researcher)"
+
+
+class MainTextTarget:
+    """lxml parser target collecting the text of a page as it is parsed.
+
+    No tree is built: text inside <main> or <article> is kept apart from the
+    rest of the page text, and text of boilerplate elements is dropped.
+    """
+
+    def __init__(self, max_chars: int):
+        self.max_chars = max_chars
+        self.skip_depth = 0
+        self.main_depth = 0
+        self.seen_main = False
+        self.main_parts = []
+        self.page_parts = []
+        self.main_chars = 0
+        self.page_chars = 0
+
+    def start(self, tag, attrib):
+        if self.skip_depth or tag in SKIPPED_TAGS:
+            self.skip_depth += 1
+        elif tag in MAIN_TAGS:
+            self.main_depth += 1
+            self.seen_main = True
+
+    def end(self, tag):
+        if self.skip_depth:
+            self.skip_depth -= 1
+        elif tag in MAIN_TAGS and self.main_depth:
+            self.main_depth -= 1
+
+    def data(self, data):
+        if self.skip_depth or not data.strip():
+            return
+        self.page_parts.append(data)
+        self.page_chars += len(data)
+        if self.main_depth:
+            self.main_parts.append(data)
+            self.main_chars += len(data)
+
+    def comment(self, text):
+        pass
+
+    def close(self):
+        return self.text()
+
+    @property
+    def done(self) -> bool:
+        """Whether enough text was collected to stop reading the page."""
+        if self.seen_main:
+            return self.main_chars >= self.max_chars
+        return self.page_chars >= PAGE_TEXT_FACTOR * self.max_chars
+
+    def text(self) -> str:
+        parts = self.main_parts if self.main_chars else self.page_parts
+        return re.sub(r"\s+", " ", " ".join(parts)).strip()[:self.max_chars]
+
+
+class PageFetcher:
+    """Pooled, concurrent fetching of the main text of web pages.
+
+    One aiohttp session with a connection pool serves every fetch of the
+    process. It lives on a background event loop so that blocking search
+    tools running in worker threads share it too. Responses are read in
+    chunks and parsed incrementally, and the read stops as soon as enough
+    text was extracted or MAX_PAGE_BYTES were read.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._session: Optional[aiohttp.ClientSession] = None
+
+    def _get_loop(self) -> asyncio.AbstractEventLoop:
+        with self._lock:
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                threading.Thread(
+                    target=self._loop.run_forever,
+                    name="page-fetcher", daemon=True
+                ).start()
+                atexit.register(self.close)
+            return self._loop
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        # only called on the background loop
+        if self._session is None:
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(
+                    limit=PAGE_FETCH_CONNECTIONS,
+                    limit_per_host=PAGE_FETCH_PER_HOST,
+                    ttl_dns_cache=300
+                ),
+                timeout=aiohttp.ClientTimeout(total=PAGE_FETCH_TIMEOUT),
+                headers={"User-Agent": USER_AGENT}
+            )
+        return self._session
+
+    async def _fetch_text(self, url: str, max_chars: int) -> str:
+        try:
+            async with self._get_session().get(url) as response:
+                if response.status != 200 or "html" not in response.content_type:
+                    return ""
+                target = MainTextTarget(max_chars)
+                parser = etree.HTMLParser(
+                    target=target, encoding=response.charset
+                )
+                read = 0
+                async for chunk in response.content.iter_chunked(READ_CHUNK_BYTES):
+                    parser.feed(chunk)
+                    read += len(chunk)
+                    if target.done or read >= MAX_PAGE_BYTES:
+                        break
+                try:
+                    parser.close()
+                except etree.Error:
+                    pass
+                return target.text()
+        except (aiohttp.ClientError, asyncio.TimeoutError, etree.Error, LookupError) as e:
+            print(f"Fetching {url} failed : {e!r}")
+            return ""
+
+    async def _fetch_many(self, urls: List[str], max_chars: int) -> List[str]:
+        return await asyncio.gather(
+            *(self._fetch_text(url, max_chars) for url in urls)
+        )
+
+    def fetch_many(self, urls: List[str], max_chars: int = 1000) -> List[str]:
+        """Fetch the pages concurrently, returns the first max_chars
+        characters of the main text of each, "" for failed fetches."""
+        return asyncio.run_coroutine_threadsafe(
+            self._fetch_many(urls, max_chars), self._get_loop()
+        ).result()
+
+    async def afetch_many(self, urls: List[str], max_chars: int = 1000) -> List[str]:
+        """Async version of fetch_many."""
+        return await asyncio.wrap_future(
+            asyncio.run_coroutine_threadsafe(
+                self._fetch_many(urls, max_chars), self._get_loop()
+            )
+        )
+
+    def close(self):
+        """Close the connection pool."""
+        if self._loop is None or self._session is None:
+            return
+        asyncio.run_coroutine_threadsafe(
+            self._session.close(), self._loop
+        ).result(timeout=5)
+        self._session = None
+
+
+_page_fetcher = None
+_page_fetcher_lock = threading.Lock()
+
+
+def get_page_fetcher() -> PageFetcher:
+    """Get the process-wide page fetcher."""
+    global _page_fetcher
+    with _page_fetcher_lock:
+        if _page_fetcher is None:
+            _page_fetcher = PageFetcher()
+        return _page_fetcher
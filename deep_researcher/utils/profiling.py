@@ -0,0 +1,319 @@
+import json
+import threading
+import time
+from collections import defaultdict
+from typing import Dict, List, Optional
+from uuid import UUID
+
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.runnables.config import var_child_runnable_config
+from langgraph.errors import GraphInterrupt
+
+
+# USD per million (input, output) tokens, matched against the model name.
+MODEL_PRICES = {
+    "gpt-4o-mini": (0.15, 0.60),
+    "gpt-4o": (2.50, 10.00),
+    "gemini-1.5-flash": (0.075, 0.30),
+    "deepseek-r1-distill-qwen-32b": (0.69, 0.69),
+}
+
+
+def estimate_cost(model: str, prompt_tokens: int, completion_tokens: int) -> float:
+    """Estimated USD cost of a chat model call."""
+    for name, (input_price, output_price) in MODEL_PRICES.items():
+        if name in model:
+            return (
+                prompt_tokens * input_price + completion_tokens * output_price
+            ) / 1e6
+    return 0.0
+
+
+def _payload_bytes(payload) -> int:
+    try:
+        return len(json.dumps(payload, default=str))
+    except (TypeError, ValueError):
+        return len(str(payload))
+
+
+def record_queue_time(seconds: float):
+    """Add time spent waiting for a rate limiter to the current run."""
+    config = var_child_runnable_config.get() or {}
+    callbacks = config.get("callbacks")
+    for handler in getattr(callbacks, "handlers", []):
+        if isinstance(handler, RunProfiler):
+            handler.add_queue_time(callbacks.parent_run_id, seconds)
+
+
+class RunProfiler(BaseCallbackHandler):
+    """Callback handler profiling a graph run.
+
+    Records a span for every graph, graph node, chat model call and tool
+    call of the run with its wall time, queue time, tokens, payload bytes
+    and estimated cost. Pass it in the callbacks of the run config.
+    """
+
+    run_inline = True
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.spans: Dict[UUID, dict] = {}
+        # parent of every run, including the runs without a span
+        self._parents: Dict[UUID, Optional[UUID]] = {}
+
+    def _span_parent(self, parent_run_id: Optional[UUID]) -> Optional[UUID]:
+        while parent_run_id is not None and parent_run_id not in self.spans:
+            parent_run_id = self._parents.get(parent_run_id)
+        return parent_run_id
+
+    def _start(self, run_id, parent_run_id, name: str, kind: str, **fields):
+        with self._lock:
+            self._parents[run_id] = parent_run_id
+            self.spans[run_id] = {
+                "name": name,
+                "kind": kind,
+                "parent": self._span_parent(parent_run_id),
+                "start": time.time(),
+                "end": None,
+                "queue_seconds": 0.0,
+                "prompt_tokens": 0,
+                "completion_tokens": 0,
+                "cost": 0.0,
+                "payload_bytes": 0,
+                "error": None,
+                **fields
+            }
+
+    def _end(self, run_id, **fields):
+        with self._lock:
+            span = self.spans.get(run_id)
+            if span is not None:
+                span["end"] = time.time()
+                span.update(fields)
+
+    def add_queue_time(self, run_id: Optional[UUID], seconds: float):
+        with self._lock:
+            span_id = self._span_parent(run_id)
+            if span_id is not None:
+                self.spans[span_id]["queue_seconds"] += seconds
+
+    # graphs and graph nodes
+    def on_chain_start(
+        self, serialized, inputs, *, run_id, parent_run_id=None,
+        tags=None, metadata=None, **kwargs
+    ):
+        name = kwargs.get("name") or (serialized or {}).get("name", "")
+        metadata = metadata or {}
+        with self._lock:
+            parent_span = self.spans.get(self._span_parent(parent_run_id))
+        if parent_run_id is None:
+            self._start(run_id, parent_run_id, name, "graph")
+        elif name == metadata.get("langgraph_node") and not (
+            # the runnable wrapped by a node is named after the node
+            parent_span and parent_span["kind"] == "node"
+            and parent_span["name"] == name
+        ):
+            self._start(run_id, parent_run_id, name, "node")
+        else:
+            with self._lock:
+                self._parents[run_id] = parent_run_id
+
+    def on_chain_end(self, outputs, *, run_id, **kwargs):
+        if run_id in self.spans:
+            self._end(run_id, payload_bytes=_payload_bytes(outputs))
+
+    def on_chain_error(self, error, *, run_id, **kwargs):
+        if run_id in self.spans:
+            # an interrupt waiting for human input is not a failure
+            self._end(
+                run_id,
+                error=None if isinstance(error, GraphInterrupt) else repr(error)
+            )
+
+    # chat model calls
+    def on_chat_model_start(
+        self, serialized, messages, *, run_id, parent_run_id=None,
+        tags=None, metadata=None, **kwargs
+    ):
+        params = kwargs.get("invocation_params") or {}
+        model = str(
+            params.get("model_name") or params.get("model")
+            or (serialized or {}).get("name", "chat_model")
+        )
+        self._start(
+            run_id, parent_run_id, model, "llm",
+            queue_seconds=(metadata or {}).get("queue_seconds", 0.0),
+            payload_bytes=sum(
+                len(str(message.content))
+                for message_list in messages for message in message_list
+            )
+        )
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        prompt_tokens = completion_tokens = 0
+        for generations in response.generations:
+            for generation in generations:
+                usage = getattr(
+                    getattr(generation, "message", None), "usage_metadata", None
+                )
+                if usage:
+                    prompt_tokens += usage.get("input_tokens", 0)
+                    completion_tokens += usage.get("output_tokens", 0)
+        if not prompt_tokens and response.llm_output:
+            token_usage = response.llm_output.get("token_usage") or {}
+            prompt_tokens = token_usage.get("prompt_tokens", 0)
+            completion_tokens = token_usage.get("completion_tokens", 0)
+        span = self.spans.get(run_id)
+        if span is not None:
+            self._end(
+                run_id,
+                prompt_tokens=prompt_tokens,
+                completion_tokens=completion_tokens,
+                cost=estimate_cost(span["name"], prompt_tokens, completion_tokens)
+            )
+
+    def on_llm_error(self, error, *, run_id, **kwargs):
+        self._end(run_id, error=repr(error))
+
+    # search tool calls
+    def on_tool_start(
+        self, serialized, input_str, *, run_id, parent_run_id=None,
+        tags=None, metadata=None, **kwargs
+    ):
+        name = kwargs.get("name") or (serialized or {}).get("name", "tool")
+        self._start(run_id, parent_run_id, name, "tool")
+
+    def on_tool_end(self, output, *, run_id, **kwargs):
+        self._end(run_id, payload_bytes=_payload_bytes(output))
+
+    def on_tool_error(self, error, *, run_id, **kwargs):
+        self._end(run_id, error=repr(error))
+
+    # reports
+    def _children(self) -> Dict[Optional[UUID], List[UUID]]:
+        children = defaultdict(list)
+        for span_id, span in self.spans.items():
+            children[span["parent"]].append(span_id)
+        return children
+
+    @staticmethod
+    def _critical_chain(span_ids: List[UUID], spans: Dict[UUID, dict]) -> List[UUID]:
+        """Walk back from the span which finished last, each time to the
+        span which finished last before the current one started."""
+        chain = []
+        remaining = sorted(span_ids, key=lambda span_id: spans[span_id]["end"])
+        cursor = float("inf")
+        while remaining:
+            candidates = [
+                span_id for span_id in remaining
+                if spans[span_id]["end"] <= cursor
+            ]
+            if not candidates:
+                break
+            chain.append(candidates[-1])
+            cursor = spans[candidates[-1]]["start"]
+            remaining = candidates[:-1]
+        return chain[::-1]
+
+    def critical_path(self) -> List[dict]:
+        """Spans on the critical path of the run, in order, with their depth
+        in the orchestrator -> researcher -> searcher fan-out."""
+        with self._lock:
+            spans = {
+                span_id: dict(span) for span_id, span in self.spans.items()
+                if span["end"] is not None
+            }
+        children = self._children()
+        path = []
+
+        def visit(span_ids, depth):
+            for span_id in self._critical_chain(span_ids, spans):
+                span = spans[span_id]
+                path.append({
+                    "name": span["name"],
+                    "kind": span["kind"],
+                    "depth": depth,
+                    "seconds": span["end"] - span["start"]
+                })
+                visit(
+                    [child for child in children[span_id] if child in spans],
+                    depth + 1
+                )
+
+        visit([span_id for span_id in children[None] if span_id in spans], 0)
+        return path
+
+    def folded_stacks(self) -> Dict[str, float]:
+        """Wall seconds per stack of span names, in flame graph folded format."""
+        stacks = defaultdict(float)
+        with self._lock:
+            for span in self.spans.values():
+                if span["end"] is None:
+                    continue
+                names = [span["name"]]
+                parent = span["parent"]
+                while parent is not None:
+                    names.append(self.spans[parent]["name"])
+                    parent = self.spans[parent]["parent"]
+                stacks[";".join(reversed(names))] += span["end"] - span["start"]
+        return dict(stacks)
+
+    def profile(self) -> dict:
+        """Per-stage totals, critical path and spans of the run."""
+        stages = defaultdict(lambda: {
+            "calls": 0, "wall_seconds": 0.0, "queue_seconds": 0.0,
+            "prompt_tokens": 0, "completion_tokens": 0,
+            "payload_bytes": 0, "cost": 0.0, "errors": 0
+        })
+        with self._lock:
+            spans = [dict(span) for span in self.spans.values()]
+        for span in spans:
+            stage = stages[f"{span['kind']}:{span['name']}"]
+            stage["calls"] += 1
+            if span["end"] is not None:
+                stage["wall_seconds"] += span["end"] - span["start"]
+            for field in (
+                "queue_seconds", "prompt_tokens", "completion_tokens",
+                "payload_bytes", "cost"
+            ):
+                stage[field] += span[field]
+            stage["errors"] += span["error"] is not None
+        starts = [span["start"] for span in spans]
+        ends = [span["end"] for span in spans if span["end"] is not None]
+        return {
+            "wall_seconds": max(ends) - min(starts) if ends else 0.0,
+            "total_cost": sum(stage["cost"] for stage in stages.values()),
+            "stages": dict(stages),
+            "critical_path": self.critical_path(),
+            "spans": [
+                {**span, "parent": str(span["parent"]) if span["parent"] else None}
+                for span in spans
+            ]
+        }
+
+    def summary(self) -> str:
+        """Flame-style text summary of the run."""
+        stacks = self.folded_stacks()
+        total = max(stacks.values(), default=0.0) or 1.0
+        lines = ["Wall time by stack:"]
+        for stack, seconds in sorted(stacks.items()):
+            depth = stack.count(";")
+            bar = "#" * max(1, int(40 * seconds / total))
+            lines.append(
+                f"{'  ' * depth}{stack.split(';')[-1]:<{40 - 2 * depth}} {seconds:8.2f}s {bar}")
+        lines.append("\nCritical path:")
+        lines.extend(
+            f"{'  ' * (step['depth'] + 1)}{step['kind']}:{step['name']} {step['seconds']:.2f}s"
+            for step in self.critical_path()
+        )
+        profile = self.profile()
+        lines.append(
+            f"\nTotal wall time {profile['wall_seconds']:.2f}s, estimated cost ${profile['total_cost']:.4f}")
+        return "\n".join(lines)
+
+    def write(self, path: str):
+        """Write the profile to path as JSON and the summary next to it."""
+        with open(path, "w") as f:
+            json.dump(self.profile(), f, indent=2, default=str)
+        with open(path.rsplit(".", 1)[0] + ".txt", "w") as f:
+            f.write(self.summary() + "\n")
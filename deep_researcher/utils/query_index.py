@@ -0,0 +1,140 @@
+import hashlib
+import random
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Optional, Tuple
+
+from deep_researcher.utils.search_cache import normalize_query
+
+
+STOP_WORDS = frozenset(
+    "a an and are as at be by for from how in is it of on or that the this "
+    "to was what when where which who why with".split()
+)
+NUM_PERMUTATIONS = 128
+# Estimated Jaccard similarity above which two queries are the same search.
+NEAR_DUPLICATE_THRESHOLD = 0.7
+# (a * x + b) mod prime hash permutations, seeded to be stable across runs.
+_MERSENNE_PRIME = (1 << 61) - 1
+_random = random.Random(0)
+_PERMUTATIONS = [
+    (_random.randrange(1, _MERSENNE_PRIME), _random.randrange(_MERSENNE_PRIME))
+    for _ in range(NUM_PERMUTATIONS)
+]
+# Number of runs whose query index is kept in memory.
+MAX_RUNS = 64
+
+
+def _strip_plural(token: str) -> str:
+    if len(token) > 3 and token.endswith("s") and not token.endswith("ss"):
+        return token[:-1]
+    return token
+
+
+def query_tokens(query: str) -> list:
+    """Tokens of a normalized query without stop words and plurals."""
+    return [
+        _strip_plural(token) for token in normalize_query(query).split()
+        if token not in STOP_WORDS
+    ]
+
+
+def query_shingles(tokens: list) -> set:
+    """Unigram and bigram token shingles of a query."""
+    return set(tokens) | {
+        f"{first} {second}" for first, second in zip(tokens, tokens[1:])
+    }
+
+
+def minhash(shingles: set) -> Tuple[int, ...]:
+    """MinHash signature of a set of shingles."""
+    hashes = [
+        int.from_bytes(
+            hashlib.blake2b(shingle.encode(), digest_size=8).digest(), "big"
+        )
+        for shingle in shingles
+    ]
+    return tuple(
+        min((a * value + b) % _MERSENNE_PRIME for value in hashes)
+        for a, b in _PERMUTATIONS
+    )
+
+
+def estimated_similarity(first: Tuple[int, ...], second: Tuple[int, ...]) -> float:
+    """Jaccard similarity estimated from two MinHash signatures."""
+    return sum(a == b for a, b in zip(first, second)) / NUM_PERMUTATIONS
+
+
+class QueryIndex:
+    """Searches issued during one orchestrator run, shared by its workers.
+
+    Every search is claimed before it is executed. The first worker to claim
+    a query runs it and publishes the results on a future, later workers
+    issuing the same or a near-duplicate query wait on that future instead
+    of searching again.
+    """
+
+    def __init__(self, threshold: float = NEAR_DUPLICATE_THRESHOLD):
+        self.threshold = threshold
+        self._lock = threading.Lock()
+        self._exact = {}
+        self._signatures = {}
+        self.executed = 0
+        self.reused = 0
+
+    def claim(self, engine: str, query: str) -> Tuple[bool, Future]:
+        """Claim a search, returns whether the caller must run it and the
+        future carrying its results."""
+        tokens = query_tokens(query) or normalize_query(query).split()
+        # the same words in another order are the same search
+        key = (engine, " ".join(sorted(set(tokens))))
+        with self._lock:
+            future = self._exact.get(key)
+            if future is None and tokens:
+                signature = minhash(query_shingles(tokens))
+                for (other_engine, _), (other_signature, other_future) in (
+                    self._signatures.items()
+                ):
+                    if other_engine == engine and estimated_similarity(
+                        signature, other_signature
+                    ) >= self.threshold:
+                        future = other_future
+                        break
+            if future is not None:
+                self._exact.setdefault(key, future)
+                self.reused += 1
+                return False, future
+            future = Future()
+            self._exact[key] = future
+            if tokens:
+                self._signatures[key] = (signature, future)
+            self.executed += 1
+            return True, future
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"executed": self.executed, "reused": self.reused}
+
+
+_query_indexes = OrderedDict()
+_query_indexes_lock = threading.Lock()
+
+
+def get_query_index(run_id: Optional[str]) -> QueryIndex:
+    """Get the query index of a run, a private one when there is no run."""
+    if run_id is None:
+        return QueryIndex()
+    with _query_indexes_lock:
+        if run_id not in _query_indexes:
+            _query_indexes[run_id] = QueryIndex()
+            while len(_query_indexes) > MAX_RUNS:
+                _query_indexes.popitem(last=False)
+        _query_indexes.move_to_end(run_id)
+        return _query_indexes[run_id]
+
+
+def release_query_index(run_id: Optional[str]):
+    """Forget the query index of a finished run."""
+    with _query_indexes_lock:
+        _query_indexes.pop(run_id, None)
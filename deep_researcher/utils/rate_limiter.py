@@ -0,0 +1,354 @@
+import asyncio
+import contextvars
+import functools
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import Executor
+from contextlib import asynccontextmanager, contextmanager
+from typing import Callable, Optional, Tuple
+
+from deep_researcher.utils.profiling import record_queue_time
+
+
+# Seconds between two checks of a waiting caller.
+POLL_INTERVAL = 0.05
+# Seconds of budget a bucket can accumulate for bursts.
+BURST_SECONDS = 5
+# Default request and token budgets per minute and max concurrency per
+# provider, each can be overridden with <PROVIDER>_RPM, <PROVIDER>_TPM and
+# <PROVIDER>_MAX_CONCURRENCY environment variables.
+PROVIDER_LIMITS = {
+    "openai": {"rpm": 500, "tpm": 200000, "max_concurrency": 16},
+    "groq": {"rpm": 30, "tpm": 6000, "max_concurrency": 4},
+    "google_genai": {"rpm": 1000, "tpm": 1000000, "max_concurrency": 16},
+    "tavily": {"rpm": 100, "tpm": None, "max_concurrency": 4},
+    "arxiv": {"rpm": 20, "tpm": None, "max_concurrency": 2},
+    "wikipedia": {"rpm": 200, "tpm": None, "max_concurrency": 4},
+}
+
+
+def is_rate_limit_error(error: BaseException) -> bool:
+    """Whether an exception raised by a provider client is a 429."""
+    if getattr(error, "status_code", None) == 429 or getattr(error, "code", None) == 429:
+        return True
+    message = str(error).lower()
+    return "429" in message or "rate limit" in message or "resource exhausted" in message
+
+
+def _percentile(values, percentile: float) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(percentile * len(values)))]
+
+
+class TokenBucket:
+    """Budget refilled at a constant rate, up to a capacity.
+
+    An amount larger than the capacity is taken once the bucket is full and
+    leaves it in debt, the following takes wait until the debt is refilled.
+    """
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.level = capacity
+        self.updated_at = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.level = min(
+            self.capacity, self.level + (now - self.updated_at) * self.rate
+        )
+        self.updated_at = now
+
+    def wait_time(self, amount: float) -> float:
+        """Seconds until amount is available, or until the bucket is full
+        for an amount beyond its capacity."""
+        self._refill()
+        amount = min(amount, self.capacity)
+        return max(0.0, (amount - self.level) / self.rate)
+
+    def take(self, amount: float) -> float:
+        """Take amount, returns the amount charged."""
+        self._refill()
+        self.level -= amount
+        return amount
+
+    def give_back(self, amount: float):
+        self.level = min(self.capacity, self.level + amount)
+
+
+class ProviderRateLimiter:
+    """Rate limiter and adaptive concurrency controller of one provider.
+
+    A call waits for a concurrency slot, one request of the request bucket
+    and its estimated tokens of the token bucket. The concurrency limit
+    follows AIMD: it is halved whenever the provider answers with a 429 and
+    grows back by about one slot per limit's worth of successful calls.
+    """
+
+    def __init__(
+        self,
+        provider: str,
+        rpm: float,
+        tpm: Optional[float] = None,
+        max_concurrency: int = 8,
+        min_concurrency: int = 1
+    ):
+        self.provider = provider
+        self.max_concurrency = max_concurrency
+        self.min_concurrency = min_concurrency
+        self.concurrency_limit = float(max_concurrency)
+        self._lock = threading.Lock()
+        self._requests = TokenBucket(rpm / 60, max(1, rpm / 60 * BURST_SECONDS))
+        self._tokens = (
+            TokenBucket(tpm / 60, max(1, tpm / 60 * BURST_SECONDS))
+            if tpm else None
+        )
+        self.in_flight = 0
+        self.waiting = 0
+        self.calls = 0
+        self.rate_limited = 0
+        self.wait_times = deque(maxlen=1000)
+        self.latencies = deque(maxlen=1000)
+
+    def _try_acquire(self, tokens: float) -> Tuple[float, float]:
+        """Take a slot and the budgets, returns the seconds to wait first,
+        0 once taken, and the tokens charged."""
+        with self._lock:
+            if self.in_flight >= int(self.concurrency_limit):
+                return POLL_INTERVAL, 0.0
+            wait = self._requests.wait_time(1)
+            if self._tokens is not None:
+                wait = max(wait, self._tokens.wait_time(tokens))
+            if wait > 0:
+                return wait, 0.0
+            self._requests.take(1)
+            charged_tokens = (
+                self._tokens.take(tokens) if self._tokens is not None else 0.0
+            )
+            self.in_flight += 1
+            return 0.0, charged_tokens
+
+    def acquire(self, tokens: float = 0) -> Tuple[float, float]:
+        """Block until the call can be made, returns the seconds waited and
+        the tokens charged."""
+        start = time.monotonic()
+        with self._lock:
+            self.waiting += 1
+        try:
+            while (wait := self._try_acquire(tokens))[0] > 0:
+                time.sleep(min(wait[0], 1.0))
+        finally:
+            with self._lock:
+                self.waiting -= 1
+                self.wait_times.append(time.monotonic() - start)
+        return time.monotonic() - start, wait[1]
+
+    async def aacquire(self, tokens: float = 0) -> Tuple[float, float]:
+        """Wait until the call can be made, returns the seconds waited and
+        the tokens charged."""
+        start = time.monotonic()
+        with self._lock:
+            self.waiting += 1
+        try:
+            while (wait := self._try_acquire(tokens))[0] > 0:
+                await asyncio.sleep(min(wait[0], 1.0))
+        finally:
+            with self._lock:
+                self.waiting -= 1
+                self.wait_times.append(time.monotonic() - start)
+        return time.monotonic() - start, wait[1]
+
+    def release(
+        self,
+        latency: float,
+        rate_limited: bool = False,
+        charged_tokens: float = 0,
+        used_tokens: Optional[float] = None
+    ):
+        """Free the slot of a finished call and adapt the concurrency.
+
+        The tokens charged but not used are given back, and the tokens used
+        beyond the charge are taken.
+        """
+        with self._lock:
+            self.in_flight -= 1
+            self.calls += 1
+            self.latencies.append(latency)
+            if rate_limited:
+                self.rate_limited += 1
+                self.concurrency_limit = max(
+                    self.min_concurrency, self.concurrency_limit / 2
+                )
+            else:
+                self.concurrency_limit = min(
+                    self.max_concurrency,
+                    self.concurrency_limit + 1 / self.concurrency_limit
+                )
+            if self._tokens is not None and used_tokens is not None:
+                self._tokens.give_back(charged_tokens - used_tokens)
+
+    @contextmanager
+    def slot(self, tokens: float = 0):
+        """Hold a call slot, the yielded dict has the seconds waited and
+        takes the tokens used."""
+        wait_seconds, charged_tokens = self.acquire(tokens)
+        usage = {"wait_seconds": wait_seconds, "used_tokens": None}
+        start = time.monotonic()
+        rate_limited = False
+        try:
+            yield usage
+        except BaseException as e:
+            rate_limited = is_rate_limit_error(e)
+            raise
+        finally:
+            self.release(
+                time.monotonic() - start, rate_limited, charged_tokens,
+                usage["used_tokens"]
+            )
+
+    @asynccontextmanager
+    async def aslot(self, tokens: float = 0):
+        """Hold a call slot, the yielded dict has the seconds waited and
+        takes the tokens used."""
+        wait_seconds, charged_tokens = await self.aacquire(tokens)
+        usage = {"wait_seconds": wait_seconds, "used_tokens": None}
+        start = time.monotonic()
+        rate_limited = False
+        try:
+            yield usage
+        except BaseException as e:
+            rate_limited = is_rate_limit_error(e)
+            raise
+        finally:
+            self.release(
+                time.monotonic() - start, rate_limited, charged_tokens,
+                usage["used_tokens"]
+            )
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "queue_depth": self.waiting,
+                "in_flight": self.in_flight,
+                "concurrency_limit": int(self.concurrency_limit),
+                "calls": self.calls,
+                "rate_limited": self.rate_limited,
+                "wait_p50": _percentile(self.wait_times, 0.5),
+                "wait_p95": _percentile(self.wait_times, 0.95),
+                "latency_p50": _percentile(self.latencies, 0.5),
+                "latency_p95": _percentile(self.latencies, 0.95),
+            }
+
+
+_rate_limiters = {}
+_rate_limiters_lock = threading.Lock()
+# Providers whose slot the current call holds already, with the seconds
+# waited for it.
+_held_slots: contextvars.ContextVar[Optional[dict]] = contextvars.ContextVar(
+    "held_rate_limiter_slots", default=None
+)
+
+
+def _provider_limits(provider: str) -> dict:
+    limits = PROVIDER_LIMITS.get(
+        provider, {"rpm": 60, "tpm": None, "max_concurrency": 4}
+    )
+    prefix = provider.upper()
+    tpm = os.getenv(f"{prefix}_TPM", limits["tpm"])
+    return {
+        "rpm": float(os.getenv(f"{prefix}_RPM", limits["rpm"])),
+        "tpm": float(tpm) if tpm else None,
+        "max_concurrency": int(
+            os.getenv(f"{prefix}_MAX_CONCURRENCY", limits["max_concurrency"])
+        ),
+    }
+
+
+def get_rate_limiter(provider: str) -> ProviderRateLimiter:
+    """Get the process-wide rate limiter of a provider."""
+    with _rate_limiters_lock:
+        if provider not in _rate_limiters:
+            _rate_limiters[provider] = ProviderRateLimiter(
+                provider, **_provider_limits(provider)
+            )
+        return _rate_limiters[provider]
+
+
+def rate_limited(provider: str) -> Callable:
+    """Make every call of a blocking function hold a slot of the provider,
+    unless run_in_slot took it already."""
+    def decorator(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            held_slots = _held_slots.get() or {}
+            if provider in held_slots:
+                # recorded here so that it goes to the span of the call
+                record_queue_time(held_slots[provider])
+                return function(*args, **kwargs)
+            with get_rate_limiter(provider).slot() as usage:
+                record_queue_time(usage["wait_seconds"])
+                return function(*args, **kwargs)
+        wrapper.rate_limited_provider = provider
+        return wrapper
+    return decorator
+
+
+async def run_in_slot(
+    provider: Optional[str],
+    executor: Executor,
+    function: Callable,
+    *args
+):
+    """Run a blocking function on an executor once a slot of the provider
+    is taken.
+
+    The slot is awaited on the event loop, so no executor thread is held
+    while queueing, and released by the executor thread once the function
+    returns, also when the caller stopped waiting for it or its event loop
+    is closed. Every call runs in its own copy of the context.
+    """
+    loop = asyncio.get_running_loop()
+    context = contextvars.copy_context()
+    if provider is None:
+        return await loop.run_in_executor(
+            executor, functools.partial(context.run, function, *args)
+        )
+    limiter = get_rate_limiter(provider)
+    wait_seconds, _ = await limiter.aacquire()
+    context.run(
+        _held_slots.set, {**(_held_slots.get() or {}), provider: wait_seconds}
+    )
+
+    def call():
+        start = time.monotonic()
+        rate_limited = False
+        try:
+            return function(*args)
+        except BaseException as e:
+            rate_limited = is_rate_limit_error(e)
+            raise
+        finally:
+            limiter.release(time.monotonic() - start, rate_limited)
+
+    try:
+        future = executor.submit(context.run, call)
+    except BaseException:
+        limiter.release(0.0)
+        raise
+    # a call cancelled before it ran never reaches its finally
+    future.add_done_callback(
+        lambda done: done.cancelled() and limiter.release(0.0)
+    )
+    return await asyncio.shield(asyncio.wrap_future(future))
+
+
+def rate_limiter_stats() -> dict:
+    """Queue depth, wait and latency statistics of every provider."""
+    with _rate_limiters_lock:
+        limiters = list(_rate_limiters.values())
+    return {limiter.provider: limiter.stats() for limiter in limiters}
@@ -0,0 +1,232 @@
+"""Record and replay of chat model and search tool calls.
+
+With REPLAY_MODE=record every chat model and search call is made for real
+and its response and latency are appended to the fixtures file. With
+REPLAY_MODE=replay no endpoint is called: responses come from the fixtures,
+after sleeping their recorded latency times REPLAY_LATENCY_SCALE, and calls
+without a fixture get deterministic synthetic responses, so the graphs run
+offline.
+"""
+import functools
+import hashlib
+import json
+import os
+import random
+import re
+import threading
+import time
+from typing import Callable, List, Optional
+
+from deep_researcher.utils.search_cache import normalize_query
+from deep_researcher.utils.storage import CACHE_DIR
+
+
+REPLAY_MODE = os.getenv("REPLAY_MODE", "")
+REPLAY_FIXTURES_PATH = os.getenv(
+    "REPLAY_FIXTURES_PATH", os.path.join(CACHE_DIR, "replay_fixtures.jsonl")
+)
+REPLAY_LATENCY_SCALE = float(os.getenv("REPLAY_LATENCY_SCALE", 1.0))
+# Synthetic responses for calls without a fixture, else they fail.
+REPLAY_SYNTHETIC = os.getenv("REPLAY_SYNTHETIC", "1") != "0"
+# Latency of the synthetic responses, in seconds.
+REPLAY_LLM_SECONDS = float(os.getenv("REPLAY_LLM_SECONDS", 1.0))
+REPLAY_SEARCH_SECONDS = float(os.getenv("REPLAY_SEARCH_SECONDS", 0.5))
+# Sections of a synthetic report plan.
+REPLAY_PLAN_SECTIONS = int(os.getenv("REPLAY_PLAN_SECTIONS", 5))
+
+_WORDS = (
+    "model data system method result study network analysis research "
+    "performance approach training process signal structure theory value "
+    "design evaluation application history impact development benchmark"
+).split()
+
+
+def recording() -> bool:
+    return REPLAY_MODE == "record"
+
+
+def replaying() -> bool:
+    return REPLAY_MODE == "replay"
+
+
+def fixture_key(kind: str, name: str, request: str) -> str:
+    return hashlib.sha256(
+        json.dumps([kind, name, request]).encode()
+    ).hexdigest()
+
+
+class FixtureStore:
+    """Append-only JSONL file of recorded responses by request key."""
+
+    def __init__(self, path: str = REPLAY_FIXTURES_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._fixtures = None
+
+    def _load(self) -> dict:
+        if self._fixtures is None:
+            self._fixtures = {}
+            if os.path.exists(self.path):
+                with open(self.path) as f:
+                    for line in f:
+                        if line.strip():
+                            fixture = json.loads(line)
+                            self._fixtures[fixture["key"]] = fixture
+        return self._fixtures
+
+    def get(self, key: str) -> Optional[dict]:
+        with self._lock:
+            return self._load().get(key)
+
+    def put(
+        self, key: str, kind: str, name: str, request: str,
+        response, seconds: float
+    ):
+        fixture = {
+            "key": key, "kind": kind, "name": name, "request": request,
+            "response": response, "seconds": seconds
+        }
+        with self._lock:
+            self._load()[key] = fixture
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            with open(self.path, "a") as f:
+                f.write(json.dumps(fixture) + "\n")
+
+
+_fixture_store = None
+_fixture_store_lock = threading.Lock()
+
+
+def get_fixture_store() -> FixtureStore:
+    """Get the process-wide fixture store."""
+    global _fixture_store
+    with _fixture_store_lock:
+        if _fixture_store is None or _fixture_store.path != REPLAY_FIXTURES_PATH:
+            _fixture_store = FixtureStore(REPLAY_FIXTURES_PATH)
+        return _fixture_store
+
+
+def replay_seconds(fixture: Optional[dict], synthetic_seconds: float) -> float:
+    """Seconds a replayed call takes."""
+    seconds = fixture["seconds"] if fixture else synthetic_seconds
+    return seconds * REPLAY_LATENCY_SCALE
+
+
+def _text(seed: str, words: int) -> str:
+    """Deterministic filler text of a number of words."""
+    rng = random.Random(seed)
+    sentences = []
+    while words > 0:
+        length = min(words, rng.randint(8, 16))
+        sentence = " ".join(rng.choice(_WORDS) for _ in range(length))
+        sentences.append(sentence.capitalize() + ".")
+        words -= length
+    return " ".join(sentences)
+
+
+def _field(prompt: str, name: str) -> str:
+    match = re.search(rf"{name}: (.*?)(?: Section Overview:|$)", prompt, re.MULTILINE)
+    return match.group(1).strip() if match else ""
+
+
+def _topic_searches(section: str) -> List[dict]:
+    return [
+        {"topic": f"{section} origins", "engine": "wikipedia", "query": f"{section} origins"},
+        # no engine, left to the local router
+        {"topic": f"{section} methods", "engine": None, "query": f"{section} methods"},
+    ]
+
+
+def synthetic_llm_response(
+    prompt: str, schema_name: Optional[str], tool_names: List[str]
+) -> dict:
+    """Deterministic response to a prompt, as the fields of the schema or
+    of an AI message."""
+    human = prompt.rsplit("human: ", 1)[-1]
+    if schema_name == "PlannedSections":
+        sections = []
+        for match in re.finditer(r"(\d+)\. (.+?) - (.+?)(?= \d+\. |$)", human):
+            title = match.group(2).strip()
+            sections.append({
+                "title": title,
+                "overview": match.group(3).strip(),
+                "web_search_required": not re.search(
+                    r"introduction|conclusion", title, re.IGNORECASE
+                ),
+                "depends_on": None
+            })
+        return {"sections": sections}
+    if schema_name == "SectionSearches":
+        return {"searches": _topic_searches(_field(human, "Section"))}
+    if schema_name == "SectionTopicsList":
+        return {"sections": [
+            {"title": section, "searches": _topic_searches(section)}
+            for section in re.findall(r"Section: (.*?) Section Overview:", human)
+        ]}
+    if schema_name == "WrittenSection":
+        section = _field(human, "Section")
+        sources = re.findall(r"\((https?://[^)\s]+)\)", human)[:5]
+        return {
+            "title": section,
+            "content": _text(prompt, 250),
+            "sources": sources or [
+                f"https://example.org/{hashlib.sha1(section.encode()).hexdigest()[:8]}"
+            ]
+        }
+    if tool_names:
+        return {"content": "", "tool_calls": [
+            {"name": name, "args": {"__arg1": human}, "id": f"call_{idx}"}
+            for idx, name in enumerate(tool_names[:2])
+        ]}
+    main_topic = _field(human, "Main Topic").split(" Outline:")[0]
+    titles = ["Introduction"] + [
+        f"{main_topic} part {idx}" for idx in range(1, REPLAY_PLAN_SECTIONS - 1)
+    ] + ["Conclusion"]
+    plan = " ".join(
+        f"{idx + 1}. {title} - {_text(title, 12)}"
+        for idx, title in enumerate(titles[:max(1, REPLAY_PLAN_SECTIONS)])
+    )
+    return {"content": f"<think>synthetic plan</think>{plan}", "tool_calls": []}
+
+
+def synthetic_search_results(engine: str, query: str) -> List[dict]:
+    """Deterministic search results of a query."""
+    return [
+        {
+            "search_query": query,
+            "title": f"{query} ({engine} {idx})",
+            "source": f"https://{engine.lower()}.example.org/{hashlib.sha1(query.encode()).hexdigest()[:8]}/{idx}",
+            "content": f"{query}. " + _text(f"{engine}{query}{idx}", 150),
+            "search_engine": engine
+        }
+        for idx in range(3)
+    ]
+
+
+def replayed_search(engine: str) -> Callable:
+    """Record or replay the results of a search function."""
+    def decorator(search_function):
+        @functools.wraps(search_function)
+        def wrapper(query: str) -> List[dict]:
+            if not (recording() or replaying()):
+                return search_function(query)
+            request = normalize_query(query)
+            key = fixture_key("search", engine, request)
+            if recording():
+                start = time.perf_counter()
+                results = search_function(query)
+                get_fixture_store().put(
+                    key, "search", engine, request, results,
+                    time.perf_counter() - start
+                )
+                return results
+            fixture = get_fixture_store().get(key)
+            if fixture is None and not REPLAY_SYNTHETIC:
+                raise LookupError(f"No replay fixture for {engine} search {query!r}")
+            time.sleep(replay_seconds(fixture, REPLAY_SEARCH_SECONDS))
+            if fixture is None:
+                return synthetic_search_results(engine, query)
+            return [{**result, "search_query": query} for result in fixture["response"]]
+        return wrapper
+    return decorator
+
@@ -0,0 +1,191 @@
+import functools
+import json
+import os
+import re
+import threading
+import time
+from concurrent.futures import Future
+from typing import Callable, List, Optional
+
+from deep_researcher.utils.single_flight import SingleFlight
+from deep_researcher.utils.storage import CACHE_DIR, connect_sqlite
+
+
+SEARCH_CACHE_PATH = os.getenv(
+    "SEARCH_CACHE_PATH", os.path.join(CACHE_DIR, "search_cache.sqlite")
+)
+SEARCH_CACHE_ENABLED = os.getenv("SEARCH_CACHE_ENABLED", "1") != "0"
+# Seconds a cached result stays valid, per search engine.
+ENGINE_TTL = {
+    "Tavily": 6 * 3600,
+    "Wikipedia": 7 * 24 * 3600,
+    "arXiv": 7 * 24 * 3600,
+}
+DEFAULT_TTL = 24 * 3600
+# Least recently used entries are evicted above this many cached queries.
+SEARCH_CACHE_MAX_ENTRIES = int(os.getenv("SEARCH_CACHE_MAX_ENTRIES", 20000))
+
+
+def normalize_query(query: str) -> str:
+    """Normalize a query so trivially different spellings share an entry."""
+    query = re.sub(r"[^\w\s]", " ", query.lower())
+    return " ".join(query.split())
+
+
+class SearchCache:
+    """On-disk cache of search results keyed by engine and query."""
+
+    def __init__(
+        self,
+        path: str = SEARCH_CACHE_PATH,
+        ttl_by_engine: Optional[dict] = None,
+        max_entries: int = SEARCH_CACHE_MAX_ENTRIES
+    ):
+        self.ttl_by_engine = ttl_by_engine or ENGINE_TTL
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._connection = connect_sqlite(path)
+        self._connection.execute(
+            """CREATE TABLE IF NOT EXISTS search_results (
+                engine TEXT NOT NULL,
+                query TEXT NOT NULL,
+                results TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                last_access REAL NOT NULL,
+                PRIMARY KEY (engine, query)
+            )"""
+        )
+        self._connection.execute(
+            "CREATE INDEX IF NOT EXISTS search_results_last_access "
+            "ON search_results (last_access)"
+        )
+        self._connection.commit()
+
+    def get(
+        self, engine: str, query: str, count_miss: bool = True
+    ) -> Optional[List[dict]]:
+        """Get the cached results of a query, None when missing or expired.
+
+        Lookups made ahead of calling the search function, which looks the
+        query up again, do not count misses.
+        """
+        key = normalize_query(query)
+        now = time.time()
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT results, created_at FROM search_results "
+                "WHERE engine = ? AND query = ?",
+                (engine, key)
+            ).fetchone()
+            ttl = self.ttl_by_engine.get(engine, DEFAULT_TTL)
+            if row is None or now - row[1] > ttl:
+                self.misses += count_miss
+                return None
+            self._connection.execute(
+                "UPDATE search_results SET last_access = ? "
+                "WHERE engine = ? AND query = ?",
+                (now, engine, key)
+            )
+            self._connection.commit()
+            self.hits += 1
+        return json.loads(row[0])
+
+    def set(self, engine: str, query: str, results: List[dict]):
+        """Cache the results of a query, evicting the least recently used."""
+        now = time.time()
+        with self._lock:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO search_results VALUES (?, ?, ?, ?, ?)",
+                (engine, normalize_query(query), json.dumps(results), now, now)
+            )
+            (count,) = self._connection.execute(
+                "SELECT COUNT(*) FROM search_results"
+            ).fetchone()
+            if count > self.max_entries:
+                self._connection.execute(
+                    "DELETE FROM search_results WHERE rowid IN ("
+                    "SELECT rowid FROM search_results "
+                    "ORDER BY last_access LIMIT ?)",
+                    (count - self.max_entries,)
+                )
+            self._connection.commit()
+
+    def stats(self) -> dict:
+        with self._lock:
+            (entries,) = self._connection.execute(
+                "SELECT COUNT(*) FROM search_results"
+            ).fetchone()
+            return {"entries": entries, "hits": self.hits, "misses": self.misses}
+
+
+_search_cache = None
+_search_cache_lock = threading.Lock()
+
+
+def get_search_cache() -> SearchCache:
+    """Get the process-wide search cache, opening it on first use."""
+    global _search_cache
+    with _search_cache_lock:
+        if _search_cache is None:
+            _search_cache = SearchCache()
+        return _search_cache
+
+
+def cached_results(
+    engine: str, query: str, count_miss: bool = True
+) -> Optional[List[dict]]:
+    """Results of a query from the search cache of the engine, None when
+    not cached."""
+    if not SEARCH_CACHE_ENABLED:
+        return None
+    results = get_search_cache().get(engine, query, count_miss)
+    if results is None:
+        return None
+    return [{**result, "search_query": query} for result in results]
+
+
+# Searches in progress by engine and normalized query.
+searches_in_flight = SingleFlight()
+
+
+def in_flight_search(engine: str, query: str) -> Optional[Future]:
+    """The future of the results of a search of the engine in progress for
+    the same query, e.g. a speculative prefetch, if any."""
+    return searches_in_flight.pending((engine, normalize_query(query)))
+
+
+def cached_search(engine: str) -> Callable:
+    """Serve a search function from the search cache of the engine.
+
+    A query searched while the same query is already being searched waits
+    for those results instead of searching again, cache enabled or not.
+    """
+    def decorator(search_function):
+        @functools.wraps(search_function)
+        def wrapper(query: str) -> List[dict]:
+            results = cached_results(engine, query)
+            if results is not None:
+                return results
+            key = (engine, normalize_query(query))
+            is_new, future = searches_in_flight.claim(key)
+            if not is_new:
+                return [
+                    {**result, "search_query": query}
+                    for result in future.result()
+                ]
+            try:
+                search_results = search_function(query)
+            except BaseException as error:
+                searches_in_flight.finish(key, future, error=error)
+                raise
+            try:
+                if search_results and SEARCH_CACHE_ENABLED:
+                    get_search_cache().set(engine, query, search_results)
+            finally:
+                searches_in_flight.finish(key, future, search_results)
+            return search_results
+        wrapper.search_cache_engine = engine
+        return wrapper
+    return decorator
@@ -0,0 +1,63 @@
+import re
+from typing import Dict, List
+
+from deep_researcher.utils.state import TopicSearch
+
+
+# Search tool of every engine a planned search may name.
+ENGINE_TOOLS = {
+    "wikipedia": "search_wikipedia",
+    "tavily": "search_tavily",
+    "arxiv": "search_arxiv",
+}
+# Kinds of topics and the engine best suited to each, checked in order.
+TOPIC_ROUTES = [
+    ("tavily", re.compile(
+        r"\b(latest|recent|current|today|news|trends?|market|prices?|"
+        r"companies|products?|release[sd]?|20[2-9]\d)\b", re.IGNORECASE
+    )),
+    ("arxiv", re.compile(
+        r"\b(research|papers?|stud(y|ies)|algorithms?|models?|neural|"
+        r"learning|theor(y|em|etical)|quantum|benchmarks?|architectures?|"
+        r"optimization|experiments?|methods?|techniques?|proofs?)\b",
+        re.IGNORECASE
+    )),
+    ("wikipedia", re.compile(
+        r"\b(history|historical|origins?|definitions?|biography|overview|"
+        r"introduction|background|culture|geography|who|what is|concepts?)\b",
+        re.IGNORECASE
+    )),
+]
+
+
+def route_topic(topic: str) -> str:
+    """Search engine of a topic from the kind of topic it is, Tavily when
+    the topic is of no known kind."""
+    for engine, pattern in TOPIC_ROUTES:
+        if pattern.search(topic):
+            return engine
+    return "tavily"
+
+
+def planned_tool_calls(
+    searches: List[TopicSearch], of_section: str
+) -> Dict[str, List[dict]]:
+    """Search tool calls of the planned searches, by topic.
+
+    Searches without a known engine are routed locally, and searches
+    without a query search the topic in the section.
+    """
+    tool_calls = {}
+    for search in searches:
+        engine = (search.engine or "").lower()
+        if engine not in ENGINE_TOOLS:
+            engine = route_topic(search.topic)
+        query = search.query.strip() or f"{search.topic} in {of_section}"
+        topic_calls = tool_calls.setdefault(search.topic, [])
+        topic_calls.append({
+            "name": ENGINE_TOOLS[engine],
+            "args": {"__arg1": query},
+            "id": f"planned_{len(topic_calls)}",
+            "type": "tool_call"
+        })
+    return tool_calls
@@ -0,0 +1,107 @@
+import asyncio
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional
+
+from deep_researcher.utils.hedging import hedged_search
+from deep_researcher.utils.query_index import QueryIndex
+from deep_researcher.utils.rate_limiter import run_in_slot
+from deep_researcher.utils.search_cache import cached_results, in_flight_search
+from deep_researcher.utils.single_flight import wait_for_flight
+from deep_researcher.utils.tools import SEARCH_TOOLS
+
+
+# Seconds a single tool call may take before its results are dropped.
+SEARCH_TOOL_TIMEOUT = float(os.getenv("SEARCH_TOOL_TIMEOUT", 20))
+
+# The search tools are blocking, they run on a dedicated pool so that a call
+# which timed out does not hold up the shutdown of the event loop. Their
+# concurrency is limited by the rate limiters of the engines, whose slots
+# are awaited on the event loop.
+_search_executor = ThreadPoolExecutor(
+    max_workers=int(os.getenv("SEARCH_TOOL_THREADS", 32)),
+    thread_name_prefix="search_tool"
+)
+
+
+async def _search(tool_name: str, args: dict) -> List[dict]:
+    """Results of a search tool call, from the search cache or the same
+    search in progress, else from the pool once the engine's rate limiter
+    has a slot, so no thread is held while queueing."""
+    tool = SEARCH_TOOLS[tool_name]
+    engine = getattr(tool.func, "search_cache_engine", None)
+    if engine is not None:
+        query = args["__arg1"]
+        results = cached_results(engine, query, count_miss=False)
+        if results is not None:
+            return results
+        future = in_flight_search(engine, query)
+        if future is not None:
+            return [
+                {**result, "search_query": query}
+                for result in await wait_for_flight(future)
+            ]
+    return await run_in_slot(
+        getattr(tool.func, "rate_limited_provider", None),
+        _search_executor, tool.invoke, args
+    )
+
+
+async def _call_tool(tool_call: dict, timeout: float) -> List[dict]:
+    def call(tool_name: str):
+        return _search(tool_name, tool_call["args"])
+    # slow, failing or empty engines are hedged along their fallback chain
+    return await hedged_search(tool_call["name"], call, timeout)
+
+
+async def _run_tool_call(
+    tool_call: dict, timeout: float, query_index: Optional[QueryIndex]
+) -> List[dict]:
+    if query_index is None:
+        return await _call_tool(tool_call, timeout)
+    is_new, future = query_index.claim(
+        tool_call["name"], tool_call["args"]["__arg1"]
+    )
+    if not is_new:
+        # shielded so that timing out here does not cancel the shared search
+        return await asyncio.wait_for(
+            asyncio.shield(asyncio.wrap_future(future)), timeout
+        )
+    try:
+        search_results = await _call_tool(tool_call, timeout)
+    except BaseException:
+        future.set_result([])
+        raise
+    future.set_result(search_results)
+    return search_results
+
+
+async def run_tool_calls_ranked(
+    tool_calls: List[dict],
+    timeout: float = SEARCH_TOOL_TIMEOUT,
+    query_index: Optional[QueryIndex] = None
+) -> List[List[dict]]:
+    """Run the tool calls concurrently, returns the ranked results of every
+    tool call which succeeded.
+
+    Tool calls that fail or time out are skipped, so a slow engine only
+    costs its own results instead of holding up the whole topic. With a
+    query index, searches already claimed by another worker of the run are
+    not executed again, their results are reused.
+    """
+    outcomes = await asyncio.gather(
+        *(
+            _run_tool_call(tool_call, timeout, query_index)
+            for tool_call in tool_calls
+        ),
+        return_exceptions=True
+    )
+    ranked_lists = []
+    for tool_call, outcome in zip(tool_calls, outcomes):
+        if isinstance(outcome, BaseException):
+            print(
+                f"Tool {tool_call['name']} failed for {tool_call['args']['__arg1']} : {outcome!r}")
+            continue
+        ranked_lists.append(outcome)
+    return ranked_lists
+
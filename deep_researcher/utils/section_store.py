@@ -0,0 +1,146 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from typing import List, Optional, Sequence, Tuple
+
+from langchain_core.runnables import RunnableConfig
+
+from deep_researcher.utils.document_store import get_document_store
+from deep_researcher.utils.search_cache import DEFAULT_TTL, ENGINE_TTL
+from deep_researcher.utils.state import WrittenSection
+from deep_researcher.utils.storage import CACHE_DIR, connect_sqlite
+
+
+SECTION_STORE_PATH = os.getenv(
+    "SECTION_STORE_PATH", os.path.join(CACHE_DIR, "sections.sqlite")
+)
+SECTION_REUSE_ENABLED = os.getenv("SECTION_REUSE_ENABLED", "1") != "0"
+# Sections are only reused by the later plans of the thread which wrote
+# them, unless SECTION_REUSE_ACROSS_RUNS=1.
+SECTION_REUSE_ACROSS_RUNS = os.getenv("SECTION_REUSE_ACROSS_RUNS", "0") == "1"
+# Seconds a written section can be reused for, and no longer than the
+# search cache TTL of the engines of its search results.
+SECTION_REUSE_MAX_AGE = float(os.getenv("SECTION_REUSE_MAX_AGE", 24 * 3600))
+
+
+def section_lineage(config: Optional[RunnableConfig]) -> Optional[str]:
+    """Lineage of the runs sharing written sections: the thread of the run,
+    or every run with SECTION_REUSE_ACROSS_RUNS. None without a thread."""
+    if SECTION_REUSE_ACROSS_RUNS:
+        return "*"
+    return (config or {}).get("configurable", {}).get("thread_id")
+
+
+def section_key(
+    lineage: str, main_topic: str, title: str, overview: str,
+    dependencies: Sequence[str] = ()
+) -> str:
+    """Key of a planned section, changing with its title, its overview or
+    the titles of the sections it builds on."""
+    content = json.dumps(
+        [lineage] + [" ".join(text.split()) for text in (main_topic, title, overview)]
+        + sorted(" ".join(text.split()) for text in dependencies)
+    )
+    return hashlib.sha256(content.encode()).hexdigest()
+
+
+class SectionStore:
+    """Written sections of past plans with the ids of their search results.
+
+    When a revised plan is accepted, the sections whose title and overview
+    did not change are taken from here instead of being searched and
+    written again.
+    """
+
+    def __init__(
+        self, path: str = SECTION_STORE_PATH,
+        max_age: float = SECTION_REUSE_MAX_AGE
+    ):
+        self.max_age = max_age
+        self._lock = threading.Lock()
+        self._connection = connect_sqlite(path)
+        self._connection.execute(
+            """CREATE TABLE IF NOT EXISTS written_sections (
+                key TEXT PRIMARY KEY,
+                section TEXT NOT NULL,
+                search_results TEXT NOT NULL,
+                created_at REAL NOT NULL
+            )"""
+        )
+        self._connection.commit()
+
+    def get(self, key: str) -> Optional[Tuple[WrittenSection, List[str]]]:
+        """Get a written section and its search result ids, None when
+        missing or too old."""
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT section, search_results FROM written_sections "
+                "WHERE key = ? AND created_at > ?",
+                (key, time.time() - self.max_age)
+            ).fetchone()
+        if row is None:
+            return None
+        return WrittenSection.model_validate_json(row[0]), json.loads(row[1])
+
+    def put(
+        self, key: str, section: WrittenSection, search_results: List[str]
+    ):
+        with self._lock:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO written_sections VALUES (?, ?, ?, ?)",
+                (
+                    key, section.model_dump_json(),
+                    json.dumps(list(dict.fromkeys(search_results))), time.time()
+                )
+            )
+            self._connection.commit()
+
+
+_section_store = None
+_section_store_lock = threading.Lock()
+
+
+def get_section_store() -> SectionStore:
+    """Get the process-wide section store, opening it on first use."""
+    global _section_store
+    with _section_store_lock:
+        if _section_store is None:
+            _section_store = SectionStore()
+        return _section_store
+
+
+def reusable_section(
+    config: Optional[RunnableConfig], main_topic: str, title: str, overview: str,
+    dependencies: Sequence[str] = ()
+) -> Optional[Tuple[WrittenSection, List[str]]]:
+    """The stored section of an unchanged planned section of the lineage of
+    the run, building on the same sections, if any and its search results
+    are all still fresh."""
+    lineage = section_lineage(config)
+    if not SECTION_REUSE_ENABLED or lineage is None:
+        return None
+    stored = get_section_store().get(
+        section_key(lineage, main_topic, title, overview, dependencies)
+    )
+    if stored is None:
+        return None
+    fresh = get_document_store().fresh_ids(stored[1], ENGINE_TTL, DEFAULT_TTL)
+    if len(fresh) < len(set(stored[1])):
+        return None
+    return stored
+
+
+def store_section(
+    config: Optional[RunnableConfig], main_topic: str, title: str, overview: str,
+    section: WrittenSection, search_results: List[str],
+    dependencies: Sequence[str] = ()
+):
+    """Keep a written section for later revisions of the plan."""
+    lineage = section_lineage(config)
+    if SECTION_REUSE_ENABLED and lineage is not None:
+        get_section_store().put(
+            section_key(lineage, main_topic, title, overview, dependencies),
+            section, search_results
+        )
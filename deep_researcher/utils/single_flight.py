@@ -0,0 +1,62 @@
+import asyncio
+import threading
+from concurrent.futures import Future
+from typing import Any, Dict, Hashable, Optional, Tuple
+
+
+class SingleFlight:
+    """Calls in progress by key, so that identical concurrent calls run once.
+
+    The first caller of a key runs the call and publishes its result on a
+    future, the callers arriving while it runs wait on that future instead
+    of running it again, e.g. a node and the speculative prefetch of the
+    same search.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._futures: Dict[Hashable, Future] = {}
+        self.executed = 0
+        self.joined = 0
+
+    def claim(self, key: Hashable) -> Tuple[bool, Future]:
+        """Claim a call, returns whether the caller must run it and the
+        future carrying its result."""
+        with self._lock:
+            future = self._futures.get(key)
+            if future is not None:
+                self.joined += 1
+                return False, future
+            future = self._futures[key] = Future()
+            self.executed += 1
+            return True, future
+
+    def pending(self, key: Hashable) -> Optional[Future]:
+        """The future of the call of a key in progress, if any."""
+        with self._lock:
+            future = self._futures.get(key)
+            if future is not None:
+                self.joined += 1
+            return future
+
+    def finish(
+        self, key: Hashable, future: Future, result: Any = None,
+        error: Optional[BaseException] = None
+    ):
+        """Publish the result or error of a claimed call."""
+        with self._lock:
+            self._futures.pop(key, None)
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(result)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"executed": self.executed, "joined": self.joined}
+
+
+async def wait_for_flight(future: Future):
+    """Wait for the result of a call run by another caller, shielded so
+    that cancelling the waiter does not cancel the call."""
+    return await asyncio.shield(asyncio.wrap_future(future))
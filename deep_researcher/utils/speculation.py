@@ -0,0 +1,119 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, List, Optional
+
+
+SPECULATIVE_PREFETCH = os.getenv("SPECULATIVE_PREFETCH", "0") == "1"
+SPECULATION_THREADS = int(os.getenv("SPECULATION_THREADS", 8))
+# Number of unresolved speculations kept, older ones are cancelled.
+MAX_SPECULATIONS = 64
+
+_speculation_executor = ThreadPoolExecutor(
+    max_workers=SPECULATION_THREADS, thread_name_prefix="speculation"
+)
+
+
+class Speculation:
+    """Background work on a plan done while the human reviews it.
+
+    The work is split in tasks which may submit further tasks. Once the
+    plan is accepted the work counts as used; when it is rejected the tasks
+    not started yet are cancelled and the finished ones count as wasted.
+    """
+
+    def __init__(self, key: str):
+        self.key = key
+        self.cancelled = False
+        self.accepted: Optional[bool] = None
+        self._lock = threading.Lock()
+        self._futures: List[Future] = []
+        self._pending_tasks = 0
+        self._pending_seconds = 0.0
+
+    def submit(self, task: Callable, *args):
+        """Run task(speculation, *args) in the background."""
+        with self._lock:
+            if self.cancelled:
+                return
+            self._futures.append(
+                _speculation_executor.submit(self._run, task, args)
+            )
+
+    def _run(self, task: Callable, args: tuple):
+        if self.cancelled:
+            return
+        start = time.perf_counter()
+        try:
+            task(self, *args)
+        except Exception as e:
+            print(f"Speculative {task.__name__} failed : {e!r}")
+        seconds = time.perf_counter() - start
+        with self._lock:
+            if self.accepted is None:
+                self._pending_tasks += 1
+                self._pending_seconds += seconds
+                return
+        _record(self.accepted, 1, seconds)
+
+    def resolve(self, accepted: bool):
+        """Keep the work for an accepted plan, cancel it for a rejected one."""
+        with self._lock:
+            self.accepted = accepted
+            if not accepted:
+                self.cancelled = True
+            cancelled = sum(
+                future.cancel() for future in self._futures if not accepted
+            )
+            tasks, seconds = self._pending_tasks, self._pending_seconds
+        _record(accepted, tasks, seconds, cancelled)
+        print(
+            f"Speculative work on the plan {'used' if accepted else 'discarded'} : {tasks} tasks, {seconds:.1f}s, {cancelled} cancelled")
+
+
+_stats = {
+    "used_tasks": 0, "used_seconds": 0.0,
+    "wasted_tasks": 0, "wasted_seconds": 0.0,
+    "cancelled_tasks": 0
+}
+_speculations = OrderedDict()
+_speculations_lock = threading.Lock()
+
+
+def _record(accepted: bool, tasks: int, seconds: float, cancelled: int = 0):
+    outcome = "used" if accepted else "wasted"
+    with _speculations_lock:
+        _stats[f"{outcome}_tasks"] += tasks
+        _stats[f"{outcome}_seconds"] += seconds
+        _stats["cancelled_tasks"] += cancelled
+
+
+def start_speculation(key: str, task: Callable, *args) -> Speculation:
+    """Start the speculation of a key unless it is already running."""
+    with _speculations_lock:
+        if key in _speculations:
+            return _speculations[key]
+        speculation = _speculations[key] = Speculation(key)
+        stale = []
+        while len(_speculations) > MAX_SPECULATIONS:
+            stale.append(_speculations.popitem(last=False)[1])
+    for old_speculation in stale:
+        old_speculation.resolve(accepted=False)
+    speculation.submit(task, *args)
+    return speculation
+
+
+def resolve_speculation(key: str, accepted: bool):
+    """Resolve the speculation of a key, if there is one."""
+    with _speculations_lock:
+        speculation = _speculations.pop(key, None)
+    if speculation is not None:
+        speculation.resolve(accepted)
+
+
+def speculation_stats() -> dict:
+    """Speculative tasks and seconds used, wasted and cancelled so far."""
+    with _speculations_lock:
+        return dict(_stats)
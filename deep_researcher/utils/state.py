@@ -1,12 +1,56 @@
 import operator
 from pydantic import BaseModel, Field
-from typing import List, Literal
+from typing import List, Literal, Optional
 from typing_extensions import Annotated, TypedDict
 
 
-class TopicList(BaseModel):
-    topics: List[str] = Field(
-        description="List of topics which will be helpful in understanding. Must not be more than three topics.",
+def last_value(current, new):
+    """Reducer keeping the last value, allowing parallel workers to write
+    the same value in one step."""
+    return new
+
+
+def add_unique(current: list, new: list) -> list:
+    """Reducer appending the new items which are not in the list yet, so
+    that documents found by several workers are referenced once."""
+    seen = set(current)
+    return current + [
+        item for item in dict.fromkeys(new) if item not in seen
+    ]
+
+
+class TopicSearch(BaseModel):
+    topic: str = Field(
+        description="Topic which will be helpful in understanding the section.",
+    )
+    engine: Optional[str] = Field(
+        default=None,
+        description="Search engine best suited to the topic: wikipedia for general knowledge and historical summaries, arxiv for academic research and technical papers, tavily for real-time web search.",
+    )
+    query: str = Field(
+        default="",
+        description="Query to search the engine with, helpful in finding meaningful information on the topic.",
+    )
+
+
+class SectionSearches(BaseModel):
+    searches: List[TopicSearch] = Field(
+        description="Topics of the section with the search to run for each. Must not be more than three topics.",
+    )
+
+
+class SectionTopics(BaseModel):
+    title: str = Field(
+        description="Title of the section, as provided",
+    )
+    searches: List[TopicSearch] = Field(
+        description="Topics of the section with the search to run for each. Must not be more than three topics.",
+    )
+
+
+class SectionTopicsList(BaseModel):
+    sections: List[SectionTopics] = Field(
+        description="Topics and searches of every section.",
     )
 
 
@@ -20,6 +64,10 @@ class SectionPlan(BaseModel):
     web_search_required: bool = Field(
         description="Whether web search is required for this section.",
     )
+    depends_on: Optional[List[str]] = Field(
+        default=None,
+        description="For a section which does not require web search, the titles of the sections whose content it builds on. Empty if it can be written from the plan alone, like an introduction.",
+    )
 
 
 class PlannedSections(BaseModel):
@@ -44,9 +92,11 @@ class SearchGraphState(TypedDict):
     """State for the Research Worker agent."""
     topic: str
     of_section: str
+    run_id: Annotated[str, last_value]
     search_tools_to_call: list
     search_queries_already_used: Annotated[list, operator.add]
-    search_results: Annotated[list, operator.add]
+    # ids of the search result documents in the document store
+    search_results: Annotated[list, add_unique]
 
 
 class SearchGraphOutputState(TypedDict):
@@ -57,20 +107,29 @@ class SearchGraphOutputState(TypedDict):
 
 class ResearcherState(TypedDict):
     """State for the Researcher agent."""
+    main_topic: str
     section: str
     section_overview: str
+    run_id: Annotated[str, last_value]
     topics_of_section: list
+    # search tool calls planned with the topics, by topic
+    planned_searches: dict
     search_queries_already_used: Annotated[list, operator.add]
     compiled_sections: Annotated[list, operator.add]
-    search_results: Annotated[list, operator.add]
+    # ids of the search result documents in the document store
+    search_results: Annotated[list, add_unique]
     combined_written_sections = str
+    # whether a section this one builds on was written anew
+    written_sections_changed: bool
+    # titles of the sections this one builds on
+    section_dependencies: list
 
 
 class ResearcherOutputState(TypedDict):
     """Output State for the Researcher agent."""
     search_queries_already_used: list[str]
     compiled_sections: list[WrittenSection]
-    search_results: list[dict]
+    search_results: list[str]
 
 
 class OrchestratorState(TypedDict):
@@ -80,7 +139,14 @@ class OrchestratorState(TypedDict):
     structured_plan: List[SectionPlan]
     feedback_on_report_plan: str
     compiled_sections: Annotated[list, operator.add]
+    # bounded digest of every written section by title
+    section_digests: dict
     combined_written_sections: str
-    search_results: Annotated[list, operator.add]
+    # ids of the search result documents in the document store
+    search_results: Annotated[list, add_unique]
     search_queries_already_used: Annotated[list, operator.add]
+    run_id: Annotated[str, last_value]
+    # titles of the web search sections, and of the independent sections
+    # written alongside them, written anew instead of reused
+    rewritten_web_search_sections: list
     final_report: str
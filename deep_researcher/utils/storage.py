@@ -0,0 +1,19 @@
+import os
+import sqlite3
+
+
+# Directory of the local stores (search cache, documents, ...) shared by runs.
+CACHE_DIR = os.getenv(
+    "DEEP_RESEARCHER_CACHE_DIR",
+    os.path.join(os.path.expanduser("~"), ".cache", "deep_researcher")
+)
+
+
+def connect_sqlite(path: str) -> sqlite3.Connection:
+    """Open a SQLite database in WAL mode, shareable between threads."""
+    if path != ":memory:":
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    connection = sqlite3.connect(path, check_same_thread=False, timeout=30)
+    connection.execute("PRAGMA journal_mode=WAL")
+    connection.execute("PRAGMA synchronous=NORMAL")
+    return connection
@@ -0,0 +1,167 @@
+import json
+from typing import AsyncIterator, Iterator, List, Optional
+
+from langchain_core.utils.json import parse_partial_json
+
+from deep_researcher.utils.state import SectionPlan, WrittenSection
+
+
+def format_section(section: WrittenSection) -> str:
+    """Format a written section the way it appears in the final report."""
+    return f"Section: {section.title}\nContent: {section.content}\n\n"
+
+
+def format_sources(compiled_sections: List[WrittenSection]) -> str:
+    """Format the de-duplicated sources of the written sections."""
+    all_sources = list(dict.fromkeys(
+        source
+        for section in compiled_sections
+        for source in section.sources
+    ))
+    sources_string = "".join(
+        f"{idx + 1}. {source}\n" for idx, source in enumerate(all_sources)
+    )
+    return f"\n\nSources:\n {sources_string}"
+
+
+def assemble_report(
+    structured_plan: List[SectionPlan], compiled_sections: List[WrittenSection]
+) -> str:
+    """Join the written sections in plan order and their sources in one pass."""
+    sections_by_title = {section.title: section for section in compiled_sections}
+    return "".join(
+        [
+            format_section(sections_by_title[section.title])
+            for section in structured_plan
+        ] + [format_sources(compiled_sections)]
+    )
+
+
+class ReportStreamer:
+    """Turn graph stream chunks into report events.
+
+    Events are dicts with a "type" key:
+        token: text of a section being written, with its "section". The
+            writers answer with structured output, the text is what their
+            streamed tool call arguments added to the section content, not
+            the raw JSON of the arguments.
+        section: a written section, emitted in plan order as soon as it and
+            every section before it are written.
+        interrupt: the graph waits for human input, with its "value".
+        report: the final report.
+    """
+
+    def __init__(self):
+        self.plan_titles: Optional[List[str]] = None
+        self.written_sections = {}
+        self.next_section = 0
+        # (section, message id) -> tool call arguments streamed so far and
+        # characters of their content already emitted
+        self.tool_call_args = {}
+        self.content_emitted = {}
+
+    def _ready_sections(self) -> List[dict]:
+        events = []
+        while (
+            self.plan_titles is not None
+            and self.next_section < len(self.plan_titles)
+            and self.plan_titles[self.next_section] in self.written_sections
+        ):
+            section = self.written_sections[self.plan_titles[self.next_section]]
+            events.append({
+                "type": "section",
+                "section": section.title,
+                "text": format_section(section)
+            })
+            self.next_section += 1
+        return events
+
+    def _token_event(self, chunk) -> List[dict]:
+        message, metadata = chunk
+        if "section" not in metadata:
+            return []
+        text = message.content if isinstance(message.content, str) else ""
+        if not text:
+            text = self._content_delta(metadata["section"], message)
+        if not text:
+            return []
+        return [{"type": "token", "section": metadata["section"], "text": text}]
+
+    def _content_delta(self, section: str, message) -> str:
+        """Text the tool call arguments of a message chunk add to the
+        content field of the section they stream."""
+        args = "".join(
+            tool_call_chunk.get("args") or ""
+            for tool_call_chunk in getattr(message, "tool_call_chunks", [])
+        )
+        if not args:
+            return ""
+        key = (section, message.id)
+        self.tool_call_args[key] = self.tool_call_args.get(key, "") + args
+        try:
+            parsed = parse_partial_json(self.tool_call_args[key])
+        except json.JSONDecodeError:
+            return ""
+        content = parsed.get("content") if isinstance(parsed, dict) else None
+        if not isinstance(content, str):
+            return ""
+        emitted = self.content_emitted.get(key, 0)
+        self.content_emitted[key] = max(emitted, len(content))
+        return content[emitted:]
+
+    def _update_events(self, chunk: dict) -> List[dict]:
+        events = []
+        for node, update in chunk.items():
+            if node == "__interrupt__":
+                events.extend(
+                    {"type": "interrupt", "value": interrupt.value}
+                    for interrupt in update
+                )
+                continue
+            if not isinstance(update, dict):
+                continue
+            if "structured_plan" in update:
+                self.plan_titles = [
+                    section.title for section in update["structured_plan"]
+                ]
+                self.written_sections = {}
+                self.next_section = 0
+            for section in update.get("compiled_sections", []):
+                self.written_sections.setdefault(section.title, section)
+                for key in [key for key in self.tool_call_args if key[0] == section.title]:
+                    del self.tool_call_args[key]
+                    self.content_emitted.pop(key, None)
+            if "final_report" in update:
+                events.extend(self._ready_sections())
+                events.append({"type": "report", "text": update["final_report"]})
+        return events + self._ready_sections()
+
+    def handle(self, mode: str, chunk) -> List[dict]:
+        """Get the report events of a chunk of the graph stream."""
+        if mode == "messages":
+            return self._token_event(chunk)
+        if mode == "updates":
+            return self._update_events(chunk)
+        return []
+
+
+STREAM_MODES = ["messages", "updates"]
+
+
+def stream_report(graph, graph_input, config=None) -> Iterator[dict]:
+    """Stream the report events of a deep research graph run."""
+    streamer = ReportStreamer()
+    for _, mode, chunk in graph.stream(
+        graph_input, config, stream_mode=STREAM_MODES, subgraphs=True
+    ):
+        yield from streamer.handle(mode, chunk)
+
+
+async def astream_report(graph, graph_input, config=None) -> AsyncIterator[dict]:
+    """Stream the report events of a deep research graph run."""
+    streamer = ReportStreamer()
+    async for _, mode, chunk in graph.astream(
+        graph_input, config, stream_mode=STREAM_MODES, subgraphs=True
+    ):
+        for event in streamer.handle(mode, chunk):
+            yield event
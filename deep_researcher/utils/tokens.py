@@ -0,0 +1,31 @@
+import re
+
+
+# Pieces a BPE tokenizer rarely merges : runs of letters, groups of up to
+# three digits and single punctuation marks.
+_WORD_PIECE_PATTERN = re.compile(r"[^\W\d_]+|\d{1,3}|[^\w\s]|_+")
+
+
+def estimate_tokens(text: str) -> int:
+    """Cheap estimate of the number of tokens of a text."""
+    # about four characters per token for English text
+    return (len(text) + 3) // 4
+
+
+def estimate_bpe_tokens(text: str) -> int:
+    """Estimate of the number of tokens of a text for BPE tokenizers.
+
+    Common English words are a single token and longer ones take a token
+    for about every four more letters, while letters of other scripts take
+    about a token each.
+    """
+    tokens = 0
+    for match in _WORD_PIECE_PATTERN.finditer(text):
+        piece = match.group()
+        if not piece.isascii():
+            tokens += len(piece)
+        elif len(piece) > 6:
+            tokens += 1 + (len(piece) - 3) // 4
+        else:
+            tokens += 1
+    return tokens
@@ -1,17 +1,18 @@
 import os
 import re
-import requests
-from bs4 import BeautifulSoup
-from typing import List
+import threading
+from typing import Callable, List
 from langchain_core.tools import Tool
-from langchain_community.retrievers import WikipediaRetriever
-from langchain_community.tools.tavily_search import TavilySearchResults
-from langchain_google_community import GoogleSearchAPIWrapper
-from langchain_community.retrievers import ArxivRetriever
+from deep_researcher.utils.search_cache import cached_search
+from deep_researcher.utils.hedging import latency_recorded
+from deep_researcher.utils.normalization import normalize_content
+from deep_researcher.utils.rate_limiter import rate_limited
+from deep_researcher.utils.replay import replayed_search
 
 
 class GoogleSearchExtractor:
     def __init__(self, api_key, cse_id, num_results=3, max_char_length=1000):
+        from langchain_google_community import GoogleSearchAPIWrapper
         self.google_search = GoogleSearchAPIWrapper(
             google_api_key=api_key,
             google_cse_id=cse_id,
@@ -26,21 +27,26 @@ class GoogleSearchExtractor:
         return text
 
     def extract_html(self, url):
-        response = requests.get(url)
-        if response.status_code == 200:
-            soup = BeautifulSoup(response.content, 'html.parser')
-            return self.clean_text(soup.get_text())[:self.max_char_length]
-        return ""
+        return self.extract_pages([url])[0]
+
+    def extract_pages(self, urls):
+        """Fetch the pages concurrently over a shared connection pool."""
+        from deep_researcher.utils.page_fetcher import get_page_fetcher
+        return [
+            self.clean_text(text)
+            for text in get_page_fetcher().fetch_many(urls, self.max_char_length)
+        ]
 
     def search(self, query):
         search_results = self.google_search.results(query, self.k)
         print(len(search_results))
+        contents = self.extract_pages([result["link"] for result in search_results])
         extracted_results = []
-        for result in search_results:
+        for result, content in zip(search_results, contents):
             print(result["title"])
             extracted_results.append({
                 "title": result["title"],
-                "content": self.extract_html(result["link"]),
+                "content": content,
                 "url": result["link"]
             })
         return extracted_results
@@ -69,7 +75,7 @@ class GoogleSearchExtractor:
 #             {   "search_query": query,
 #                 "title": result["title"],
 #                 "source": result["link"],
-#                 "content": preprocess_long_text(result["snippet"]),
+#                 "content": preprocess_long_text(result["snippet"], "google"),
 #                 "search_engine": "Google"
 #             }
 #         )
@@ -83,25 +89,51 @@ class GoogleSearchExtractor:
 # )
 
 
-def preprocess_long_text(text):
-    """Preprocess long text by removing newlines and tabs."""
-    # Remove newlines and tabs
-    text = re.sub(r'[\n\t]+', ' ', text)
-    # Truncate to 1000 characters
-    if len(text) > 1000:
-        text = text  # [:1000]
-    return text
+def preprocess_long_text(text, engine):
+    """Preprocess long text by collapsing whitespace and truncating it to
+    whole sentences within the token cap of the engine."""
+    return normalize_content(text, engine)
 
 
-# Convert TavilySearchResults into a tool
-tavily_retriever = TavilySearchResults(
-    api_key=os.environ["TAVILY_API_KEY"],
-    max_results=2
-)
+# Search backends are built on first use, so importing the tools is cheap
+# and the graphs load even when the credentials of an engine are missing.
+_retriever_builders = {}
+_retrievers = {}
+_retrievers_lock = threading.Lock()
+
 
+def register_retriever(name: str) -> Callable:
+    """Register the builder of a search backend."""
+    def decorator(builder):
+        _retriever_builders[name] = builder
+        return builder
+    return decorator
 
+
+def get_retriever(name: str):
+    """Get a search backend, building it on first use."""
+    with _retrievers_lock:
+        if name not in _retrievers:
+            _retrievers[name] = _retriever_builders[name]()
+        return _retrievers[name]
+
+
+# Convert TavilySearchResults into a tool
+@register_retriever("tavily")
+def build_tavily_retriever():
+    from langchain_community.tools.tavily_search import TavilySearchResults
+    return TavilySearchResults(
+        api_key=os.environ["TAVILY_API_KEY"],
+        max_results=2
+    )
+
+
+@cached_search("Tavily")
+@rate_limited("tavily")
+@latency_recorded("tavily")
+@replayed_search("Tavily")
 def call_tavily_search(query: str) -> List[dict]:
-    search_results = tavily_retriever.invoke(query)
+    search_results = get_retriever("tavily").invoke(query)
     formatted_results = []
     for result in search_results:
         formatted_results.append(
@@ -109,7 +141,7 @@ def call_tavily_search(query: str) -> List[dict]:
                 "search_query": query,
                 "title": "",
                 "source": result["url"],
-                "content": preprocess_long_text(result["content"]),
+                "content": preprocess_long_text(result["content"], "tavily"),
                 "search_engine": "Tavily"
             }
         )
@@ -124,13 +156,20 @@ search_tavily = Tool(
 
 
 # Convert ArxivRetriever into a tool
-arxiv_retriever = ArxivRetriever(
-    load_max_docs=3
-)
-
-
+@register_retriever("arxiv")
+def build_arxiv_retriever():
+    from langchain_community.retrievers import ArxivRetriever
+    return ArxivRetriever(
+        load_max_docs=3
+    )
+
+
+@cached_search("arXiv")
+@rate_limited("arxiv")
+@latency_recorded("arxiv")
+@replayed_search("arXiv")
 def call_arxiv_search(query: str) -> List[dict]:
-    search_results = arxiv_retriever.invoke(query)
+    search_results = get_retriever("arxiv").invoke(query)
     formatted_results = []
     for result in search_results:
         formatted_results.append(
@@ -138,7 +177,7 @@ def call_arxiv_search(query: str) -> List[dict]:
                 "search_query": query,
                 "title": result.metadata["Title"],
                 "source": result.metadata["Entry ID"],
-                "content": preprocess_long_text(result.page_content),
+                "content": preprocess_long_text(result.page_content, "arxiv"),
                 "search_engine": "arXiv"
             }
         )
@@ -153,13 +192,20 @@ search_arxiv = Tool(
 
 
 # wikipedia tool
-wikipedia_retriever = WikipediaRetriever(
-    top_k_results=3
-)
-
-
+@register_retriever("wikipedia")
+def build_wikipedia_retriever():
+    from langchain_community.retrievers import WikipediaRetriever
+    return WikipediaRetriever(
+        top_k_results=3
+    )
+
+
+@cached_search("Wikipedia")
+@rate_limited("wikipedia")
+@latency_recorded("wikipedia")
+@replayed_search("Wikipedia")
 def call_wikipedia_search(query: str) -> List[dict]:
-    search_results = wikipedia_retriever.invoke(query)
+    search_results = get_retriever("wikipedia").invoke(query)
     formatted_results = []
     for result in search_results:
         formatted_results.append(
@@ -167,7 +213,7 @@ def call_wikipedia_search(query: str) -> List[dict]:
                 "search_query": query,
                 "title": result.metadata["title"],
                 "source": result.metadata["source"],
-                "content": preprocess_long_text(result.metadata["summary"]),
+                "content": preprocess_long_text(result.metadata["summary"], "wikipedia"),
                 "search_engine": "Wikipedia"
             }
         )
@@ -179,3 +225,10 @@ search_wikipedia = Tool(
     description="Search Wikipedia for the given query. Best for general knowledge and historical summaries with human-curated content.",
     func=call_wikipedia_search
 )
+
+
+# search tools by the name the LLM uses in its tool calls
+SEARCH_TOOLS = {
+    tool.name: tool
+    for tool in [search_wikipedia, search_tavily, search_arxiv]
+}
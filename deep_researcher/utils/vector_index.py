@@ -0,0 +1,270 @@
+import functools
+import hashlib
+import math
+import os
+import re
+import threading
+import time
+from collections import Counter
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+from deep_researcher.utils.document_store import get_document_store
+from deep_researcher.utils.normalization import iter_chunks
+from deep_researcher.utils.query_index import query_tokens
+from deep_researcher.utils.search_cache import DEFAULT_TTL, ENGINE_TTL
+from deep_researcher.utils.storage import CACHE_DIR, connect_sqlite
+
+
+VECTOR_INDEX_DIR = os.getenv(
+    "VECTOR_INDEX_DIR", os.path.join(CACHE_DIR, "vector_index")
+)
+LOCAL_INDEX_ENABLED = os.getenv("LOCAL_INDEX_ENABLED", "1") != "0"
+# Sentence embedding model of the local index, run on the CPU. Every model
+# has its own index in a subdirectory of VECTOR_INDEX_DIR.
+EMBEDDING_MODEL = os.getenv(
+    "EMBEDDING_MODEL", "sentence-transformers/all-MiniLM-L6-v2"
+)
+EMBEDDING_BATCH_SIZE = 32
+# Dimension of the hashed lexical vectors of the LLM cache prompts.
+LEXICAL_DIM = 512
+# Rows the vector file grows by at least.
+GROW_ROWS = 4096
+# Chunks compared per query and documents returned at most.
+LOCAL_RECALL_K = int(os.getenv("LOCAL_RECALL_K", 8))
+# Cosine similarity of the embeddings of a chunk and of the query above
+# which its document is relevant. Passages on the subject of a query score
+# above it with all-MiniLM-L6-v2, passages on related subjects below.
+LOCAL_RECALL_MIN_SCORE = float(os.getenv("LOCAL_RECALL_MIN_SCORE", 0.6))
+# This many relevant documents in the local index make searching a topic
+# needless, unless LOCAL_RECALL_SKIPS_SEARCH=0.
+LOCAL_RECALL_SKIPS_SEARCH = os.getenv("LOCAL_RECALL_SKIPS_SEARCH", "1") == "1"
+LOCAL_RECALL_MIN_DOCS = int(os.getenv("LOCAL_RECALL_MIN_DOCS", 5))
+
+
+@functools.lru_cache(maxsize=200000)
+def _feature_slot(feature: str) -> Tuple[int, float]:
+    value = int.from_bytes(
+        hashlib.blake2b(feature.encode(), digest_size=8).digest(), "big"
+    )
+    return value % LEXICAL_DIM, 1.0 if value >> 63 else -1.0
+
+
+def lexical_vector(text: str) -> np.ndarray:
+    """Unit length hashed vector of the unigrams and bigrams of a text.
+
+    Texts using the same terms are close, while synonyms are not, so it
+    only finds near-identical texts.
+    """
+    tokens = query_tokens(text)
+    features = Counter(tokens + [
+        f"{first} {second}" for first, second in zip(tokens, tokens[1:])
+    ])
+    vector = np.zeros(LEXICAL_DIM, dtype=np.float32)
+    for feature, count in features.items():
+        slot, sign = _feature_slot(feature)
+        vector[slot] += sign * (1 + math.log(count))
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+
+class EmbeddingModel:
+    """Sentence embedding model run on the CPU, loaded on first use."""
+
+    def __init__(self, model_name: str = EMBEDDING_MODEL):
+        from sentence_transformers import SentenceTransformer
+        self.model_name = model_name
+        self._lock = threading.Lock()
+        self._model = SentenceTransformer(model_name, device="cpu")
+        self.dimension = self._model.get_sentence_embedding_dimension()
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        """Unit length embeddings of the texts, one row per text."""
+        if not texts:
+            return np.zeros((0, self.dimension), dtype=np.float32)
+        with self._lock:
+            return self._model.encode(
+                texts, batch_size=EMBEDDING_BATCH_SIZE,
+                normalize_embeddings=True, convert_to_numpy=True
+            ).astype(np.float32)
+
+
+def document_text(document: dict) -> str:
+    return f"{document.get('title') or ''}. {document.get('content') or ''}"
+
+
+class VectorIndex:
+    """Persistent flat vector index of the chunks of retrieved documents.
+
+    The chunk vectors live in a memory-mapped float32 file, so the index is
+    shared by the runs and processes using the same directory and only the
+    pages a search touches are read. The document id of every row is kept
+    in SQLite next to it.
+    """
+
+    def __init__(self, model: EmbeddingModel, directory: Optional[str] = None):
+        directory = directory or os.path.join(
+            VECTOR_INDEX_DIR, re.sub(r"\W+", "_", model.model_name)
+        )
+        os.makedirs(directory, exist_ok=True)
+        self.model = model
+        self.dimension = model.dimension
+        self._lock = threading.Lock()
+        self._vectors_path = os.path.join(directory, "vectors.f32")
+        self._connection = connect_sqlite(os.path.join(directory, "rows.sqlite"))
+        self._connection.executescript(
+            """CREATE TABLE IF NOT EXISTS chunks (
+                row INTEGER PRIMARY KEY,
+                document_id TEXT NOT NULL,
+                created_at REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS chunks_document_id
+                ON chunks (document_id);"""
+        )
+        self._connection.commit()
+        self._vectors: Optional[np.memmap] = None
+        self._map(0)
+
+    def _map(self, rows: int):
+        """Map the vector file, growing it to hold at least rows rows."""
+        if not os.path.exists(self._vectors_path):
+            open(self._vectors_path, "wb").close()
+        row_bytes = self.dimension * 4
+        capacity = os.path.getsize(self._vectors_path) // row_bytes
+        if capacity < rows or capacity == 0:
+            capacity = max(rows, 2 * capacity, GROW_ROWS)
+            with open(self._vectors_path, "r+b") as f:
+                f.truncate(capacity * row_bytes)
+        if self._vectors is None or len(self._vectors) != capacity:
+            self._vectors = np.memmap(
+                self._vectors_path, dtype=np.float32, mode="r+",
+                shape=(capacity, self.dimension)
+            )
+
+    def add(self, document_ids: List[str], documents: List[dict]) -> int:
+        """Index the documents not indexed yet, returns the number of
+        chunks added."""
+        if not document_ids:
+            return 0
+        with self._lock:
+            known = {
+                document_id for (document_id,) in self._connection.execute(
+                    "SELECT DISTINCT document_id FROM chunks WHERE document_id IN "
+                    f"({','.join('?' * len(document_ids))})",
+                    document_ids
+                )
+            }
+        chunks = [
+            (document_id, chunk)
+            for document_id, document in dict(zip(document_ids, documents)).items()
+            if document_id not in known
+            for chunk in iter_chunks(document_text(document))
+        ]
+        if not chunks:
+            return 0
+        vectors = self.model.embed([chunk for _, chunk in chunks])
+        now = time.time()
+        with self._lock:
+            rows = [
+                self._connection.execute(
+                    "INSERT INTO chunks (document_id, created_at) VALUES (?, ?)",
+                    (document_id, now)
+                ).lastrowid
+                for document_id, _ in chunks
+            ]
+            self._connection.commit()
+            self._map(max(rows))
+            for row, vector in zip(rows, vectors):
+                self._vectors[row - 1] = vector
+            self._vectors.flush()
+        return len(chunks)
+
+    def search(
+        self, text: str, k: int = LOCAL_RECALL_K,
+        min_score: float = LOCAL_RECALL_MIN_SCORE
+    ) -> List[Tuple[str, float]]:
+        """Ids of the documents with a chunk similar to the text, with the
+        score of their best chunk, best first."""
+        if not text.strip():
+            return []
+        query = self.model.embed([text])[0]
+        with self._lock:
+            (rows,) = self._connection.execute(
+                "SELECT COALESCE(MAX(row), 0) FROM chunks"
+            ).fetchone()
+            if rows == 0:
+                return []
+            self._map(rows)
+            scores = np.asarray(self._vectors[:rows] @ query)
+        top = np.argpartition(-scores, min(k, rows) - 1)[:k]
+        top = [row for row in top[np.argsort(-scores[top])] if scores[row] >= min_score]
+        if not top:
+            return []
+        with self._lock:
+            ids = dict(self._connection.execute(
+                "SELECT row, document_id FROM chunks WHERE row IN "
+                f"({','.join('?' * len(top))})",
+                [int(row) + 1 for row in top]
+            ).fetchall())
+        documents = {}
+        for row in top:
+            documents.setdefault(ids[int(row) + 1], float(scores[row]))
+        return list(documents.items())
+
+    def stats(self) -> dict:
+        with self._lock:
+            chunks, documents = self._connection.execute(
+                "SELECT COUNT(*), COUNT(DISTINCT document_id) FROM chunks"
+            ).fetchone()
+        return {"chunks": chunks, "documents": documents}
+
+
+_vector_index = None
+_vector_index_loaded = False
+_vector_index_lock = threading.Lock()
+
+
+def get_vector_index() -> Optional[VectorIndex]:
+    """Get the process-wide vector index, opening it on first use. None
+    when the index is disabled or its embedding model cannot be loaded."""
+    global _vector_index, _vector_index_loaded
+    with _vector_index_lock:
+        if not _vector_index_loaded and LOCAL_INDEX_ENABLED:
+            _vector_index_loaded = True
+            try:
+                _vector_index = VectorIndex(EmbeddingModel())
+            except (ImportError, OSError) as e:
+                print(f"Embedding model {EMBEDDING_MODEL} unavailable, the local index is disabled : {e!r}")
+        return _vector_index
+
+
+def index_documents(document_ids: List[str], documents: List[dict]):
+    """Add retrieved documents to the local index."""
+    vector_index = get_vector_index()
+    if vector_index is not None:
+        vector_index.add(document_ids, documents)
+
+
+def local_documents(text: str) -> List[str]:
+    """Ids of the indexed documents relevant to the text which are still
+    stored and younger than the search cache TTL of their engine."""
+    vector_index = get_vector_index()
+    if vector_index is None:
+        return []
+    return get_document_store().fresh_ids(
+        [document_id for document_id, _ in vector_index.search(text)],
+        ENGINE_TTL, DEFAULT_TTL
+    )
+
+
+def has_local_recall(text: str) -> bool:
+    """Whether the local index holds enough documents on the text to
+    write about it without a live search."""
+    return LOCAL_RECALL_SKIPS_SEARCH and len(local_documents(text)) >= LOCAL_RECALL_MIN_DOCS
+
+
+def vector_index_stats() -> dict:
+    """Chunks and documents of the local index, empty when disabled."""
+    vector_index = get_vector_index()
+    return vector_index.stats() if vector_index is not None else {}
@@ -0,0 +1,7 @@
+import os
+import tempfile
+
+
+# the stores of the tests are kept apart from the shared cache directory
+os.environ.setdefault("DEEP_RESEARCHER_CACHE_DIR", tempfile.mkdtemp())
+os.environ.setdefault("TAVILY_API_KEY", "test")
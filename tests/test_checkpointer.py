@@ -0,0 +1,75 @@
+import operator
+import os
+import tempfile
+import unittest
+from typing import Annotated, TypedDict
+
+from langgraph.graph import END, START, StateGraph
+
+from deep_researcher.utils.checkpointer import SQLiteCheckpointer
+
+
+class SectionsState(TypedDict):
+    sections: Annotated[list, operator.add]
+
+
+def _graph(checkpointer: SQLiteCheckpointer, calls: dict, failing: set):
+    """Graph writing two sections in parallel, then combining them."""
+    def writer(title: str):
+        def write(state: SectionsState):
+            calls[title] = calls.get(title, 0) + 1
+            if title in failing:
+                failing.discard(title)
+                raise RuntimeError(f"{title} failed")
+            return {"sections": [title]}
+        return write
+
+    builder = StateGraph(SectionsState)
+    builder.add_node("introduction", writer("introduction"))
+    builder.add_node("results", writer("results"))
+    builder.add_node("combine", writer("combine"))
+    builder.add_edge(START, "introduction")
+    builder.add_edge(START, "results")
+    builder.add_edge(["introduction", "results"], "combine")
+    builder.add_edge("combine", END)
+    return builder.compile(checkpointer=checkpointer)
+
+
+class SQLiteCheckpointerTest(unittest.TestCase):
+    def setUp(self):
+        self.path = os.path.join(tempfile.mkdtemp(), "checkpoints.sqlite")
+        self.config = {"configurable": {"thread_id": "thread"}}
+
+    def test_resumes_only_the_unfinished_tasks_after_a_crash(self):
+        calls = {}
+        graph = _graph(SQLiteCheckpointer(self.path), calls, {"results"})
+        with self.assertRaises(RuntimeError):
+            graph.invoke({"sections": []}, self.config)
+        # a new process resumes the thread from the same database
+        graph = _graph(SQLiteCheckpointer(self.path), calls, set())
+        state = graph.invoke(None, self.config)
+        self.assertEqual(calls, {"introduction": 1, "results": 2, "combine": 1})
+        self.assertEqual(
+            sorted(state["sections"]), ["combine", "introduction", "results"]
+        )
+
+    def test_keeps_the_state_and_history_of_a_thread(self):
+        checkpointer = SQLiteCheckpointer(self.path)
+        graph = _graph(checkpointer, {}, set())
+        graph.invoke({"sections": []}, self.config)
+        graph = _graph(SQLiteCheckpointer(self.path), {}, set())
+        state = graph.get_state(self.config)
+        self.assertEqual(state.next, ())
+        self.assertEqual(len(state.values["sections"]), 3)
+        self.assertGreater(len(list(graph.get_state_history(self.config))), 2)
+
+    def test_gc_deletes_old_threads(self):
+        checkpointer = SQLiteCheckpointer(self.path)
+        _graph(checkpointer, {}, set()).invoke({"sections": []}, self.config)
+        self.assertEqual(checkpointer.gc(3600), {"threads_deleted": 0})
+        self.assertEqual(checkpointer.gc(-1), {"threads_deleted": 1})
+        self.assertIsNone(checkpointer.get_tuple(self.config))
+
+
+if __name__ == "__main__":
+    unittest.main()
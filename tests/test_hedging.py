@@ -0,0 +1,84 @@
+import asyncio
+import time
+import unittest
+from unittest import mock
+
+from deep_researcher.utils import hedging
+from deep_researcher.utils.hedging import hedged_search
+from deep_researcher.utils.rate_limiter import ProviderRateLimiter
+
+
+def _search(delays: dict, limiters: dict = None):
+    """Search call answering every tool with its name after its delay,
+    waiting for the slot of its limiter first."""
+    async def call(tool_name: str):
+        limiter = (limiters or {}).get(tool_name)
+        if limiter is None:
+            await asyncio.sleep(delays[tool_name])
+            return [tool_name]
+        async with limiter.aslot():
+            await asyncio.sleep(delays[tool_name])
+            return [tool_name]
+    return call
+
+
+@mock.patch.object(hedging, "HEDGE_DEFAULT_DELAY", 0.2)
+@mock.patch.object(hedging, "SEARCH_HEDGING", True)
+class HedgedSearchTest(unittest.TestCase):
+    def test_hedges_a_slow_engine(self):
+        delays = {"search_arxiv": 5, "search_tavily": 0.05, "search_wikipedia": 5}
+        start = time.monotonic()
+        results = asyncio.run(hedged_search("search_arxiv", _search(delays), 10))
+        self.assertEqual(results, ["search_tavily"])
+        self.assertLess(time.monotonic() - start, 1)
+
+    def test_hedges_an_engine_stuck_in_its_rate_limiter_queue(self):
+        arxiv = ProviderRateLimiter("arxiv", rpm=6000, max_concurrency=1)
+        delays = {"search_arxiv": 5, "search_tavily": 0.05, "search_wikipedia": 5}
+        search = _search(delays, {"search_arxiv": arxiv})
+
+        async def main():
+            # holds the only arxiv slot, so the search below queues
+            busy = asyncio.ensure_future(search("search_arxiv"))
+            await asyncio.sleep(0.01)
+            try:
+                return await hedged_search("search_arxiv", search, 10)
+            finally:
+                busy.cancel()
+        start = time.monotonic()
+        self.assertEqual(asyncio.run(main()), ["search_tavily"])
+        self.assertLess(time.monotonic() - start, 1)
+        self.assertEqual(arxiv.in_flight, 0)
+
+    def test_times_out_while_every_engine_queues(self):
+        limiters = {
+            tool: ProviderRateLimiter(tool, rpm=6000, max_concurrency=1)
+            for tool in ("search_arxiv", "search_tavily", "search_wikipedia")
+        }
+        delays = dict.fromkeys(limiters, 5)
+        search = _search(delays, limiters)
+
+        async def main():
+            busy = [asyncio.ensure_future(search(tool)) for tool in limiters]
+            await asyncio.sleep(0.01)
+            try:
+                await hedged_search("search_arxiv", search, 0.5)
+            finally:
+                for task in busy:
+                    task.cancel()
+        start = time.monotonic()
+        with self.assertRaises(asyncio.TimeoutError):
+            asyncio.run(main())
+        self.assertLess(time.monotonic() - start, 1)
+
+    def test_falls_back_right_away_on_failures_and_empty_results(self):
+        async def call(tool_name: str):
+            if tool_name == "search_arxiv":
+                raise RuntimeError("arxiv down")
+            return [] if tool_name == "search_tavily" else [tool_name]
+        results = asyncio.run(hedged_search("search_arxiv", call, 10))
+        self.assertEqual(results, ["search_wikipedia"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,69 @@
+import asyncio
+import unittest
+from unittest import mock
+
+from langchain_core.messages import AIMessage
+from langchain_core.runnables import Runnable
+
+from deep_researcher.utils import models
+from deep_researcher.utils.models import RateLimitedModel
+from deep_researcher.utils.rate_limiter import ProviderRateLimiter
+
+
+class RateLimitError(Exception):
+    status_code = 429
+
+
+class FlakyModel(Runnable):
+    """Model answering after failing its first calls with the given errors."""
+
+    def __init__(self, *errors: Exception):
+        self.errors = list(errors)
+        self.calls = 0
+
+    def invoke(self, input, config=None, **kwargs):
+        self.calls += 1
+        if self.errors:
+            raise self.errors.pop(0)
+        return AIMessage(content="answer")
+
+    async def ainvoke(self, input, config=None, **kwargs):
+        return self.invoke(input, config, **kwargs)
+
+
+@mock.patch.object(models, "RETRY_BACKOFF", 0)
+class RateLimitedModelTest(unittest.TestCase):
+    def setUp(self):
+        self.limiter = ProviderRateLimiter("test", rpm=6000, max_concurrency=8)
+
+    def test_retries_rate_limited_calls_and_lowers_the_concurrency(self):
+        model = FlakyModel(RateLimitError("429"), RateLimitError("429"))
+        output = RateLimitedModel(model, self.limiter).invoke("prompt")
+        self.assertEqual(output.content, "answer")
+        self.assertEqual(model.calls, 3)
+        self.assertEqual(self.limiter.rate_limited, 2)
+        self.assertLess(self.limiter.concurrency_limit, 3)
+        self.assertEqual(self.limiter.in_flight, 0)
+
+    def test_retries_async_calls(self):
+        model = FlakyModel(RateLimitError("429"))
+        output = asyncio.run(RateLimitedModel(model, self.limiter).ainvoke("prompt"))
+        self.assertEqual(output.content, "answer")
+        self.assertEqual(self.limiter.rate_limited, 1)
+
+    def test_does_not_retry_other_errors(self):
+        model = FlakyModel(ValueError("bad schema"))
+        with self.assertRaises(ValueError):
+            RateLimitedModel(model, self.limiter).invoke("prompt")
+        self.assertEqual(model.calls, 1)
+
+    def test_gives_up_after_the_retries(self):
+        model = FlakyModel(*[RateLimitError("429")] * (models.MODEL_CALL_RETRIES + 1))
+        with self.assertRaises(RateLimitError):
+            RateLimitedModel(model, self.limiter).invoke("prompt")
+        self.assertEqual(model.calls, models.MODEL_CALL_RETRIES + 1)
+        self.assertEqual(self.limiter.in_flight, 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
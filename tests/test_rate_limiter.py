@@ -0,0 +1,120 @@
+import asyncio
+import threading
+import time
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+
+from deep_researcher.utils.rate_limiter import (
+    ProviderRateLimiter, _rate_limiters, _rate_limiters_lock, run_in_slot
+)
+
+
+def _limiter(provider: str, max_concurrency: int = 2) -> ProviderRateLimiter:
+    limiter = ProviderRateLimiter(provider, rpm=6000, max_concurrency=max_concurrency)
+    with _rate_limiters_lock:
+        _rate_limiters[provider] = limiter
+    return limiter
+
+
+class RunInSlotTest(unittest.TestCase):
+    def setUp(self):
+        self.executor = ThreadPoolExecutor(max_workers=2)
+
+    def tearDown(self):
+        self.executor.shutdown(wait=True)
+
+    def test_releases_the_slot_of_an_abandoned_call_after_the_loop_closed(self):
+        limiter = _limiter("test_abandoned")
+        finished = threading.Event()
+
+        def search():
+            time.sleep(0.3)
+            finished.set()
+
+        async def main():
+            with self.assertRaises(asyncio.TimeoutError):
+                await asyncio.wait_for(
+                    run_in_slot("test_abandoned", self.executor, search), 0.05
+                )
+        asyncio.run(main())
+        self.assertEqual(limiter.in_flight, 1)
+        self.assertTrue(finished.wait(2))
+        self.executor.shutdown(wait=True)
+        self.assertEqual(limiter.in_flight, 0)
+
+    def test_releases_the_slot_of_a_failed_call(self):
+        limiter = _limiter("test_failed")
+
+        def search():
+            raise RuntimeError("429 Too Many Requests")
+
+        with self.assertRaises(RuntimeError):
+            asyncio.run(run_in_slot("test_failed", self.executor, search))
+        self.assertEqual(limiter.in_flight, 0)
+        self.assertEqual(limiter.rate_limited, 1)
+        self.assertEqual(limiter.concurrency_limit, 1)
+
+    def test_releases_the_slot_of_a_call_cancelled_before_it_ran(self):
+        limiter = _limiter("test_cancelled", max_concurrency=4)
+        executor = ThreadPoolExecutor(max_workers=1)
+        blocker = threading.Event()
+        executor.submit(blocker.wait)
+
+        async def main():
+            task = asyncio.ensure_future(
+                run_in_slot("test_cancelled", executor, lambda: None)
+            )
+            await asyncio.sleep(0.05)
+            executor.shutdown(wait=False, cancel_futures=True)
+            blocker.set()
+            with self.assertRaises(asyncio.CancelledError):
+                await task
+        asyncio.run(main())
+        self.assertEqual(limiter.in_flight, 0)
+
+    def test_later_calls_do_not_block_after_abandoned_calls(self):
+        limiter = _limiter("test_later", max_concurrency=2)
+
+        async def main():
+            for _ in range(2):
+                with self.assertRaises(asyncio.TimeoutError):
+                    await asyncio.wait_for(run_in_slot(
+                        "test_later", self.executor, time.sleep, 0.2
+                    ), 0.01)
+        asyncio.run(main())
+        self.executor.shutdown(wait=True)
+        self.executor = ThreadPoolExecutor(max_workers=2)
+        self.assertEqual(
+            asyncio.run(asyncio.wait_for(run_in_slot(
+                "test_later", self.executor, lambda: "done"
+            ), 1)),
+            "done"
+        )
+        self.assertEqual(limiter.in_flight, 0)
+
+
+class ProviderRateLimiterTest(unittest.TestCase):
+    def test_releases_the_slot_when_the_call_is_cancelled(self):
+        limiter = ProviderRateLimiter("test", rpm=6000, max_concurrency=1)
+
+        async def call():
+            async with limiter.aslot():
+                await asyncio.sleep(10)
+
+        async def main():
+            with self.assertRaises(asyncio.TimeoutError):
+                await asyncio.wait_for(call(), 0.05)
+        asyncio.run(main())
+        self.assertEqual(limiter.in_flight, 0)
+
+    def test_halves_the_concurrency_on_rate_limits(self):
+        limiter = ProviderRateLimiter("test", rpm=6000, max_concurrency=8)
+        with self.assertRaises(RuntimeError):
+            with limiter.slot():
+                raise RuntimeError("rate limit exceeded")
+        self.assertEqual(limiter.concurrency_limit, 4)
+        self.assertEqual(limiter.in_flight, 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
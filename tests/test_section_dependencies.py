@@ -0,0 +1,51 @@
+import unittest
+
+from deep_researcher.utils.nodes import section_dependencies
+from deep_researcher.utils.state import SectionPlan
+
+
+def _section(title: str, web_search_required: bool, depends_on=None) -> SectionPlan:
+    return SectionPlan(
+        title=title, overview=f"About {title}",
+        web_search_required=web_search_required, depends_on=depends_on
+    )
+
+
+PLAN = [
+    _section("Introduction", False, []),
+    _section("Recent Advances", True),
+    _section("Open Problems", True),
+    _section("Discussion", False, ["Recent Advances"]),
+]
+
+
+class SectionDependenciesTest(unittest.TestCase):
+    def test_independent_sections_have_no_dependencies(self):
+        self.assertEqual(section_dependencies(PLAN[0], PLAN), [])
+
+    def test_undeclared_dependencies_are_the_web_search_sections(self):
+        conclusion = _section("Conclusion", False)
+        self.assertEqual(
+            section_dependencies(conclusion, PLAN + [conclusion]),
+            ["Recent Advances", "Open Problems"]
+        )
+
+    def test_matches_paraphrased_titles(self):
+        conclusion = _section(
+            "Conclusion", False, ["2. recent advances", "Introduction:"]
+        )
+        self.assertEqual(
+            section_dependencies(conclusion, PLAN + [conclusion]),
+            ["Recent Advances", "Introduction"]
+        )
+
+    def test_falls_back_to_the_web_search_sections_when_nothing_matches(self):
+        conclusion = _section("Conclusion", False, ["Discussion", "Future Work"])
+        self.assertEqual(
+            section_dependencies(conclusion, PLAN + [conclusion]),
+            ["Recent Advances", "Open Problems"]
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
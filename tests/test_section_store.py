@@ -0,0 +1,47 @@
+import unittest
+import uuid
+
+from deep_researcher.utils.section_store import reusable_section, store_section
+from deep_researcher.utils.state import WrittenSection
+
+
+def _config() -> dict:
+    return {"configurable": {"thread_id": str(uuid.uuid4())}}
+
+
+def _written(title: str) -> WrittenSection:
+    return WrittenSection(title=title, content=f"About {title}.", sources=[])
+
+
+class SectionStoreTest(unittest.TestCase):
+    def test_reuses_an_unchanged_section_of_the_same_thread(self):
+        config = _config()
+        store_section(config, "topic", "Results", "overview", _written("Results"), [])
+        self.assertIsNotNone(reusable_section(config, "topic", "Results", "overview"))
+        self.assertIsNone(reusable_section(_config(), "topic", "Results", "overview"))
+        self.assertIsNone(reusable_section(config, "topic", "Results", "new overview"))
+
+    def test_reuses_a_section_only_with_the_same_dependencies(self):
+        config = _config()
+        store_section(
+            config, "topic", "Conclusion", "overview", _written("Conclusion"), [],
+            ["Methods", "Results"]
+        )
+        self.assertIsNotNone(reusable_section(
+            config, "topic", "Conclusion", "overview", ["Results", "Methods"]
+        ))
+        self.assertIsNone(reusable_section(
+            config, "topic", "Conclusion", "overview", ["Results"]
+        ))
+        self.assertIsNone(reusable_section(
+            config, "topic", "Conclusion", "overview",
+            ["Methods", "Results", "Limitations"]
+        ))
+
+    def test_does_not_reuse_without_a_thread(self):
+        store_section(None, "topic", "Results", "overview", _written("Results"), [])
+        self.assertIsNone(reusable_section(None, "topic", "Results", "overview"))
+
+
+if __name__ == "__main__":
+    unittest.main()
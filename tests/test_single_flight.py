@@ -0,0 +1,54 @@
+import asyncio
+import threading
+import time
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+
+from deep_researcher.utils.single_flight import SingleFlight, wait_for_flight
+
+
+class SingleFlightTest(unittest.TestCase):
+    def test_concurrent_identical_calls_run_once(self):
+        flights = SingleFlight()
+        calls = []
+
+        def call(key: str):
+            is_new, future = flights.claim(key)
+            if not is_new:
+                return future.result()
+            calls.append(key)
+            time.sleep(0.1)
+            flights.finish(key, future, f"result of {key}")
+            return f"result of {key}"
+
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            results = list(executor.map(call, ["a", "a", "a", "b"]))
+        self.assertEqual(sorted(calls), ["a", "b"])
+        self.assertEqual(results[:3], ["result of a"] * 3)
+        self.assertEqual(flights.stats(), {"executed": 2, "joined": 2})
+
+    def test_waiters_get_the_error_and_the_key_is_released(self):
+        flights = SingleFlight()
+        _, future = flights.claim("a")
+        self.assertIs(flights.pending("a"), future)
+        flights.finish("a", future, error=RuntimeError("down"))
+        with self.assertRaises(RuntimeError):
+            future.result()
+        self.assertIsNone(flights.pending("a"))
+        self.assertTrue(flights.claim("a")[0])
+
+    def test_cancelling_a_waiter_does_not_cancel_the_call(self):
+        flights = SingleFlight()
+        _, future = flights.claim("a")
+
+        async def main():
+            with self.assertRaises(asyncio.TimeoutError):
+                await asyncio.wait_for(wait_for_flight(future), 0.05)
+        asyncio.run(main())
+        self.assertFalse(future.cancelled())
+        threading.Thread(target=flights.finish, args=("a", future, 1)).start()
+        self.assertEqual(future.result(timeout=1), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
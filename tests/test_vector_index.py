@@ -0,0 +1,48 @@
+import tempfile
+import unittest
+from typing import List
+
+import numpy as np
+
+from deep_researcher.utils.vector_index import LEXICAL_DIM, VectorIndex, lexical_vector
+
+
+class LexicalModel:
+    """Embedding model stand-in for tests, embedding texts by their terms."""
+
+    model_name = "lexical"
+    dimension = LEXICAL_DIM
+
+    def __init__(self):
+        self.calls = 0
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        self.calls += 1
+        return np.stack([lexical_vector(text) for text in texts])
+
+
+class VectorIndexTest(unittest.TestCase):
+    def setUp(self):
+        self.model = LexicalModel()
+        self.index = VectorIndex(self.model, tempfile.mkdtemp())
+        self.index.add(["gnn", "bread"], [
+            {"title": "Graph neural networks", "content": "Graph neural networks learn on graphs."},
+            {"title": "Sourdough bread", "content": "Sourdough bread rises with wild yeast."},
+        ])
+
+    def test_finds_the_documents_similar_to_the_text(self):
+        results = self.index.search("graph neural networks learn", min_score=0.3)
+        self.assertEqual([document_id for document_id, _ in results], ["gnn"])
+
+    def test_indexes_a_document_once_in_one_model_call(self):
+        self.assertEqual(self.model.calls, 1)
+        self.assertEqual(self.index.add(["gnn"], [{"title": "Graph neural networks"}]), 0)
+        self.assertEqual(self.index.stats()["documents"], 2)
+
+    def test_returns_nothing_below_the_min_score(self):
+        self.assertEqual(self.index.search("quantum chromodynamics", min_score=0.3), [])
+        self.assertEqual(self.index.search("   "), [])
+
+
+if __name__ == "__main__":
+    unittest.main()